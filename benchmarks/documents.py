@@ -0,0 +1,106 @@
+"""
+Benchmark for flattening many documents the client holds: one query per
+document, with the document as the context item, against one
+`DocumentsQuery` over all of them, sent as a `jsonb[]` parameter (plain
+and prepared) or loaded with COPY. Results are printed as JSON.
+
+Needs a Postgres 17 database, given with `--dsn` or `JSONTABLE_DSN`.
+
+    python -m benchmarks.documents --dsn "host=db user=postgres password=postgres"
+"""
+
+import argparse
+import json
+import os
+import time
+from dataclasses import replace
+from typing import Any, Callable
+
+import psycopg2
+
+from src.jsontable import ContextItem, JsonQuery
+from src.jsontable.batch import DocumentsQuery
+from src.jsontable.render import quote_literal
+
+from .suite import version
+from .synthetic import make_documents, make_table
+
+
+def per_document(cursor, json_table, documents: list[Any]) -> int:
+    rows = 0
+    for document in documents:
+        context = ContextItem(f"{quote_literal(json.dumps(document))}::jsonb")
+        query = JsonQuery(replace(json_table, context_item=context))
+        cursor.execute(query.as_sql())
+        rows += len(cursor.fetchall())
+    return rows
+
+
+def time_run(run: Callable[[], int], iterations: int) -> dict[str, Any]:
+    times = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows = run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {"rows": rows, "best_seconds": best, "rows_per_second": rows / best}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("JSONTABLE_DSN"))
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("a database is needed: pass --dsn or set JSONTABLE_DSN")
+
+    documents = make_documents(args.documents, args.width, args.depth, args.fanout)
+    json_table = make_table(args.width, args.depth)
+    connection = psycopg2.connect(args.dsn)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+
+            def batched(
+                table_name: str | None = None, prepared: bool = False
+            ) -> Callable[[], int]:
+                query = DocumentsQuery(json_table, table_name)
+                return lambda: sum(
+                    map(len, query.fetch_all(cursor, documents, prepared))
+                )
+
+            results: dict[str, Any] = {
+                "version": version(),
+                "documents": args.documents,
+                "columns": args.width * args.depth,
+                "per_document": time_run(
+                    lambda: per_document(cursor, json_table, documents),
+                    args.iterations,
+                ),
+                "jsonb_array": time_run(batched(), args.iterations),
+                "jsonb_array_prepared": time_run(
+                    batched(prepared=True), args.iterations
+                ),
+                "copy": time_run(
+                    batched(table_name="jsontable_documents"), args.iterations
+                ),
+            }
+    finally:
+        connection.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
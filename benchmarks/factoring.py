@@ -0,0 +1,151 @@
+"""
+Benchmark for `factor_prefixes`, over wide documents whose columns all sit
+below the same keys, such as `$.a.b.c.x0`, `$.a.b.c.x1`... Results are
+printed as JSON.
+
+Evaluation with `Evaluator` is always timed. Given a DSN with `--dsn` or
+`JSONTABLE_DSN`, the server's execution time is compared too, from
+`EXPLAIN (ANALYZE, FORMAT JSON)` over a temporary table of documents.
+
+    python -m benchmarks.factoring --dsn "host=db user=postgres password=postgres"
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import timeit
+from typing import Any
+
+import psycopg2
+
+from src.jsontable import Column, ColumnList, ContextItem, JsonQuery, JsonTable
+from src.jsontable.evaluate import Evaluator
+from src.jsontable.optimize import factor_prefixes
+
+from .suite import percentile, version
+
+
+def make_wide_documents(
+    count: int, width: int, prefix: list[str], seed: int = 0
+) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        item: dict[str, Any] = {
+            f"x{n}": rng.choice((rng.randint(0, 10**6), f"value {rng.random():.6f}"))
+            for n in range(width)
+        }
+        for key in reversed(prefix):
+            item = {key: item, f"{key}_sibling": rng.random()}
+        documents.append(item)
+    return documents
+
+
+def make_wide_table(width: int, prefix: list[str], context: str = "doc") -> JsonTable:
+    path = "".join(f".{key}" for key in prefix)
+    return JsonTable(
+        ContextItem(context),
+        "$",
+        columns=ColumnList(
+            [Column(f"x{n}", "text", f"${path}.x{n}") for n in range(width)]
+        ),
+    )
+
+
+def time_evaluation(
+    json_table: JsonTable, documents: list[dict[str, Any]], prefixes: list[str]
+) -> dict[str, Any]:
+    results = {}
+    for name, table in (
+        ("original", json_table),
+        ("factored", factor_prefixes(json_table, prefixes)),
+    ):
+        evaluator = Evaluator(table)
+        runs, total = timeit.Timer(
+            lambda: list(evaluator.rows_many(documents))
+        ).autorange()
+        results[f"{name}_seconds"] = total / runs
+    return results
+
+
+def _execution_time(cursor, query: JsonQuery) -> float:
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query.as_string(cursor)}")
+    (plan,) = cursor.fetchone()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"] / 1000
+
+
+def time_execution(
+    dsn: str,
+    json_table: JsonTable,
+    documents: list[dict[str, Any]],
+    prefixes: list[str],
+    iterations: int,
+) -> dict[str, Any]:
+    connection = psycopg2.connect(dsn)
+    results: dict[str, Any] = {"iterations": iterations}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMPORARY TABLE docs (id serial, doc jsonb)")
+            cursor.executemany(
+                "INSERT INTO docs (doc) VALUES (%s)",
+                [(json.dumps(document),) for document in documents],
+            )
+            cursor.execute("ANALYZE docs")
+            queries = {
+                "original": JsonQuery(json_table, table_name="docs"),
+                "factored": JsonQuery(
+                    factor_prefixes(json_table, prefixes), table_name="docs"
+                ),
+            }
+            for name, query in queries.items():
+                # Warm up, so both read the table from shared buffers
+                _execution_time(cursor, query)
+                times = [_execution_time(cursor, query) for _ in range(iterations)]
+                results[f"{name}_p50_seconds"] = percentile(times, 0.5)
+                results[f"{name}_mean_seconds"] = statistics.mean(times)
+        connection.rollback()
+    finally:
+        connection.close()
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("JSONTABLE_DSN"))
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--prefix", nargs="+", default=["a", "b", "c", "d"])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    json_table = make_wide_table(args.width, args.prefix, "docs.doc")
+    documents = make_wide_documents(args.documents, args.width, args.prefix)
+    # The documents have no arrays, so the whole prefix can be factored
+    prefixes = ["$" + "".join(f".{key}" for key in args.prefix)]
+    results: dict[str, Any] = {
+        "version": version(),
+        "columns": args.width,
+        "prefix": args.prefix,
+        "documents": args.documents,
+        "evaluation": time_evaluation(json_table, documents, prefixes),
+    }
+    if args.dsn:
+        results["execution"] = time_execution(
+            args.dsn, json_table, documents, prefixes, args.iterations
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
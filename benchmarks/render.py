@@ -0,0 +1,31 @@
+"""
+Times `as_sql` for increasingly wide `ColumnList`s.
+
+Run with `python -m benchmarks.render`. Rendering should be linear in the
+number of columns, so the time per column should stay roughly flat as the
+column count grows.
+"""
+
+import timeit
+
+from .synthetic import make_table
+
+SIZES = (100, 200, 400, 800, 1600)
+DEPTH = 3
+
+
+def main():
+    baseline = None
+    for width in SIZES:
+        table = make_table(width // DEPTH, DEPTH)
+        runs, total = timeit.Timer(table.as_sql).autorange()
+        per_column = total / runs / width
+        baseline = baseline or per_column
+        print(
+            f"{width:>6} columns: {total / runs * 1e3:8.3f} ms/render "
+            f"{per_column * 1e6:8.3f} us/column ({per_column / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark suite for rendering and executing `JsonQuery` objects over
+synthetic documents. Results are printed as JSON, so runs of different
+versions can be compared.
+
+Rendering is always timed. Execution is timed against a Postgres 17
+database when a DSN is given with `--dsn` or `JSONTABLE_DSN`; documents
+are loaded into a table which is dropped afterwards, so nothing is left
+behind.
+
+Memory is the peak resident set size of a fresh process running the
+query once in each mode, which counts what libpq holds as well as Python
+objects. The `connect` mode only connects, so the difference from it is
+what fetching the rows costs.
+
+    python -m benchmarks.suite --dsn "host=db user=postgres password=postgres"
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from typing import Any
+
+import psycopg2
+
+from src.jsontable import JsonQuery
+
+from .synthetic import make_documents, make_table
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def time_render(widths: list[int], depth: int) -> list[dict[str, Any]]:
+    results = []
+    for width in widths:
+        query = JsonQuery(make_table(width, depth, "docs.doc"), table_name="docs")
+        runs, total = timeit.Timer(query.as_sql).autorange()
+        frozen = query.freeze()
+        frozen_runs, frozen_total = timeit.Timer(frozen.as_string).autorange()
+        results.append(
+            {
+                "columns": width * depth,
+                "depth": depth,
+                "as_sql_seconds": total / runs,
+                "frozen_as_string_seconds": frozen_total / frozen_runs,
+            }
+        )
+    return results
+
+
+MEMORY_MODES = ["connect", "fetchall", "stream"]
+
+
+def peak_rss(dsn: str, table: str, width: int, depth: int, mode: str) -> int:
+    """
+    The peak resident set size, in bytes, of this process after running
+    the query over `table` in `mode`
+    """
+    query = JsonQuery(make_table(width, depth, f"{table}.doc"), table_name=table)
+    connection = psycopg2.connect(dsn)
+    try:
+        if mode == "fetchall":
+            with connection.cursor() as cursor:
+                cursor.execute(query.as_sql())
+                cursor.fetchall()
+        elif mode == "stream":
+            for _ in query.stream(connection):
+                pass
+    finally:
+        connection.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure_memory(dsn: str, table: str, width: int, depth: int) -> dict[str, int]:
+    memory = {}
+    context = multiprocessing.get_context("spawn")
+    for mode in MEMORY_MODES:
+        # A new process each time, as the peak never goes down
+        with ProcessPoolExecutor(1, mp_context=context) as process:
+            peak = process.submit(peak_rss, dsn, table, width, depth, mode)
+            memory[f"{mode}_peak_rss_bytes"] = peak.result()
+    return memory
+
+
+def time_execution(
+    dsn: str,
+    documents: int,
+    width: int,
+    depth: int,
+    fanout: int,
+    iterations: int,
+) -> dict[str, Any]:
+    # Not temporary, so the processes measuring memory can read it
+    table = f"jsontable_benchmark_{os.getpid()}"
+    connection = psycopg2.connect(dsn)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {table} (id serial, doc jsonb)")
+            cursor.executemany(
+                f"INSERT INTO {table} (doc) VALUES (%s)",
+                [
+                    (json.dumps(document),)
+                    for document in make_documents(documents, width, depth, fanout)
+                ],
+            )
+            cursor.execute(f"ANALYZE {table}")
+        connection.commit()
+
+        query = JsonQuery(make_table(width, depth, f"{table}.doc"), table_name=table)
+        statement = query.as_sql()
+        latencies = []
+        rows = 0
+        with connection.cursor() as cursor:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                cursor.execute(statement)
+                rows = len(cursor.fetchall())
+                latencies.append(time.perf_counter() - start)
+
+        connection.rollback()
+        memory = measure_memory(dsn, table, width, depth)
+    finally:
+        connection.rollback()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        connection.commit()
+        connection.close()
+
+    return {
+        "documents": documents,
+        "columns": width * depth,
+        "depth": depth,
+        "fanout": fanout,
+        "rows": rows,
+        "iterations": iterations,
+        "rows_per_second": rows * iterations / sum(latencies),
+        "latency_p50_seconds": percentile(latencies, 0.5),
+        "latency_p99_seconds": percentile(latencies, 0.99),
+        "latency_mean_seconds": statistics.mean(latencies),
+        **memory,
+    }
+
+
+def version() -> str | None:
+    try:
+        return metadata.version("jsontable")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("JSONTABLE_DSN"))
+    parser.add_argument("--widths", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results: dict[str, Any] = {
+        "version": version(),
+        "python": platform.python_version(),
+        "render": time_render(args.widths, args.depth),
+    }
+    if args.dsn:
+        results["execution"] = time_execution(
+            args.dsn,
+            args.documents,
+            args.width,
+            args.depth,
+            args.fanout,
+            args.iterations,
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Synthetic JSON documents, and `JsonTable` definitions which flatten them,
+of configurable size.
+
+A document has `depth` levels. Each level is an object with `width` scalar
+fields `c0`, `c1`... and, below the last level, an array `l<level>` of
+`fanout` objects of the next level. Flattening one document therefore
+gives `fanout ** (depth - 1)` rows of `width * depth` columns.
+"""
+
+import random
+from typing import Any
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonTable,
+    NestedPath,
+    PathExpression,
+)
+
+
+def make_document(
+    width: int, depth: int, fanout: int, rng: random.Random | None = None
+) -> dict[str, Any]:
+    rng = rng or random.Random(0)
+
+    def level(n: int) -> dict[str, Any]:
+        item: dict[str, Any] = {
+            f"c{column}": rng.choice(
+                (rng.randint(0, 10**6), f"value {rng.random():.6f}", None)
+            )
+            for column in range(width)
+        }
+        if n + 1 < depth:
+            item[f"l{n + 1}"] = [level(n + 1) for _ in range(fanout)]
+        return item
+
+    return level(0)
+
+
+def make_documents(
+    count: int, width: int, depth: int, fanout: int, seed: int = 0
+) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_document(width, depth, fanout, rng) for _ in range(count)]
+
+
+def make_table(width: int, depth: int, context: str = "doc") -> JsonTable:
+    """
+    Build a table flattening documents from `make_document`, with `width`
+    columns on each of `depth` levels of `NestedPath`
+    """
+    columns: ColumnList | None = None
+    for level in reversed(range(depth)):
+        items: list = [
+            Column(f"c{level}_{n}", "text", PathExpression(f"$.c{n}"))
+            for n in range(width)
+        ]
+        if columns is not None:
+            items.append(NestedPath(PathExpression(f"$.l{level + 1}[*]"), columns))
+        columns = ColumnList(items)
+    return JsonTable(
+        context_item=ContextItem(context),
+        path_expression=PathExpression("$"),
+        columns=columns,
+    )
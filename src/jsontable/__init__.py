@@ -1,9 +1,13 @@
+from .cache import CacheInfo, RenderCache, render_cache
+from .path import JsonPath, JsonPathSyntaxError, parse_path, path_cache
+from .prepared import PreparedStatements, prepared_statements
 from .table import (
     Column,
     ColumnExists,
     ColumnList,
     ContextItem,
     FormatJson,
+    Frozen,
     JsonQuery,
     JsonTable,
     NestedPath,
@@ -15,10 +19,13 @@ from .table import (
 )
 
 __all__ = (
+    "CacheInfo",
     "Column",
     "ColumnExists",
     "ColumnList",
     "ContextItem",
+    "JsonPath",
+    "JsonPathSyntaxError",
     "JsonQuery",
     "JsonTable",
     "NestedPath",
@@ -26,6 +33,13 @@ __all__ = (
     "PathExpression",
     "Passing",
     "PassingList",
+    "parse_path",
+    "path_cache",
+    "PreparedStatements",
+    "prepared_statements",
     "FormatJson",
+    "Frozen",
     "Rendered",
+    "RenderCache",
+    "render_cache",
 )
@@ -0,0 +1,338 @@
+"""
+Propose indexes for the table a `JsonQuery` reads, from its definition.
+
+JSON_TABLE is evaluated for every row it is given, so an index can only
+help by reducing the rows of the base table which reach it. The SQL of a
+`JsonQuery` itself can only use a GIN `jsonb_path_ops` index on the
+context column, through its `@?` prefilter. Btree expression indexes on
+a value the root path filters on, which every document has once, are
+proposed too, marked `outer`: they serve only comparisons written around
+the query, such as `JsonQuery.where` conditions on the same expression.
+They index the text of the value unless `casts` is given, since a cast
+in an index expression makes creating the index, and every later write
+of a document whose value can't be cast, fail.
+
+    for proposal in advise(query):
+        print(proposal.as_string())
+
+`verify` checks proposals with EXPLAIN of the query on a database holding
+the table.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Generator, Literal
+
+from psycopg2 import sql
+
+from .path import (
+    And,
+    Comparison,
+    Current,
+    Exists,
+    Filter,
+    JsonPath,
+    Member,
+    Node,
+    Path,
+    Root,
+    Value,
+    Variable,
+    format_node,
+    parse_path,
+)
+from .table import JsonQuery, Rendered
+
+# Comparison operators of jsonpath and SQL
+OPERATORS = {"==": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+@dataclass
+class IndexProposal(Rendered):
+    """
+    A `CREATE INDEX` statement. `probe` is the query the index should
+    speed up, used by `verify`; it is None when it depends on values which
+    are not known until the query runs. An `outer` index can't be used by
+    the query as it is generated, only by a condition or ORDER BY on the
+    indexed expression added to it by hand.
+    """
+
+    table_name: str
+    method: Literal["gin", "btree"]
+    expression: sql.Composable
+    reason: str
+    probe: sql.Composable | None = None
+    concurrently: bool = False
+    outer: bool = False
+
+    @property
+    def name(self) -> str:
+        digest = hashlib.sha1(
+            f"{self.method} {self.expression!r}".encode()
+        ).hexdigest()[:8]
+        return f"{self.table_name[:40]}_jsontable_{self.method}_{digest}"
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        yield sql.SQL("CREATE INDEX {}IF NOT EXISTS {} ON {} USING {} ({})").format(
+            sql.SQL("CONCURRENTLY " if self.concurrently else ""),
+            sql.Identifier(self.name),
+            sql.Identifier(self.table_name),
+            sql.SQL(self.method),
+            self.expression,
+        )
+
+
+def _context_column(query: JsonQuery) -> str:
+    """
+    The column of the query's table which holds the documents
+    """
+    match = re.fullmatch(
+        r"\s*(?:(\w+|\"[^\"]+\")\.)?(\w+|\"[^\"]+\")\s*",
+        query.json_table.context_item.expression,
+    )
+    if not match or match.group(1) not in (None, query.table_name, query.alias):
+        raise ValueError(
+            "the context item must be a column of the query's table to be indexed"
+        )
+    column = match.group(2)
+    return column[1:-1] if column.startswith('"') else column.lower()
+
+
+def _text_array(keys: list[str]) -> str:
+    return "{" + ",".join(json.dumps(key) for key in keys) + "}"
+
+
+def _members(accessors: tuple) -> list[str] | None:
+    if not all(isinstance(a, Member) for a in accessors):
+        return None
+    return [a.key for a in accessors]
+
+
+def _value_expression(column: str, keys: list[str], type_: str | None) -> sql.Composed:
+    expression = sql.SQL("{} #>> {}").format(
+        sql.Identifier(column), sql.Literal(_text_array(keys))
+    )
+    if type_:
+        return sql.SQL("(({})::{})").format(expression, sql.SQL(type_))
+    return sql.SQL("({})").format(expression)
+
+
+def _conjuncts(node: Node) -> Generator[Node, None, None]:
+    if isinstance(node, And):
+        yield from _conjuncts(node.left)
+        yield from _conjuncts(node.right)
+    else:
+        yield node
+
+
+def _has_equality(node: Node) -> bool:
+    """
+    Whether `node` has a predicate jsonb_path_ops can look up: equality
+    with a constant, or `exists`
+    """
+    if isinstance(node, Exists):
+        return True
+    if isinstance(node, Comparison):
+        sides = (node.left, node.right)
+        return node.op == "==" and any(isinstance(s, (Value, Variable)) for s in sides)
+    return any(
+        _has_equality(getattr(node, name))
+        for name in ("left", "right", "operand")
+        if hasattr(node, name)
+    )
+
+
+def _filters(node: Node) -> Generator[Filter, None, None]:
+    if isinstance(node, Path):
+        for accessor in node.accessors:
+            if isinstance(accessor, Filter):
+                yield accessor
+
+
+def _variables(query: JsonQuery) -> dict[str, Any] | None:
+    passing = query.json_table.passing
+    variables = {}
+    for item in passing.passings if passing else []:
+        if isinstance(item.value, sql.Composable):
+            return None
+        variables[item.as_] = item.value
+    return variables
+
+
+def _bound(path: JsonPath, variables: dict[str, Any] | None) -> JsonPath | None:
+    """
+    `path` with its variables replaced by their values, or None if they
+    aren't all known
+    """
+    if variables is None or path.variables - set(variables):
+        return None
+    try:
+        return path.bind(variables)
+    except TypeError:
+        return None
+
+
+def _scalar_comparisons(
+    path: JsonPath, variables: dict[str, Any] | None
+) -> Generator[tuple[list[str], str, Any], None, None]:
+    """
+    Comparisons of a value every document has once, from a filter on the
+    root path such as `$.a ? (@.b > 1)`: (keys, SQL operator, value).
+    This assumes the keys hold objects rather than arrays, which lax mode
+    would unwrap.
+    The value is None if it is a variable which isn't known.
+    """
+    expression = path.expression
+    if path.mode != "lax" or not isinstance(expression, Path):
+        return
+    if not isinstance(expression.start, Root):
+        return
+    prefix: list[str] = []
+    for accessor in expression.accessors:
+        if isinstance(accessor, Member):
+            prefix.append(accessor.key)
+            continue
+        if not isinstance(accessor, Filter):
+            return
+        for predicate in _conjuncts(accessor.predicate):
+            if not isinstance(predicate, Comparison):
+                continue
+            left, right, op = predicate.left, predicate.right, predicate.op
+            if isinstance(left, (Value, Variable)):
+                left, right = right, left
+                op = {"<": ">", ">": "<", "<=": ">=", ">=": "<="}.get(op, op)
+            if not isinstance(left, Path) or not isinstance(left.start, Current):
+                continue
+            keys = _members(left.accessors)
+            if not keys:
+                continue
+            if isinstance(right, Value):
+                value = right.value
+            elif isinstance(right, Variable):
+                value = (variables or {}).get(right.name)
+            else:
+                continue
+            yield prefix + keys, OPERATORS[op], value
+        return
+
+
+def advise(query: JsonQuery, casts: bool = False) -> list[IndexProposal]:
+    """
+    Propose indexes on the table of `query`. Comparisons with a number or
+    boolean only get an index, on the value cast to its type, if `casts`
+    is true: the documents must then all hold a value of that type there,
+    or be missing it.
+    """
+    if not query.table_name:
+        raise ValueError("the query has no table to index")
+    table = query.table_name
+    column = _context_column(query)
+    root = parse_path(query.json_table.path_expression)
+    variables = _variables(query)
+    proposals: list[IndexProposal] = []
+
+    if any(_has_equality(f.predicate) for f in _filters(root.expression)):
+        probe = None
+        if _bound(root, variables) is not None:
+            probe = replace(query, prefilter=True).as_sql()
+        proposals.append(
+            IndexProposal(
+                table,
+                "gin",
+                sql.SQL("{} jsonb_path_ops").format(sql.Identifier(column)),
+                f"JsonQuery(prefilter=True) filters documents with {column} @? '{root}'",
+                probe,
+            )
+        )
+
+    for keys, operator, value in _scalar_comparisons(root, variables):
+        type_ = None if isinstance(value, str) or value is None else "numeric"
+        if isinstance(value, bool):
+            type_ = "boolean"
+        if type_ and not casts:
+            continue
+        expression = _value_expression(column, keys, type_)
+        reason = (
+            f"for a condition added to the query: the root path filters on "
+            f"{column} #>> '{_text_array(keys)}'"
+        )
+        if type_:
+            reason += (
+                f"; the index, and writes of documents, fail where the value "
+                f"is not a {type_}"
+            )
+        probe = None
+        if value is not None:
+            condition = sql.SQL("{} {} {}").format(
+                expression,
+                sql.SQL(operator),
+                sql.Literal(
+                    value if isinstance(value, str) else format_node(Value(value))
+                ),
+            )
+            probe = replace(query, where=[*(query.where or []), condition]).as_sql()
+        proposals.append(
+            IndexProposal(
+                table,
+                "btree",
+                expression,
+                reason,
+                probe,
+                outer=True,
+            )
+        )
+
+    unique: dict[str, IndexProposal] = {}
+    for proposal in proposals:
+        unique.setdefault(proposal.name, proposal)
+    return list(unique.values())
+
+
+def _index_names(plan: Any) -> Generator[str, None, None]:
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            yield plan["Index Name"]
+        for value in plan.values():
+            yield from _index_names(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _index_names(value)
+
+
+def verify(
+    proposals: list[IndexProposal], connection
+) -> list[tuple[IndexProposal, bool | None]]:
+    """
+    Create each proposed index in turn and check with EXPLAIN whether its
+    probe query can use it. Each index is created after a savepoint which
+    is rolled back to, so nothing is left behind and the connection's
+    transaction carries on, but building it locks and scans the table:
+    run this against a local copy rather than production. The result is
+    None for proposals without a probe.
+    """
+    if connection.autocommit:
+        raise ValueError("verify needs a connection with autocommit off")
+    results: list[tuple[IndexProposal, bool | None]] = []
+    for proposal in proposals:
+        if proposal.probe is None:
+            results.append((proposal, None))
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("SAVEPOINT jsontable_verify")
+            try:
+                cursor.execute(proposal.as_sql())
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(
+                    sql.SQL("EXPLAIN (FORMAT JSON) {}").format(proposal.probe)
+                )
+                (plan,) = cursor.fetchone()
+            finally:
+                # Also undoes SET LOCAL
+                cursor.execute("ROLLBACK TO SAVEPOINT jsontable_verify")
+                cursor.execute("RELEASE SAVEPOINT jsontable_verify")
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        results.append((proposal, proposal.name in set(_index_names(plan))))
+    return results
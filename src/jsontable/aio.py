@@ -0,0 +1,64 @@
+"""
+Run queries on asyncio connections of psycopg 3 (`psycopg.AsyncConnection`).
+
+Queries are compiled to psycopg 3 `sql` objects without a connection. Many
+queries can run concurrently on one event loop, one per connection, or
+share a round trip on one connection with `execute_pipeline`.
+"""
+
+import uuid
+from typing import Any, AsyncGenerator, Iterable
+
+from .pg3 import as_psycopg
+from .table import Rendered
+
+
+async def fetch_all(query: Rendered, aconnection, binary: bool = True) -> list[Any]:
+    """
+    Execute `query` and return all of its rows, transferred in binary
+    format if `binary` is set
+    """
+    async with aconnection.cursor(binary=binary) as cursor:
+        await cursor.execute(as_psycopg(query))
+        return await cursor.fetchall()
+
+
+async def execute_pipeline(
+    queries: Iterable[Rendered], aconnection, binary: bool = True
+) -> list[list[Any]]:
+    """
+    Send all of `queries` to the server in pipeline mode, so they share
+    a network round trip, and return the rows of each
+    """
+    cursors = []
+    async with aconnection.pipeline():
+        for query in queries:
+            cursor = aconnection.cursor(binary=binary)
+            await cursor.execute(as_psycopg(query))
+            cursors.append(cursor)
+    results = []
+    for cursor in cursors:
+        results.append(await cursor.fetchall())
+        await cursor.close()
+    return results
+
+
+async def stream(
+    query: Rendered, aconnection, itersize: int = 2000, batches: bool = False
+) -> AsyncGenerator[Any, None]:
+    """
+    Run `query` through a named (server side) cursor and yield rows, or
+    lists of up to `itersize` rows if `batches` is set. Use with
+    `async for`.
+    """
+    async with aconnection.cursor(
+        name=f"jsontable_{uuid.uuid4().hex}", withhold=aconnection.autocommit
+    ) as cursor:
+        cursor.itersize = itersize
+        await cursor.execute(as_psycopg(query))
+        if batches:
+            while rows := await cursor.fetchmany(itersize):
+                yield rows
+        else:
+            async for row in cursor:
+                yield row
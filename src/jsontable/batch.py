@@ -0,0 +1,301 @@
+"""
+Flatten many inputs with one query rather than one query each.
+
+`BatchQuery` runs one `JsonQuery` for many sets of PASSING values.
+
+The parameter sets become a relation, which JSON_TABLE takes its PASSING
+values from, so the table is read once for each set within one statement
+rather than in one round trip (and one plan) per set. Each row is tagged
+with the index of the set it came from:
+
+    batch = BatchQuery(query, [{"father": "John"}, {"father": "Paul"}])
+    john_rows, paul_rows = batch.fetch_all(cursor)
+
+`as_sql` writes the sets as a `VALUES` list. `execute_prepared` binds
+them instead as one `text[]` array per variable, expanded with `unnest`,
+so the statement is prepared once however many sets there are.
+
+`DocumentsQuery` runs a `JsonTable` over many documents the application
+holds, sent as a single `jsonb[]` parameter (or loaded with COPY into a
+temporary table), tagging each row with the index of its document:
+
+    rows_of_each = DocumentsQuery(json_table).fetch_all(cursor, documents)
+"""
+
+import io
+import json
+from dataclasses import dataclass, replace
+from typing import Any, Generator, Iterable
+
+from psycopg2 import sql
+
+from .prepared import prepared_statements
+from .render import as_string
+from .table import (
+    ContextItem,
+    Frozen,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    Rendered,
+)
+
+
+@dataclass
+class BatchQuery(Rendered):
+    """
+    `query` run once for each of `parameter_sets`, which map variable
+    names to values. The PASSING values of `query` for variables the sets
+    don't name are kept. The first column of each row, `index_column`, is
+    the index of the set the row belongs to.
+    """
+
+    query: JsonQuery | Frozen
+    parameter_sets: list[dict[str, str]]
+    index_column: str = "param_set"
+    alias: str = "params"
+
+    def names(self) -> list[str]:
+        """
+        The variables the parameter sets give values for
+        """
+        if not self.parameter_sets:
+            raise ValueError("BatchQuery needs at least one parameter set")
+        names = list(self.parameter_sets[0])
+        if not names:
+            raise ValueError("the parameter sets have no variables")
+        for n, parameters in enumerate(self.parameter_sets):
+            if set(parameters) != set(names):
+                raise ValueError(
+                    f"parameter set {n} has variables {sorted(parameters)}, "
+                    f"not {sorted(names)}"
+                )
+        if self.index_column in names:
+            raise ValueError(f"{self.index_column} is both a variable and the index")
+        return names
+
+    def _query(self, names: list[str]) -> JsonQuery:
+        """
+        `query` taking the values of `names` from the parameter relation
+        """
+        query = self.query.thaw() if isinstance(self.query, Frozen) else self.query
+        assert isinstance(query, JsonQuery)
+        if query.alias == self.alias:
+            raise ValueError(f"the query and the parameters are both {self.alias}")
+        json_table = query.json_table
+        if isinstance(json_table, Frozen):
+            json_table = json_table.thaw()  # type: ignore
+        passings = [
+            item
+            for item in (json_table.passing.passings if json_table.passing else [])
+            if item.as_ not in names
+        ]
+        passings.extend(
+            Passing(sql.Identifier(self.alias, name), name) for name in names
+        )
+        return replace(
+            query, json_table=replace(json_table, passing=PassingList(passings))
+        )
+
+    def _parts(
+        self, names: list[str], relation: sql.Composable, index: sql.Composable
+    ) -> Generator[sql.SQL | sql.Composed, None, None]:
+        query = self._query(names)
+        yield sql.SQL("SELECT {} AS {}, ").format(
+            index, sql.Identifier(self.index_column)
+        )
+        table_name = query.table_name
+        if query.table_columns and not table_name:
+            raise ValueError("table_columns needs a table_name")
+        for column in query.table_columns or []:
+            yield sql.SQL("{}, ").format(sql.Identifier(table_name or "", column))
+        yield sql.SQL("{}.* FROM {}, ").format(sql.Identifier(query.alias), relation)
+        if query.table_name:
+            yield sql.SQL("{}, ").format(sql.Identifier(query.table_name))
+        yield from query.json_table.as_sql_parts()
+        yield sql.SQL(" AS {}").format(sql.Identifier(query.alias))
+        conditions = query.conditions()
+        if conditions:
+            yield sql.SQL(" WHERE ")
+            if len(conditions) > 1:
+                conditions = [sql.SQL("({})").format(c) for c in conditions]
+            yield sql.SQL(" AND ").join(conditions)
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        names = self.names()
+        rows = sql.SQL(", ").join(
+            sql.SQL("({})").format(
+                sql.SQL(", ").join(
+                    [sql.Literal(n), *(sql.Literal(parameters[name]) for name in names)]
+                )
+            )
+            for n, parameters in enumerate(self.parameter_sets)
+        )
+        relation = sql.SQL("(VALUES {}) AS {} ({})").format(
+            rows,
+            sql.Identifier(self.alias),
+            sql.SQL(", ").join(map(sql.Identifier, [self.index_column, *names])),
+        )
+        yield from self._parts(
+            names, relation, sql.Identifier(self.alias, self.index_column)
+        )
+
+    def parameterized(self) -> tuple[sql.Composed, list[list[str]]]:
+        """
+        The query with the values of each variable bound as the `text[]`
+        parameters $1, $2..., along with those arrays. The SQL text is the
+        same whatever the number of sets or their values.
+        """
+        names = self.names()
+        relation = sql.SQL("unnest({}) WITH ORDINALITY AS {} ({})").format(
+            sql.SQL(", ").join(sql.SQL(f"${n}") for n in range(1, len(names) + 1)),
+            sql.Identifier(self.alias),
+            sql.SQL(", ").join(map(sql.Identifier, [*names, self.index_column])),
+        )
+        index = sql.SQL("{} - 1").format(sql.Identifier(self.alias, self.index_column))
+        values = [
+            [parameters[name] for parameters in self.parameter_sets] for name in names
+        ]
+        return sql.Composed(list(self._parts(names, relation, index))), values
+
+    def execute_prepared(self, cursor):
+        """
+        Execute the parameterized query as a prepared statement. Rows are
+        fetched from `cursor` as usual.
+        """
+        statement, values = self.parameterized()
+        prepared_statements(cursor.connection).execute(
+            cursor, statement.as_string(cursor), values, ["text[]"] * len(values)
+        )
+
+    def split(self, rows: Iterable[tuple]) -> list[list[tuple]]:
+        """
+        Group rows by their parameter set, dropping the index column
+        """
+        results: list[list[tuple]] = [[] for _ in self.parameter_sets]
+        for row in rows:
+            results[row[0]].append(tuple(row[1:]))
+        return results
+
+    def fetch_all(self, cursor, prepared: bool = False) -> list[list[Any]]:
+        """
+        Run the query on `cursor`, returning the rows of each parameter set
+        """
+        if prepared:
+            self.execute_prepared(cursor)
+        else:
+            cursor.execute(self.as_sql())
+        return self.split(cursor.fetchall())
+
+
+def copy_documents(cursor, documents: Iterable[Any], table_name: str):
+    """
+    Create the temporary table `table_name` of (document, doc) and load
+    `documents` into it with COPY, numbered from 0. The table lasts until
+    it is dropped or the session ends.
+    """
+    cursor.execute(
+        sql.SQL("CREATE TEMPORARY TABLE {} (document bigint, doc jsonb)").format(
+            sql.Identifier(table_name)
+        )
+    )
+    # json.dumps escapes control characters, so only backslashes need
+    # escaping for the text format
+    lines = (
+        f"{n}\t" + json.dumps(document).replace("\\", "\\\\") + "\n"
+        for n, document in enumerate(documents)
+    )
+    cursor.copy_expert(
+        sql.SQL("COPY {} (document, doc) FROM STDIN").format(
+            sql.Identifier(table_name)
+        ),
+        io.StringIO("".join(lines)),
+    )
+
+
+@dataclass
+class DocumentsQuery(Rendered):
+    """
+    `json_table` run over each of a list of documents, in place of its
+    context item. The documents are a `jsonb[]` bind parameter, or if
+    `table_name` is set, the temporary table `copy_documents` fills. The
+    first column of each row, `index_column`, is the index of the document
+    the row came from.
+    """
+
+    json_table: JsonTable | Frozen
+    table_name: str | None = None
+    index_column: str = "document"
+    alias: str = "docs"
+    table_alias: str = "jt"
+
+    def _parts(self, parameter: sql.Composable) -> Generator[sql.Composed, None, None]:
+        json_table = self.json_table
+        if isinstance(json_table, Frozen):
+            json_table = json_table.thaw()  # type: ignore
+        assert isinstance(json_table, JsonTable)
+        if self.table_name:
+            source = sql.SQL("{} AS {}").format(
+                sql.Identifier(self.table_name), sql.Identifier(self.alias)
+            )
+            index: sql.Composable = sql.Identifier(self.alias, "document")
+        else:
+            source = sql.SQL(
+                "unnest({}::jsonb[]) WITH ORDINALITY AS {} (doc, document)"
+            ).format(parameter, sql.Identifier(self.alias))
+            index = sql.SQL("{} - 1").format(sql.Identifier(self.alias, "document"))
+        context = ContextItem(as_string(sql.Identifier(self.alias, "doc")))
+        yield sql.SQL("SELECT {} AS {}, {}.* FROM {}, {} AS {}").format(
+            index,
+            sql.Identifier(self.index_column),
+            sql.Identifier(self.table_alias),
+            source,
+            replace(json_table, context_item=context).as_sql(),
+            sql.Identifier(self.table_alias),
+        )
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        """
+        The query, taking the documents as the psycopg2 parameter `%s`
+        unless `table_name` is set
+        """
+        yield from self._parts(sql.Placeholder())
+
+    def execute(self, cursor, documents: list[Any], prepared: bool = False):
+        """
+        Run the query over `documents`. With `prepared`, the statement is
+        prepared once per connection, with the documents bound as $1.
+        """
+        if self.table_name:
+            copy_documents(cursor, documents, self.table_name)
+            cursor.execute(self.as_sql())
+            return
+        values = [json.dumps(document) for document in documents]
+        if prepared:
+            statement = sql.Composed(list(self._parts(sql.SQL("$1"))))
+            prepared_statements(cursor.connection).execute(
+                cursor, statement.as_string(cursor), [values], ["text[]"]
+            )
+        else:
+            # Written into the statement, rather than passed to execute,
+            # so psycopg2 doesn't read a "%" in a path as a placeholder
+            cursor.execute(sql.Composed(list(self._parts(sql.Literal(values)))))
+
+    def fetch_all(
+        self, cursor, documents: list[Any], prepared: bool = False
+    ) -> list[list[Any]]:
+        """
+        The rows of each document, dropping the index column. A table of
+        documents is dropped once it has been read.
+        """
+        self.execute(cursor, documents, prepared)
+        rows = cursor.fetchall()
+        if self.table_name:
+            cursor.execute(
+                sql.SQL("DROP TABLE {}").format(sql.Identifier(self.table_name))
+            )
+        results: list[list[tuple]] = [[] for _ in documents]
+        for row in rows:
+            results[row[0]].append(tuple(row[1:]))
+        return results
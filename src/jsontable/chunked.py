@@ -0,0 +1,206 @@
+"""
+Flatten a document holding one huge array in chunks of its elements.
+
+A root path such as `$.items[*]` over an array of half a million elements
+gives one enormous result from a single call. `ChunkedQuery` runs the same
+`JsonQuery` with the root path narrowed to `$.items[0 to 9999]`,
+`$.items[10000 to 19999]` and so on, one chunk at a time or in parallel:
+
+    chunked = ChunkedQuery(query, chunk_size=10000)
+    for row in chunked.stream(connection):
+        ...
+    rows = chunked.fetch_all(connection, ParallelExecutor(pool))
+
+Each chunk numbers its rows from 1, so the root `OrdinalityColumn`s are
+moved on by the index of the chunk's first element, and the rows of each
+document are those of the whole query, in the same order. Over a table,
+the rows of a chunk come for every document before those of the next.
+
+Run in parallel, the length of the array and every chunk are read in the
+snapshot the executor exports, so documents changed meanwhile are seen
+whole, as they were, by every chunk. `stream` reads each chunk in a
+statement of its own, which only sees one snapshot inside a REPEATABLE
+READ transaction.
+
+The root path must select every element of an array, at a path of plain
+member accessors in lax mode, where chunks past the end of a shorter
+array select nothing. None of those keys may hold an array: lax mode
+unwraps it, so the path would reach an array in each of its elements,
+which one range of indexes can't chunk and whose ordinalities run on
+from one to the next. This can't be seen in the definition, so the
+length query counts the arrays each document holds there too, and the
+chunks are only run if none holds more than one.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any, Generator
+
+from psycopg2 import sql
+
+from .parallel import ParallelExecutor
+from .path import (
+    AnyItem,
+    Index,
+    Member,
+    Method,
+    Path,
+    Root,
+    Subscript,
+    Value,
+    format_node,
+    parse_path,
+)
+from .table import Frozen, JsonQuery, OrdinalityColumn
+
+
+@dataclass
+class ChunkedQuery:
+    """
+    `query`, over chunks of `chunk_size` elements of its root array
+    """
+
+    query: JsonQuery | Frozen
+    chunk_size: int = 10000
+
+    def __post_init__(self):
+        if self.chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+    def _query(self) -> JsonQuery:
+        query = self.query.thaw() if isinstance(self.query, Frozen) else self.query
+        assert isinstance(query, JsonQuery)
+        return query
+
+    def _prefix(self) -> tuple[Member, ...]:
+        """
+        The member accessors leading to the root array
+        """
+        path_expression = self._query().json_table.path_expression
+        path = parse_path(path_expression)
+        expression = path.expression
+        if (
+            path.mode != "lax"
+            or not isinstance(expression, Path)
+            or not isinstance(expression.start, Root)
+            or not expression.accessors
+            or not isinstance(expression.accessors[-1], AnyItem)
+            or not all(isinstance(a, Member) for a in expression.accessors[:-1])
+        ):
+            raise ValueError(
+                f"{path_expression!r} can't be chunked: the root path must be "
+                "of the form $.a.b[*]"
+            )
+        return expression.accessors[:-1]  # type: ignore
+
+    def length(self) -> sql.Composed:
+        """
+        A query of the length of the longest root array, and of the most
+        arrays the root path reaches in one document
+        """
+        query = self._query()
+        size = format_node(Path(Root(), (*self._prefix(), Method("size"))))
+        context = sql.SQL(query.json_table.context_item.expression)
+        length = sql.SQL("jsonb_path_query_first(({})::jsonb, {})::int").format(
+            context, sql.Literal(size)
+        )
+        arrays = sql.SQL(
+            "jsonb_array_length(jsonb_path_query_array(({})::jsonb, {}))"
+        ).format(context, sql.Literal(size))
+        if not query.table_name:
+            return sql.SQL("SELECT {}, {}").format(length, arrays)
+        return sql.SQL("SELECT max({}), max({}) FROM {}").format(
+            length, arrays, sql.Identifier(query.table_name)
+        )
+
+    def chunks(self, length: int) -> list[tuple[int, JsonQuery]]:
+        """
+        The index of the first element of each chunk of an array of
+        `length` elements, and the query of the chunk
+        """
+        query = self._query()
+        prefix = self._prefix()
+        chunks = []
+        for start in range(0, length, self.chunk_size):
+            end = start + self.chunk_size - 1
+            subscript = Subscript((Index(Value(start), Value(end)),))
+            path_expression = format_node(Path(Root(), (*prefix, subscript)))
+            json_table = replace(query.json_table, path_expression=path_expression)
+            chunks.append((start, replace(query, json_table=json_table)))
+        return chunks
+
+    def _ordinals(self) -> list[int]:
+        """
+        The positions in each row of the root ordinality columns
+        """
+        query = self._query()
+        columns = query.json_table.columns
+        if not columns:
+            return []
+        root = {c.name for c in columns.columns if isinstance(c, OrdinalityColumn)}
+        offset = len(query.table_columns or [])
+        return [
+            offset + n
+            for n, column in enumerate(columns.output_columns())
+            if column.name in root
+        ]
+
+    def correct(self, rows: list[tuple], start: int) -> list[tuple]:
+        """
+        The rows of the chunk starting at `start`, numbered as the whole
+        query numbers them
+        """
+        ordinals = self._ordinals()
+        if not ordinals or not start:
+            return rows
+        corrected = []
+        for row in rows:
+            values = list(row)
+            for n in ordinals:
+                if values[n] is not None:
+                    values[n] += start
+            corrected.append(tuple(values))
+        return corrected
+
+    def _chunks(self, connection) -> list[tuple[int, JsonQuery]]:
+        with connection.cursor() as cursor:
+            cursor.execute(self.length())
+            length, arrays = cursor.fetchone()
+        if (arrays or 0) > 1:
+            raise ValueError(
+                f"{self._query().json_table.path_expression!r} can't be chunked: "
+                "a key before the last holds an array, so it reaches "
+                f"{arrays} arrays in one document"
+            )
+        return self.chunks(length or 0)
+
+    def stream(self, connection) -> Generator[tuple, None, None]:
+        """
+        Run the chunks one after the other, holding the rows of only one
+        at a time
+        """
+        for start, chunk in self._chunks(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(chunk.as_sql())
+                rows = cursor.fetchall()
+            yield from self.correct(rows, start)
+
+    def fetch_all(
+        self, connection, executor: ParallelExecutor | None = None
+    ) -> list[Any]:
+        """
+        All the rows, from chunks run on the connections of `executor`
+        if given, or else one after the other on `connection`. With an
+        executor the length is read on a connection of its pool, in the
+        snapshot the chunks read.
+        """
+        if executor is None:
+            return list(self.stream(connection))
+        # The length is read in the snapshot the chunks are
+        with executor.snapshot() as (coordinator, snapshot):
+            chunks = self._chunks(coordinator)
+            rows = []
+            for n, batch in executor.batches(
+                [q for _, q in chunks], ordered=True, snapshot=snapshot
+            ):
+                rows.extend(self.correct(batch, chunks[n][0]))
+        return rows
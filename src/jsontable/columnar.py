@@ -0,0 +1,229 @@
+"""
+Fetch JSON_TABLE results column by column into NumPy arrays or an Arrow
+RecordBatch, typed from the query's `ColumnList`.
+
+`numpy` and `pyarrow` are optional; each is only needed by the functions
+which return its arrays.
+"""
+
+import json
+import re
+from typing import Any, Callable, Generator
+
+from .table import ColumnExists, JsonQuery, OrdinalityColumn
+
+try:
+    import numpy  # type: ignore
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+try:
+    import pyarrow  # type: ignore
+except ImportError:  # pragma: no cover
+    pyarrow = None  # type: ignore
+
+# SQL type: (NumPy dtype, Arrow type). Anything missing here is fetched into
+# an object array, and into Arrow as text. Every batch then has the same
+# schema, whatever its values.
+TYPES = {
+    "smallint": ("int16", "int16"),
+    "int2": ("int16", "int16"),
+    "integer": ("int32", "int32"),
+    "int": ("int32", "int32"),
+    "int4": ("int32", "int32"),
+    "bigint": ("int64", "int64"),
+    "int8": ("int64", "int64"),
+    "real": ("float32", "float32"),
+    "float4": ("float32", "float32"),
+    "double precision": ("float64", "float64"),
+    "float8": ("float64", "float64"),
+    "float": ("float64", "float64"),
+    "boolean": ("bool", "bool_"),
+    "bool": ("bool", "bool_"),
+    "date": ("datetime64[D]", "date32"),
+    "timestamp": ("datetime64[us]", "timestamp"),
+    "timestamp without time zone": ("datetime64[us]", "timestamp"),
+    "timestamptz": ("object", "timestamptz"),
+    "timestamp with time zone": ("object", "timestamptz"),
+    "time": ("object", "time"),
+    "time without time zone": ("object", "time"),
+    "numeric": ("object", "decimal"),
+    "decimal": ("object", "decimal"),
+    "json": ("object", "json"),
+    "jsonb": ("object", "json"),
+    "text": ("object", "string"),
+    "varchar": ("object", "string"),
+    "character varying": ("object", "string"),
+    "char": ("object", "string"),
+    "character": ("object", "string"),
+    "bpchar": ("object", "string"),
+    "name": ("object", "string"),
+}
+
+
+def normalize_type(type_: str) -> str:
+    """
+    Lower case a SQL type and drop any modifiers: "VARCHAR(20)" is "varchar"
+    """
+    return " ".join(re.sub(r"\(.*?\)", " ", type_.lower()).split())
+
+
+def _declared_types(query: JsonQuery) -> dict[str, str]:
+    if not query.json_table.columns:
+        raise ValueError("JSON_TABLE has no columns")
+    if query.table_columns:
+        raise ValueError("the types of table_columns are not known")
+    types = {}
+    for column in query.json_table.columns.output_columns():
+        if isinstance(column, OrdinalityColumn):
+            types[column.name] = "integer"
+        elif isinstance(column, ColumnExists):
+            types[column.name] = column.type or "boolean"
+        else:
+            types[column.name] = column.type
+    return types
+
+
+def column_types(query: JsonQuery) -> dict[str, str]:
+    """
+    The normalized SQL type of each column returned by `query`
+    """
+    return {name: normalize_type(t) for name, t in _declared_types(query).items()}
+
+
+def numpy_dtype(type_: str) -> Any:
+    if numpy is None:  # pragma: no cover
+        raise ImportError("numpy is required for NumPy arrays")
+    return numpy.dtype(TYPES.get(normalize_type(type_), ("object", None))[0])
+
+
+def _decimal_type(type_: str) -> Any:
+    """
+    A decimal of the precision and scale of `numeric(p, s)`. Unconstrained
+    numerics have no fixed scale, so are text.
+    """
+    match = re.search(r"\(\s*(\d+)\s*(?:,\s*(-?\d+)\s*)?\)", type_)
+    if not match:
+        return pyarrow.large_string()
+    precision, scale = int(match[1]), int(match[2] or 0)
+    if precision <= 38:
+        return pyarrow.decimal128(precision, scale)
+    if precision <= 76:
+        return pyarrow.decimal256(precision, scale)
+    return pyarrow.large_string()  # pragma: no cover
+
+
+def arrow_type(type_: str) -> Any:
+    """
+    The Arrow type of a SQL type: one which holds every value of it, so
+    doesn't depend on the values fetched
+    """
+    if pyarrow is None:  # pragma: no cover
+        raise ImportError("pyarrow is required for Arrow arrays")
+    name = TYPES.get(normalize_type(type_), (None, None))[1]
+    if name == "timestamp":
+        return pyarrow.timestamp("us")
+    if name == "timestamptz":
+        return pyarrow.timestamp("us", tz="UTC")
+    if name == "time":
+        return pyarrow.time64("us")
+    if name == "decimal":
+        return _decimal_type(type_)
+    if name is None or name == "json":
+        return pyarrow.large_string()
+    return getattr(pyarrow, name)()
+
+
+def _to_text(type_: str) -> Callable[[Any], Any]:
+    if TYPES.get(normalize_type(type_), (None, None))[1] == "json":
+        # psycopg2 parses json, which is written back as JSON text
+        return lambda value: None if value is None else json.dumps(value)
+    return lambda value: None if value is None else str(value)
+
+
+class _Buffer:
+    """
+    A growable column of a fixed dtype, with a mask for NULLs
+    """
+
+    def __init__(self, dtype, capacity: int):
+        self.data = numpy.zeros(capacity, dtype=dtype)
+        self.mask = numpy.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.data):
+            capacity = max(end, 2 * len(self.data))
+            self.data.resize(capacity, refcheck=False)
+            self.mask.resize(capacity, refcheck=False)
+        if self.data.dtype == object:
+            self.data[self.size : end] = values
+        else:
+            zero = numpy.zeros(1, dtype=self.data.dtype)[0]
+            self.data[self.size : end] = [zero if v is None else v for v in values]
+            self.mask[self.size : end] = [v is None for v in values]
+        self.size = end
+
+    def array(self):
+        if self.data.dtype == object:
+            return self.data[: self.size]
+        return numpy.ma.MaskedArray(self.data[: self.size], self.mask[: self.size])
+
+
+def fetch_numpy(
+    query: JsonQuery, connection, batch_size: int = 10000
+) -> dict[str, Any]:
+    """
+    Fetch the results of `query` into a NumPy array per column. Columns
+    of numeric, boolean and date types are masked arrays, where NULLs are
+    masked; other columns are object arrays.
+    """
+    if numpy is None:  # pragma: no cover
+        raise ImportError("numpy is required for fetch_numpy")
+    types = column_types(query)
+    buffers = {name: _Buffer(numpy_dtype(t), batch_size) for name, t in types.items()}
+    for rows in query.stream(connection, itersize=batch_size, batches=True):
+        for buffer, values in zip(buffers.values(), zip(*rows)):
+            buffer.extend(values)
+    return {name: buffer.array() for name, buffer in buffers.items()}
+
+
+def record_batches(
+    query: JsonQuery, connection, batch_size: int = 10000
+) -> Generator[Any, None, None]:
+    """
+    Yield the results of `query` as Arrow RecordBatches of up to
+    `batch_size` rows
+    """
+    if pyarrow is None:  # pragma: no cover
+        raise ImportError("pyarrow is required for record_batches")
+    types = _declared_types(query)
+    names = list(types)
+    arrow_types = [arrow_type(t) for t in types.values()]
+    # Values of types Arrow holds as text are converted to it
+    converters = [
+        _to_text(t) if pyarrow.types.is_large_string(a) else None
+        for t, a in zip(types.values(), arrow_types)
+    ]
+    for rows in query.stream(connection, itersize=batch_size, batches=True):
+        arrays = []
+        for values, type_, convert in zip(zip(*rows), arrow_types, converters):
+            if convert is not None:
+                values = tuple(map(convert, values))
+            arrays.append(pyarrow.array(values, type=type_))
+        yield pyarrow.RecordBatch.from_arrays(arrays, names=names)
+
+
+def fetch_arrow(query: JsonQuery, connection, batch_size: int = 10000) -> Any:
+    """
+    Fetch the results of `query` into a single Arrow RecordBatch
+    """
+    batches = list(record_batches(query, connection, batch_size))
+    if not batches:
+        types = _declared_types(query)
+        return pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array([], type=arrow_type(t)) for t in types.values()],
+            names=list(types),
+        )
+    return pyarrow.Table.from_batches(batches).combine_chunks().to_batches()[0]
@@ -0,0 +1,347 @@
+"""
+Evaluate a `JsonTable` in Python against documents the application already
+holds, producing the rows PostgreSQL would return for them.
+
+The context item of the table is ignored: each document passed in takes
+its place. Paths are compiled once, when the `Evaluator` is created.
+
+    evaluator = Evaluator(json_table)
+    rows = evaluator.rows(document)
+    rows = list(evaluator.rows_many(documents))
+
+Parse documents with `json.loads(text, parse_float=Decimal)`. A float has
+lost how the number was written, which `jsonb` keeps: `1e2` is output as
+`100` but the float 100.0 as `100.0`, and `1.50` as `1.50` but 1.5 as `1.5`.
+"""
+
+import datetime
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Generator, Iterable
+
+from .columnar import normalize_type
+from .path import JsonPath, PathError, column_path, datetime_text, parse_path
+from .table import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    Frozen,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+)
+
+INTEGER_RANGES = {
+    "smallint": 2**15,
+    "int2": 2**15,
+    "integer": 2**31,
+    "int": 2**31,
+    "int4": 2**31,
+    "bigint": 2**63,
+    "int8": 2**63,
+}
+FLOAT_TYPES = {"real", "float4", "double precision", "float8", "float"}
+NUMERIC_TYPES = {"numeric", "decimal"}
+BOOLEAN_TYPES = {"boolean", "bool"}
+JSON_TYPES = {"json", "jsonb"}
+TRUE = {"t", "true", "y", "yes", "on", "1"}
+FALSE = {"f", "false", "n", "no", "off", "0"}
+
+
+class CastError(ValueError):
+    pass
+
+
+def _sort_key(key: str) -> tuple[int, bytes]:
+    encoded = key.encode()
+    return len(encoded), encoded
+
+
+def numeric_text(number: int | float | Decimal) -> str:
+    """
+    The text of a JSON number as `jsonb` outputs it
+    """
+    if isinstance(number, int):
+        return str(number)
+    if isinstance(number, float):
+        if math.isnan(number) or math.isinf(number):
+            raise CastError(f"{number} is not a JSON number")
+        number = Decimal(repr(number))
+    return format(number, "f")
+
+
+def jsonb_text(value: Any) -> str:
+    """
+    Serialize a JSON value the way `jsonb` does, with object keys sorted
+    by length and then bytewise
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, Decimal)):
+        return numeric_text(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime.date, datetime.time)):
+        # Items made by the datetime methods of a path
+        return json.dumps(datetime_text(value))
+    if isinstance(value, list):
+        return "[" + ", ".join(jsonb_text(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return (
+            "{"
+            + ", ".join(
+                f"{json.dumps(key, ensure_ascii=False)}: {jsonb_text(value[key])}"
+                for key in sorted(value, key=_sort_key)
+            )
+            + "}"
+        )
+    raise CastError(f"{type(value).__name__} is not a JSON value")
+
+
+def cast(text: str, type_: str) -> Any:
+    """
+    Convert text to a value of the (normalized) SQL type, as the type's
+    input function would. Raises CastError if it can't be converted.
+    """
+    if type_ in INTEGER_RANGES:
+        if not re.fullmatch(r"\s*[+-]?\d+\s*", text):
+            raise CastError(f"invalid input syntax for type {type_}: {text!r}")
+        value = int(text)
+        limit = INTEGER_RANGES[type_]
+        if not -limit <= value < limit:
+            raise CastError(f"value {text!r} is out of range for type {type_}")
+        return value
+    if type_ in NUMERIC_TYPES:
+        try:
+            return Decimal(text.strip())
+        except InvalidOperation:
+            raise CastError(f"invalid input syntax for type {type_}: {text!r}")
+    if type_ in FLOAT_TYPES:
+        try:
+            return float(text)
+        except ValueError:
+            raise CastError(f"invalid input syntax for type {type_}: {text!r}")
+    if type_ in BOOLEAN_TYPES:
+        word = text.strip().lower()
+        if word in TRUE:
+            return True
+        if word in FALSE:
+            return False
+        raise CastError(f"invalid input syntax for type boolean: {text!r}")
+    try:
+        if type_ == "date":
+            return datetime.date.fromisoformat(text.strip())
+        if type_.startswith("timestamp"):
+            return datetime.datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise CastError(f"invalid input syntax for type {type_}: {text!r}")
+    if type_ in JSON_TYPES:
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise CastError(f"invalid input syntax for type json: {text!r}")
+    return text
+
+
+def _scalar_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return datetime_text(value)
+    return jsonb_text(value)
+
+
+Getter = Callable[[Any, int, dict[str, Any]], Any]
+
+
+def _ordinality(item: Any, ordinal: int, variables: dict[str, Any]) -> int:
+    return ordinal
+
+
+def _exists(column: ColumnExists) -> Getter:
+    path = parse_path(column.path_expression)
+    type_ = normalize_type(column.type or "boolean")
+
+    def get(item: Any, ordinal: int, variables: dict[str, Any]) -> Any:
+        try:
+            exists = path.exists(item, variables)
+        except PathError:
+            exists = False  # FALSE ON ERROR
+        if type_ in BOOLEAN_TYPES:
+            return exists
+        try:
+            return cast("true" if exists else "false", type_)
+        except CastError:
+            return cast("1" if exists else "0", type_)
+
+    return get
+
+
+def _column(column: Column) -> Getter:
+    path = parse_path(column.path_expression or column_path(column.name))
+    type_ = normalize_type(column.type)
+    query = (
+        column.format_json
+        or column.with_wrapper
+        or column.quotes is not None
+        or type_ in JSON_TYPES
+        or type_.endswith("[]")
+    )
+    omit_quotes = column.quotes == "OMIT"
+
+    def json_value(item: Any, variables: dict[str, Any]) -> Any:
+        items = path.evaluate(item, variables)
+        if not items:
+            return None
+        if len(items) > 1:
+            raise CastError("JSON path expression must return a single item")
+        (value,) = items
+        if isinstance(value, (list, dict)):
+            raise CastError("JSON path expression must return a scalar item")
+        if value is None:
+            return None
+        return cast(_scalar_text(value), type_)
+
+    def json_query(item: Any, variables: dict[str, Any]) -> Any:
+        items = path.evaluate(item, variables)
+        if column.with_wrapper and items:
+            value: Any = items
+        elif len(items) > 1:
+            raise CastError("JSON path expression must return a single item")
+        elif items:
+            value = items[0]
+        else:
+            return None
+        if type_ in JSON_TYPES:
+            return value
+        if omit_quotes and isinstance(value, str):
+            return cast(value, type_)
+        return cast(jsonb_text(value), type_)
+
+    evaluate = json_query if query else json_value
+
+    def get(item: Any, ordinal: int, variables: dict[str, Any]) -> Any:
+        try:
+            return evaluate(item, variables)
+        except (PathError, CastError):
+            return None  # NULL ON ERROR
+
+    return get
+
+
+@dataclass
+class _Level:
+    """
+    The columns of one `ColumnList`, with the positions of its columns and
+    of the columns of its nested paths in the output row
+    """
+
+    getters: list[tuple[int, Getter]] = field(default_factory=list)
+    nested: list[tuple[JsonPath, "_Level"]] = field(default_factory=list)
+
+    def rows(
+        self, items: list[Any], variables: dict[str, Any]
+    ) -> Generator[dict[int, Any], None, None]:
+        for ordinal, item in enumerate(items, 1):
+            values = {
+                position: get(item, ordinal, variables)
+                for position, get in self.getters
+            }
+            joined = False
+            # Sibling nested paths are unioned, and outer joined to the parent
+            for path, level in self.nested:
+                try:
+                    children = path.evaluate(item, variables)
+                except PathError:
+                    continue
+                for row in level.rows(children, variables):
+                    joined = True
+                    yield {**values, **row}
+            if not joined:
+                yield values
+
+
+def _compile(columns: ColumnList, positions: Iterable[int]) -> _Level:
+    level = _Level()
+    iterator = iter(positions)
+    for column in columns.columns:
+        if isinstance(column, NestedPath):
+            level.nested.append(
+                (
+                    parse_path(column.path_expression),
+                    _compile(column.columns, iterator),
+                )
+            )
+        elif isinstance(column, OrdinalityColumn):
+            level.getters.append((next(iterator), _ordinality))
+        elif isinstance(column, ColumnExists):
+            level.getters.append((next(iterator), _exists(column)))
+        else:
+            level.getters.append((next(iterator), _column(column)))
+    return level
+
+
+def _variables(passing: PassingList | None) -> dict[str, Any]:
+    variables = {}
+    for item in passing.passings if passing else []:
+        if not isinstance(item, Passing) or not isinstance(item.value, str):
+            raise ValueError(f"PASSING {item.as_} is not a literal value")
+        variables[item.as_] = item.value
+    return variables
+
+
+class Evaluator:
+    """
+    Evaluates a `JsonTable` against parsed JSON documents (the dicts, lists
+    and scalars `json.loads` returns, with `parse_float=Decimal` for numbers
+    written as Postgres writes them). Rows are tuples in the order of the
+    table's output columns.
+    """
+
+    def __init__(self, json_table: JsonTable | Frozen):
+        if isinstance(json_table, Frozen):
+            json_table = json_table.thaw()  # type: ignore
+        assert isinstance(json_table, JsonTable)
+        if not json_table.columns:
+            raise ValueError("JSON_TABLE has no columns")
+        self.json_table = json_table
+        self.path = parse_path(json_table.path_expression)
+        self.variables = _variables(json_table.passing)
+        self.width = len(list(json_table.columns.output_columns()))
+        self._level = _compile(json_table.columns, range(self.width))
+
+    def rows(self, document: Any) -> list[tuple]:
+        """
+        The rows of JSON_TABLE for one document
+        """
+        return list(self._rows(document))
+
+    def rows_many(self, documents: Iterable[Any]) -> Generator[tuple, None, None]:
+        """
+        The rows for each of `documents` in turn, as a query over a table
+        with one document per row would return them
+        """
+        for document in documents:
+            yield from self._rows(document)
+
+    def _rows(self, document: Any) -> Generator[tuple, None, None]:
+        try:
+            items = self.path.evaluate(document, self.variables)
+        except PathError:
+            return  # EMPTY ON ERROR
+        for values in self._level.rows(items, self.variables):
+            yield tuple(values.get(position) for position in range(self.width))
+
+
+def evaluate(json_table: JsonTable | Frozen, document: Any) -> list[tuple]:
+    """
+    The rows of `json_table` for a single document
+    """
+    return Evaluator(json_table).rows(document)
@@ -0,0 +1,260 @@
+"""
+Bulk export of a `JsonQuery` through `COPY (...) TO STDOUT`, and decoding
+of the binary COPY format using the query's column types.
+"""
+
+import datetime
+import json
+import queue
+import struct
+import threading
+import uuid
+from decimal import Decimal
+from typing import IO, Any, Callable, Generator, Iterable, Literal
+
+from psycopg2 import sql
+
+from .columnar import column_types
+from .table import JsonQuery
+
+Format = Literal["csv", "binary", "text"]
+
+SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+EPOCH = datetime.date(2000, 1, 1)
+EPOCH_TIMESTAMP = datetime.datetime(2000, 1, 1)
+
+
+def copy_sql(
+    query: JsonQuery, format: Format = "csv", header: bool = False
+) -> sql.Composed:
+    options: list[sql.Composable] = [sql.SQL("FORMAT {}").format(sql.SQL(format))]
+    if header:
+        if format == "binary":
+            raise ValueError("HEADER is not available for binary COPY")
+        options.append(sql.SQL("HEADER true"))
+    return sql.SQL("COPY ({}) TO STDOUT WITH ({})").format(
+        query.as_sql(), sql.SQL(", ").join(options)
+    )
+
+
+def copy_to(
+    query: JsonQuery,
+    cursor,
+    file: IO[bytes],
+    format: Format = "csv",
+    header: bool = False,
+):
+    """
+    Write the results of `query` to a file-like object in a COPY format
+    """
+    cursor.copy_expert(copy_sql(query, format, header), file)
+
+
+class _QueueWriter:
+    def __init__(self, chunks: queue.Queue, closed: threading.Event):
+        self.chunks = chunks
+        self.closed = closed
+
+    def write(self, data: bytes) -> int:
+        while True:
+            if self.closed.is_set():
+                # Raising here would leave the rest of the COPY unread on
+                # the connection: it is discarded until the server, told
+                # to cancel, ends it
+                return len(data)
+            try:
+                self.chunks.put(bytes(data), timeout=0.1)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+def copy_chunks(
+    query: JsonQuery,
+    connection,
+    format: Format = "csv",
+    header: bool = False,
+    max_chunks: int = 64,
+) -> Generator[bytes, None, None]:
+    """
+    Yield the COPY output of `query` as chunks of bytes. The COPY runs on
+    a thread of its own; at most `max_chunks` chunks are buffered between
+    it and the consumer. If the generator is closed before the end, the
+    COPY is cancelled, which aborts the connection's transaction.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=max_chunks)
+    closed = threading.Event()
+    done = object()
+    errors: list[BaseException] = []
+
+    def run():
+        try:
+            with connection.cursor() as cursor:
+                copy_to(query, cursor, _QueueWriter(chunks, closed), format, header)  # type: ignore[arg-type]
+        except BaseException as e:
+            # Once closed, the error is the cancellation
+            if not closed.is_set():
+                errors.append(e)
+        finally:
+            while not closed.is_set():
+                try:
+                    chunks.put(done, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (chunk := chunks.get()) is not done:
+            yield chunk
+    finally:
+        closed.set()
+        if thread.is_alive():
+            connection.cancel()
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _numeric(data: bytes) -> Decimal:
+    ndigits, weight, sign, dscale = struct.unpack_from(">hhHh", data)
+    if sign == 0xC000:
+        return Decimal("NaN")
+    if sign == 0xD000:
+        return Decimal("Infinity")
+    if sign == 0xF000:
+        return Decimal("-Infinity")
+    digits = struct.unpack_from(f">{ndigits}h", data, 8)
+    # Built from the digits, as Decimal arithmetic would round to the
+    # precision of the context
+    coefficient = int("".join(f"{digit:04d}" for digit in digits) or "0")
+    exponent = 4 * (weight - ndigits + 1)
+    if exponent < -dscale:
+        coefficient //= 10 ** (-dscale - exponent)
+    else:
+        coefficient *= 10 ** (exponent + dscale)
+    return Decimal(
+        (1 if sign == 0x4000 else 0, tuple(map(int, str(coefficient))), -dscale)
+    )
+
+
+def _unpack(fmt: str) -> Callable[[bytes], Any]:
+    return lambda data: struct.unpack(fmt, data)[0]
+
+
+def _text(data: bytes) -> str:
+    return data.decode()
+
+
+def _json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _jsonb(data: bytes) -> Any:
+    # The first byte is the format version
+    return json.loads(data[1:])
+
+
+def _date(data: bytes) -> datetime.date:
+    (days,) = struct.unpack(">i", data)
+    return EPOCH + datetime.timedelta(days=days)
+
+
+def _timestamp(data: bytes) -> datetime.datetime:
+    (microseconds,) = struct.unpack(">q", data)
+    return EPOCH_TIMESTAMP + datetime.timedelta(microseconds=microseconds)
+
+
+DECODERS: dict[str, Callable[[bytes], Any]] = {
+    "smallint": _unpack(">h"),
+    "int2": _unpack(">h"),
+    "integer": _unpack(">i"),
+    "int": _unpack(">i"),
+    "int4": _unpack(">i"),
+    "bigint": _unpack(">q"),
+    "int8": _unpack(">q"),
+    "real": _unpack(">f"),
+    "float4": _unpack(">f"),
+    "double precision": _unpack(">d"),
+    "float8": _unpack(">d"),
+    "float": _unpack(">d"),
+    "boolean": _unpack(">?"),
+    "bool": _unpack(">?"),
+    "numeric": _numeric,
+    "decimal": _numeric,
+    "text": _text,
+    "varchar": _text,
+    "character varying": _text,
+    "char": _text,
+    "character": _text,
+    "bpchar": _text,
+    "name": _text,
+    "json": _json,
+    "jsonb": _jsonb,
+    "uuid": lambda data: uuid.UUID(bytes=data),
+    "bytea": bytes,
+    "date": _date,
+    "timestamp": _timestamp,
+    "timestamp without time zone": _timestamp,
+}
+
+
+class _Reader:
+    """
+    Read exact numbers of bytes from an iterable of chunks
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def read(self, size: int) -> bytes:
+        while len(self.buffer) - self.offset < size:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                raise ValueError("unexpected end of COPY data") from None
+            del self.buffer[: self.offset]
+            self.offset = 0
+            self.buffer += chunk
+        data = bytes(self.buffer[self.offset : self.offset + size])
+        self.offset += size
+        return data
+
+
+def decode_binary(
+    chunks: Iterable[bytes], types: Iterable[str]
+) -> Generator[tuple, None, None]:
+    """
+    Decode binary COPY data into tuples. `types` are the normalized SQL
+    types of the columns; values of types without a decoder are returned
+    as bytes.
+    """
+    decoders = [DECODERS.get(t, bytes) for t in types]
+    reader = _Reader(chunks)
+    if reader.read(len(SIGNATURE)) != SIGNATURE:
+        raise ValueError("not binary COPY data")
+    _flags, extension = struct.unpack(">ii", reader.read(8))
+    reader.read(extension)
+    while True:
+        (count,) = struct.unpack(">h", reader.read(2))
+        if count == -1:
+            return
+        if count != len(decoders):
+            raise ValueError(f"expected {len(decoders)} fields, got {count}")
+        row = []
+        for decode in decoders:
+            (length,) = struct.unpack(">i", reader.read(4))
+            row.append(None if length == -1 else decode(reader.read(length)))
+        yield tuple(row)
+
+
+def copy_rows(query: JsonQuery, connection) -> Generator[tuple, None, None]:
+    """
+    Fetch the results of `query` through binary COPY, decoding each column
+    according to its declared type
+    """
+    types = column_types(query).values()
+    yield from decode_binary(copy_chunks(query, connection, "binary"), types)
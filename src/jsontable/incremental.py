@@ -0,0 +1,221 @@
+"""
+Incremental extraction: run a `JsonQuery` only over the rows of its table
+which changed since the last run, as told by a watermark column.
+
+The watermark column is one which grows as rows are written, such as an
+`updated_at` timestamp or a serial id, or `xmin`, the id of the
+transaction which last wrote each row:
+
+    store = FileStore("watermarks.json")
+    rows = IncrementalQuery(query, "updated_at").extract(cursor, store, "films")
+
+Each run returns the rows of the changed documents and a new watermark,
+which a `WatermarkStore` keeps until the next run. Watermarks are stored
+as text, which Postgres converts back to the column's type.
+
+With a timestamp or serial column, a transaction which commits after a
+run, but with a smaller value than one that run saw, is missed: the
+column has to be set in the order transactions commit for every change
+to be seen. `xmin` doesn't have that problem. Its watermark is the oldest
+transaction still running when the run started, so rows are read again
+rather than missed. Transaction ids wrap around after about four
+billion transactions, and rows written since then have smaller ids than
+the watermark: a run which finds its new watermark below the stored one
+reads every row again. Runs must be frequent enough that one falls
+between each wraparound and the next.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Any, Generator
+
+from psycopg2 import sql
+
+from .table import Frozen, JsonQuery, Rendered
+
+XMIN = "xmin"
+
+
+class WatermarkStore(ABC):
+    """
+    Where the watermark of each named extraction is kept between runs
+    """
+
+    @abstractmethod
+    def get(self, name: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, name: str, watermark: str):
+        pass
+
+
+class MemoryStore(WatermarkStore):
+    def __init__(self):
+        self.watermarks: dict[str, str] = {}
+
+    def get(self, name: str) -> str | None:
+        return self.watermarks.get(name)
+
+    def set(self, name: str, watermark: str):
+        self.watermarks[name] = watermark
+
+
+class FileStore(WatermarkStore):
+    """
+    Watermarks in a JSON file, which is replaced whole on each update
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> dict[str, str]:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, name: str) -> str | None:
+        return self._read().get(name)
+
+    def set(self, name: str, watermark: str):
+        watermarks = self._read()
+        watermarks[name] = watermark
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(watermarks, file)
+        os.replace(temporary, self.path)
+
+
+class TableStore(WatermarkStore):
+    """
+    Watermarks in a table of the database, created if it doesn't exist.
+    They are written in the connection's current transaction, so if the
+    rows are loaded in the same transaction, the two are committed (or
+    rolled back) together.
+    """
+
+    def __init__(self, connection, table_name: str = "jsontable_watermarks"):
+        self.connection = connection
+        self.table_name = table_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL(
+                    "CREATE TABLE IF NOT EXISTS {} (name text PRIMARY KEY, watermark text)"
+                ).format(sql.Identifier(table_name))
+            )
+
+    def get(self, name: str) -> str | None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("SELECT watermark FROM {} WHERE name = %s").format(
+                    sql.Identifier(self.table_name)
+                ),
+                (name,),
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def set(self, name: str, watermark: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL(
+                    "INSERT INTO {} (name, watermark) VALUES (%s, %s) "
+                    "ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark"
+                ).format(sql.Identifier(self.table_name)),
+                (name, watermark),
+            )
+
+
+@dataclass
+class IncrementalQuery(Rendered):
+    """
+    `query` restricted to the rows of its table whose `column` is past
+    `since`, or all of them when `since` is None. Rows where `column` is
+    NULL are never read. Rows start with the value of `column`, except
+    for `xmin`.
+    """
+
+    query: JsonQuery | Frozen
+    column: str
+    since: Any = None
+
+    def restricted(self) -> JsonQuery:
+        """
+        The query of the changed rows
+        """
+        query = self.query.thaw() if isinstance(self.query, Frozen) else self.query
+        assert isinstance(query, JsonQuery)
+        if not query.table_name:
+            raise ValueError("incremental extraction needs a query of a table")
+        where = list(query.where or [])
+        if self.column == XMIN:
+            if self.since is not None:
+                where.append(
+                    sql.SQL("{}::text::bigint >= {}").format(
+                        sql.Identifier(query.table_name, XMIN),
+                        sql.Literal(int(self.since)),
+                    )
+                )
+            return replace(query, where=where or None)
+        column = sql.Identifier(query.table_name, self.column)
+        if self.since is not None:
+            where.append(
+                sql.SQL("{} > {}").format(column, sql.Literal(str(self.since)))
+            )
+        else:
+            # Later runs can't see rows without a watermark, so neither
+            # does the first
+            where.append(sql.SQL("{} IS NOT NULL").format(column))
+        return replace(
+            query,
+            where=where or None,
+            table_columns=[self.column, *(query.table_columns or [])],
+        )
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        yield from self.restricted().as_sql_parts()
+
+    def fetch(self, cursor) -> tuple[list[tuple], Any]:
+        """
+        The rows of the changed documents, without the watermark column,
+        and the watermark to start from next time. Other than for `xmin`,
+        that is the largest value of the column on the rows returned, so
+        documents which give no rows don't move it. For `xmin`, all the
+        rows are read if transaction ids have wrapped around since `since`.
+        """
+        if self.column == XMIN:
+            # Taken before the query, every transaction older than this
+            # has finished, so its rows are seen now
+            cursor.execute(
+                "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint "
+                "% 4294967296"
+            )
+            (watermark,) = cursor.fetchone()
+            query = self
+            if self.since is not None and watermark < int(self.since):
+                query = replace(self, since=None)
+            cursor.execute(query.as_sql())
+            return cursor.fetchall(), watermark
+        cursor.execute(self.as_sql())
+        rows = cursor.fetchall()
+        watermark = max(
+            (row[0] for row in rows if row[0] is not None), default=self.since
+        )
+        return [row[1:] for row in rows], watermark
+
+    def extract(self, cursor, store: WatermarkStore, name: str) -> list[tuple]:
+        """
+        Fetch the rows changed since the watermark `store` holds for
+        `name`, and store the new one. It is stored before the rows are
+        used: with a `TableStore`, load them in the same transaction, or
+        use `fetch` and store the watermark once they are loaded.
+        """
+        since = store.get(name)
+        rows, watermark = replace(self, since=since).fetch(cursor)
+        if watermark is not None:
+            store.set(name, str(watermark))
+        return rows
@@ -0,0 +1,204 @@
+"""
+DDL to keep the result of a `JsonQuery` in the database, so reads don't
+flatten the documents again.
+
+`materialized_view` gives a `CREATE MATERIALIZED VIEW`, brought up to date
+with `refresh_view`. `materialized_table` gives a plain table, with
+triggers on the query's table which flatten again only the rows that are
+inserted, updated or deleted:
+
+    with connection.cursor() as cursor:
+        for statement in materialized_table(query, "films_flat"):
+            cursor.execute(statement)
+
+Rows are identified by the key of the query's table and the ordinality
+columns of the JSON_TABLE, which get a unique index. So every nested path,
+and a root path which may select more than one item, needs an
+`OrdinalityColumn`.
+"""
+
+from dataclasses import replace
+from typing import Sequence
+
+from psycopg2 import sql
+
+from .path import Member, Path, Root, parse_path
+from .table import ColumnList, JsonQuery, NestedPath, OrdinalityColumn
+
+# Quotes the body of trigger functions, which holds JSON paths, so can't
+# be quoted with $$
+QUOTE = "$jsontable$"
+
+
+def _single(path_expression: str) -> bool:
+    """
+    Whether the path selects at most one item, as `$` or `$.a.b` do
+    """
+    path = parse_path(path_expression)
+    if path.mode != "lax":
+        return False
+    if isinstance(path.expression, Root):
+        return True
+    return (
+        isinstance(path.expression, Path)
+        and isinstance(path.expression.start, Root)
+        and all(isinstance(a, Member) for a in path.expression.accessors)
+    )
+
+
+def ordinality_columns(
+    columns: ColumnList, path_expression: str, root: bool = True
+) -> list[str]:
+    """
+    An ordinality column of each level, which together tell the rows of a
+    document apart
+    """
+    names = [c.name for c in columns.columns if isinstance(c, OrdinalityColumn)]
+    if not names and not (root and _single(path_expression)):
+        raise ValueError(
+            f"the rows of {path_expression!r} can't be told apart: "
+            "add an OrdinalityColumn"
+        )
+    ordinals = names[:1]
+    for column in columns.columns:
+        if isinstance(column, NestedPath):
+            ordinals.extend(
+                ordinality_columns(column.columns, column.path_expression, False)
+            )
+    return ordinals
+
+
+def _keys(key: str | Sequence[str]) -> list[str]:
+    return [key] if isinstance(key, str) else list(key)
+
+
+def _query(query: JsonQuery, keys: list[str]) -> JsonQuery:
+    if not query.table_name:
+        raise ValueError("only a query of a table can be materialized")
+    if not query.json_table.columns:
+        raise ValueError("JSON_TABLE has no columns")
+    names = {c.name.lower() for c in query.json_table.columns.output_columns()}
+    clashes = names & {key.lower() for key in keys}
+    if clashes:
+        raise ValueError(f"the key and JSON_TABLE both have {', '.join(clashes)}")
+    return replace(query, table_columns=keys)
+
+
+def _unique_index(query: JsonQuery, name: str, keys: list[str]) -> sql.Composed:
+    assert query.json_table.columns
+    ordinals = ordinality_columns(
+        query.json_table.columns, query.json_table.path_expression
+    )
+    nested = any(isinstance(c, NestedPath) for c in query.json_table.columns.columns)
+    return sql.SQL("CREATE UNIQUE INDEX {} ON {} ({}){}").format(
+        sql.Identifier(f"{name}_key"),
+        sql.Identifier(name),
+        sql.SQL(", ").join(
+            [*map(sql.Identifier, keys), *(sql.SQL(o) for o in ordinals)]
+        ),
+        # The columns of nested paths are NULL on the rows of their siblings
+        sql.SQL(" NULLS NOT DISTINCT" if nested else ""),
+    )
+
+
+def materialized_view(
+    query: JsonQuery, name: str, key: str | Sequence[str] = "id", data: bool = True
+) -> list[sql.Composed]:
+    """
+    Statements creating a materialized view of `query`, with the `key` of
+    its table, and a unique index which allows `REFRESH ... CONCURRENTLY`
+    """
+    keys = _keys(key)
+    select = _query(query, keys)
+    return [
+        sql.SQL("CREATE MATERIALIZED VIEW {} AS {}{}").format(
+            sql.Identifier(name),
+            select.as_sql(),
+            sql.SQL("" if data else " WITH NO DATA"),
+        ),
+        _unique_index(select, name, keys),
+    ]
+
+
+def refresh_view(name: str, concurrently: bool = True) -> sql.Composed:
+    """
+    Recompute a materialized view. Concurrently, reads aren't blocked, but
+    the view must have been populated already.
+    """
+    return sql.SQL("REFRESH MATERIALIZED VIEW {}{}").format(
+        sql.SQL("CONCURRENTLY " if concurrently else ""), sql.Identifier(name)
+    )
+
+
+def _trigger_function(select: JsonQuery, name: str, keys: list[str]) -> sql.Composed:
+    old = sql.SQL(" AND ").join(
+        sql.SQL("{} = OLD.{}").format(sql.Identifier(key), sql.Identifier(key))
+        for key in keys
+    )
+    new = sql.SQL(" AND ").join(
+        sql.SQL("q.{} = NEW.{}").format(sql.Identifier(key), sql.Identifier(key))
+        for key in keys
+    )
+
+    body = sql.SQL(
+        "BEGIN "
+        "IF TG_OP = 'TRUNCATE' THEN TRUNCATE {table}; RETURN NULL; END IF; "
+        # Compared as text, as json has no equality operator
+        "IF TG_OP = 'UPDATE' AND OLD::text = NEW::text THEN RETURN NULL; END IF; "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN DELETE FROM {table} WHERE {old}; END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        "INSERT INTO {table} SELECT * FROM ({select}) AS q WHERE {new}; END IF; "
+        "RETURN NULL; "
+        "END"
+    ).format(
+        table=sql.Identifier(name),
+        old=old,
+        select=select.as_sql(),
+        new=new,
+    )
+    return sql.SQL(
+        "CREATE FUNCTION {}() RETURNS trigger LANGUAGE plpgsql AS {} {} {}"
+    ).format(sql.Identifier(f"{name}_refresh"), sql.SQL(QUOTE), body, sql.SQL(QUOTE))
+
+
+def materialized_table(
+    query: JsonQuery, name: str, key: str | Sequence[str] = "id"
+) -> list[sql.Composed]:
+    """
+    Statements creating a table of the rows of `query`, with the `key` of
+    its table, and triggers which keep it up to date as that table changes
+    """
+    keys = _keys(key)
+    select = _query(query, keys)
+    function = sql.Identifier(f"{name}_refresh")
+    table = sql.Identifier(select.table_name or "")
+    return [
+        sql.SQL("CREATE TABLE {} AS {}").format(sql.Identifier(name), select.as_sql()),
+        _unique_index(select, name, keys),
+        _trigger_function(select, name, keys),
+        sql.SQL(
+            "CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} "
+            "FOR EACH ROW EXECUTE FUNCTION {}()"
+        ).format(function, table, function),
+        sql.SQL(
+            "CREATE TRIGGER {} AFTER TRUNCATE ON {} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION {}()"
+        ).format(sql.Identifier(f"{name}_truncate"), table, function),
+    ]
+
+
+def drop_materialized_table(query: JsonQuery, name: str) -> list[sql.Composed]:
+    """
+    Statements removing a table made by `materialized_table`, with its
+    triggers
+    """
+    function = sql.Identifier(f"{name}_refresh")
+    table = sql.Identifier(query.table_name or "")
+    return [
+        sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(function, table),
+        sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(
+            sql.Identifier(f"{name}_truncate"), table
+        ),
+        sql.SQL("DROP FUNCTION IF EXISTS {}()").format(function),
+        sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)),
+    ]
@@ -0,0 +1,216 @@
+"""
+Rewrites of `JsonTable` definitions which return the same rows for less
+work on the server.
+
+`factor_prefixes` moves columns whose paths share a prefix of object keys,
+such as `$.a.b.c.x` and `$.a.b.c.y`, into a `NESTED PATH '$.a.b.c'`, so the
+prefix is evaluated once for each row rather than once for each column.
+
+Only the prefixes the caller names are factored (or the leading parts of
+them), as the rows are only unchanged if none of the keys of the prefix
+but the last hold an array, and neither does the row item itself. Lax
+mode unwraps an array before a member accessor, so `$.a.b` selects one
+item per element when `a` is an array: the nested path would give a row
+for each, where the original columns give one row, and each the value of
+the one element which has it, or NULL if more than one does. Neither a
+lax nor a strict nested path can reproduce that, and it can't be checked
+from the definition, so only the caller, who knows the documents, can
+say which prefixes are safe:
+
+    factor_prefixes(json_table, ["$.a.b.c", "$.list[*].d"])
+
+Prefixes start from the row item of the table, and reach the columns of
+a nested path through its path, as `$.list[*].d` does those of
+`NESTED PATH '$.list[*]'`.
+
+Within those, the rows are unchanged because of these rules:
+
+- A prefix is made only of member accessors (`.key`) of lax paths starting
+  from `$`. Wildcards, subscripts, filters and methods end it, as they can
+  select any number of items, and each item would become a row.
+- Only `Column`s are moved. An EXISTS column is false where the prefix is
+  missing, but would be NULL inside a nested path which selects nothing.
+- Only a contiguous run of columns is moved, so the output columns keep
+  their order.
+- At most one nested path is added to a column list, and only to a list
+  without nested paths: the rows of sibling nested paths are unioned, not
+  joined, so a second one would add rows.
+"""
+
+from dataclasses import replace
+from typing import Iterable
+
+from .path import Accessor, Member, Path, Root, column_path, format_node, parse_path
+from .table import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+)
+
+AnyColumn = Column | ColumnExists | OrdinalityColumn | NestedPath
+
+
+def _split(column: AnyColumn) -> tuple[tuple[str, ...], tuple[Accessor, ...]] | None:
+    """
+    The leading keys of a column's path, and the accessors which follow
+    them, or None if the column can't be moved into a nested path
+    """
+    if not isinstance(column, Column):
+        return None
+    path = parse_path(column.path_expression or column_path(column.name))
+    if path.mode != "lax":
+        return None
+    if isinstance(path.expression, Root):
+        return (), ()
+    if not isinstance(path.expression, Path) or not isinstance(
+        path.expression.start, Root
+    ):
+        return None
+    accessors = path.expression.accessors
+    n = 0
+    while n < len(accessors) and isinstance(accessors[n], Member):
+        n += 1
+    keys = tuple(accessor.key for accessor in accessors[:n])  # type: ignore
+    return keys, accessors[n:]
+
+
+def _path(accessors: tuple[Accessor, ...]) -> str:
+    return format_node(Path(Root(), accessors)) if accessors else "$"
+
+
+def _common(a: tuple[str, ...], b: tuple[str, ...]) -> tuple[str, ...]:
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:n]
+
+
+Prefix = tuple[Accessor, ...]
+
+
+def _accessors(path_expression: str) -> Prefix | None:
+    """
+    The accessors of a lax path starting from `$`
+    """
+    path = parse_path(path_expression)
+    if path.mode != "lax":
+        return None
+    if isinstance(path.expression, Root):
+        return ()
+    if isinstance(path.expression, Path) and isinstance(path.expression.start, Root):
+        return path.expression.accessors
+    return None
+
+
+def _keys(prefix: Prefix) -> tuple[str, ...] | None:
+    if all(isinstance(a, Member) for a in prefix):
+        return tuple(a.key for a in prefix)  # type: ignore
+    return None
+
+
+def _allowed(keys: tuple[str, ...], prefixes: set[Prefix]) -> tuple[str, ...]:
+    """
+    The longest part of `keys` which leads one of `prefixes`
+    """
+    allowed = [_keys(p) for p in prefixes]
+    return max((_common(keys, p) for p in allowed if p), key=len, default=())
+
+
+def _within(accessors: Prefix, prefixes: set[Prefix]) -> set[Prefix]:
+    """
+    `prefixes` relative to the items `accessors` select
+    """
+    n = len(accessors)
+    return {p[n:] for p in prefixes if p[:n] == accessors}
+
+
+def _prefixes(paths: Iterable[str]) -> set[Prefix]:
+    prefixes = set()
+    for path_expression in paths:
+        accessors = _accessors(path_expression)
+        if not accessors or not isinstance(accessors[-1], Member):
+            raise ValueError(
+                f"{path_expression!r} is not a prefix: it must be a lax path "
+                "ending in keys, such as $.a.b"
+            )
+        prefixes.add(accessors)
+    return prefixes
+
+
+def factor_columns(
+    columns: ColumnList, prefixes: Iterable[str], min_columns: int = 3
+) -> ColumnList:
+    """
+    Factor the longest shared prefix of a run of at least `min_columns`
+    columns into a nested path, choosing the run which saves the most
+    accessor evaluations. Only `prefixes`, and the leading parts of them,
+    are factored. Nested column lists are factored too.
+    """
+    return _factor(columns, _prefixes(prefixes), min_columns)
+
+
+def _factor(columns: ColumnList, prefixes: set[Prefix], min_columns: int) -> ColumnList:
+    items: list[AnyColumn] = []
+    for c in columns.columns:
+        if isinstance(c, NestedPath):
+            accessors = _accessors(c.path_expression)
+            within = set() if accessors is None else _within(accessors, prefixes)
+            c = replace(c, columns=_factor(c.columns, within, min_columns))
+        items.append(c)
+    if any(isinstance(c, NestedPath) for c in items):
+        return ColumnList(items)
+
+    splits = [_split(c) for c in items]
+    best: tuple[int, int, int, tuple[str, ...]] | None = None
+    for start, split in enumerate(splits):
+        if split is None:
+            continue
+        prefix = _allowed(split[0], prefixes)
+        for end in range(start + 1, len(items)):
+            following = splits[end]
+            if following is None:
+                break
+            prefix = _common(prefix, following[0])
+            if not prefix:
+                break
+            count = end - start + 1
+            saving = (count - 1) * len(prefix)
+            if count >= min_columns and (best is None or saving > best[0]):
+                best = (saving, start, end + 1, prefix)
+    if best is None:
+        return ColumnList(items)
+
+    _, start, end, prefix = best
+    moved: list[AnyColumn] = []
+    for column, split in zip(items[start:end], splits[start:end]):
+        assert isinstance(column, Column) and split is not None
+        keys, rest = split
+        remaining = tuple(Member(key) for key in keys[len(prefix) :]) + rest
+        moved.append(replace(column, path_expression=_path(remaining)))
+    nested = NestedPath(
+        _path(tuple(Member(key) for key in prefix)),
+        _factor(
+            ColumnList(moved),
+            _within(tuple(Member(key) for key in prefix), prefixes),
+            min_columns,
+        ),
+    )
+    return ColumnList(items[:start] + [nested] + items[end:])
+
+
+def factor_prefixes(
+    json_table: JsonTable, prefixes: Iterable[str], min_columns: int = 3
+) -> JsonTable:
+    """
+    A copy of `json_table` with the shared path prefixes of its columns
+    factored into nested paths, where they are, or lead, one of
+    `prefixes`: see the module documentation for which are safe
+    """
+    if not json_table.columns:
+        return json_table
+    return replace(
+        json_table, columns=factor_columns(json_table.columns, prefixes, min_columns)
+    )
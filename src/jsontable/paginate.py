@@ -0,0 +1,176 @@
+"""
+Page through the rows of a `JsonQuery` by keyset, rather than with
+`LIMIT ... OFFSET`, which reads and throws away every row before the page.
+
+Rows are ordered by the key of the query's table, then the ordinality
+columns of the JSON_TABLE, and each page starts after the last row of the
+one before, so the index on the key takes the query straight to it:
+
+    page = KeysetQuery(query, key="id", page_size=50, after=token)
+    rows, token = page.fetch(cursor)
+
+`token` is an opaque string standing for the last row, to pass back as
+`after` for the next page, or None after the last page. The key must be
+unique and not NULL, such as a primary key, and every nested path needs
+an `OrdinalityColumn`, as for `materialized_table`.
+"""
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass, replace
+from typing import Any, Generator, Sequence
+
+from psycopg2 import sql
+
+from .materialize import ordinality_columns
+from .render import as_string
+from .table import Frozen, JsonQuery, Rendered
+
+
+class InvalidToken(ValueError):
+    """
+    A token which is malformed, or was given by another query
+    """
+
+
+@dataclass
+class KeysetQuery(Rendered):
+    """
+    The page of `query` of up to `page_size` rows after the row `after`
+    stands for, or the first page. Rows start with the columns of `key`.
+    """
+
+    query: JsonQuery | Frozen
+    key: str | Sequence[str] = "id"
+    page_size: int = 100
+    after: str | None = None
+
+    def _query(self) -> JsonQuery:
+        query = self.query.thaw() if isinstance(self.query, Frozen) else self.query
+        assert isinstance(query, JsonQuery)
+        if not query.table_name:
+            raise ValueError("keyset pagination needs a query of a table")
+        if not query.json_table.columns:
+            raise ValueError("JSON_TABLE has no columns")
+        return query
+
+    def _keys(self) -> list[str]:
+        return [self.key] if isinstance(self.key, str) else list(self.key)
+
+    def _table_columns(self) -> list[str]:
+        keys = self._keys()
+        table_columns = self._query().table_columns or []
+        return [*keys, *(c for c in table_columns if c not in keys)]
+
+    def _ordinals(self) -> list[str]:
+        json_table = self._query().json_table
+        assert json_table.columns
+        return ordinality_columns(json_table.columns, json_table.path_expression)
+
+    def _fingerprint(self) -> str:
+        # Ties a token to the query, key and page size it came from
+        text = json.dumps(
+            [as_string(self._query().as_sql()), self._keys(), self.page_size]
+        )
+        return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+    def _sort_keys(self) -> list[sql.Composable]:
+        query = self._query()
+        return [
+            *(sql.Identifier(query.table_name or "", key) for key in self._keys()),
+            # The ordinals of nested paths are NULL on the rows of their
+            # siblings, and start at 1
+            *(
+                sql.SQL("coalesce({}.{}, 0)").format(
+                    sql.Identifier(query.alias), sql.SQL(name)
+                )
+                for name in self._ordinals()
+            ),
+        ]
+
+    def _position(self) -> list[Any]:
+        """
+        The sort keys of the row `after` stands for
+        """
+        assert self.after is not None
+        try:
+            fingerprint, values = json.loads(base64.urlsafe_b64decode(self.after))
+        except (ValueError, TypeError) as e:
+            raise InvalidToken("malformed token") from e
+        if fingerprint != self._fingerprint():
+            raise InvalidToken("the token is of another query")
+        return values
+
+    def ordered(self) -> JsonQuery:
+        """
+        The query, starting with the key columns, of the rows after `after`
+        """
+        query = self._query()
+        keys = self._keys()
+        where = list(query.where or [])
+        if self.after is not None:
+            position = self._position()
+            # The condition on the first key alone is what an index can use
+            where.append(
+                sql.SQL("{} >= {}").format(
+                    sql.Identifier(query.table_name or "", keys[0]),
+                    sql.Literal(position[0]),
+                )
+            )
+            where.append(
+                sql.SQL("({}) > ({})").format(
+                    sql.SQL(", ").join(self._sort_keys()),
+                    sql.SQL(", ").join(map(sql.Literal, position)),
+                )
+            )
+        return replace(query, where=where or None, table_columns=self._table_columns())
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        yield from self.ordered().as_sql_parts()
+        yield sql.SQL(" ORDER BY {} LIMIT {}").format(
+            sql.SQL(", ").join(self._sort_keys()),
+            # One more row than the page tells whether there is another
+            sql.Literal(self.page_size + 1),
+        )
+
+    def token(self, row: tuple) -> str:
+        """
+        The token of a row of this query, after which the next page starts
+        """
+        query = self._query()
+        assert query.json_table.columns
+        keys = self._keys()
+        offset = len(self._table_columns())
+        positions = {
+            column.name: offset + n
+            for n, column in enumerate(query.json_table.columns.output_columns())
+        }
+        values = [
+            *row[: len(keys)],
+            *(row[positions[name]] or 0 for name in self._ordinals()),
+        ]
+        text = json.dumps([self._fingerprint(), values], default=str)
+        return base64.urlsafe_b64encode(text.encode()).decode()
+
+    def fetch(self, cursor) -> tuple[list[tuple], str | None]:
+        """
+        The rows of this page, and the token of the next page, or None if
+        this is the last
+        """
+        cursor.execute(self.as_sql())
+        rows = cursor.fetchall()
+        if len(rows) <= self.page_size:
+            return rows, None
+        rows = rows[: self.page_size]
+        return rows, self.token(rows[-1])
+
+    def pages(self, cursor) -> Generator[list[tuple], None, None]:
+        """
+        Every page from this one on
+        """
+        page: KeysetQuery | None = self
+        while page is not None:
+            rows, after = page.fetch(cursor)
+            yield rows
+            page = replace(page, after=after) if after else None
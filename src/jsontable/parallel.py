@@ -0,0 +1,299 @@
+"""
+Run a `JsonQuery` over a large table in parallel, on several connections.
+
+The table is split into disjoint partitions, by ranges of `ctid` blocks or
+of a key column, and the query is run over each partition on its own
+connection from a `ConnectionPool`, each streaming through a server side
+cursor. The rows of the partitions are merged as they arrive or, with
+`ordered`, partition by partition:
+
+    executor = ParallelExecutor(pool, max_workers=8)
+    conditions = executor.partition(query, 16)
+    for row in executor.stream(query, conditions):
+        ...
+
+`ctid` ranges need no index, and are read with a TID range scan, but the
+rows of each partition come in the order they are stored. Key ranges are
+split at quantiles of the key, so hold about the same number of rows, and
+are read through an index on the key, if there is one.
+
+Every partition reads the same snapshot, so rows which are updated while
+the query runs are neither missed nor read twice as they move between
+partitions. One connection of the pool exports the snapshot with
+`pg_export_snapshot()` and holds it open while the others import it into
+REPEATABLE READ transactions, so the pool needs at least two connections,
+and they must not be in autocommit. `consistent=False` runs each
+partition in a snapshot of its own instead.
+
+Work is done on the database, so the partitions are run from threads.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any, Generator
+
+from psycopg2 import sql
+
+from .pool import ConnectionPool
+from .render import as_string
+from .table import Frozen, JsonQuery
+
+_DONE = object()
+
+
+def ctid_ranges(connection, table_name: str, partitions: int) -> list[sql.Composed]:
+    """
+    Conditions splitting the blocks of a table into `partitions` ranges.
+    The last range is open, so takes in blocks added since.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int",
+            (as_string(sql.Identifier(table_name)),),
+        )
+        (blocks,) = cursor.fetchone()
+    step = max(1, -(-blocks // partitions))
+    ctid = sql.Identifier(table_name, "ctid")
+    starts = list(range(0, blocks, step)) or [0]
+    conditions = []
+    for n, start in enumerate(starts):
+        lower = sql.SQL("{} >= {}::tid").format(ctid, sql.Literal(f"({start},0)"))
+        if n == len(starts) - 1:
+            conditions.append(lower)
+        else:
+            conditions.append(
+                sql.SQL("{} AND {} < {}::tid").format(
+                    lower, ctid, sql.Literal(f"({start + step},0)")
+                )
+            )
+    return conditions
+
+
+def key_ranges(
+    connection, table_name: str, key: str, partitions: int
+) -> list[sql.Composed]:
+    """
+    Conditions splitting a table into `partitions` ranges of `key` with
+    about as many rows each. Rows where the key is NULL are in none.
+    """
+    column = sql.Identifier(table_name, key)
+    fractions = [n / partitions for n in range(1, partitions)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL(
+                "SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY {}) FROM {}"
+            ).format(column, sql.Identifier(table_name)),
+            (fractions,),
+        )
+        (bounds,) = cursor.fetchone()
+    # Skewed keys may give the same bound more than once
+    unique = sorted({bound for bound in bounds or [] if bound is not None})
+    if not unique:
+        return [sql.SQL("{} IS NOT NULL").format(column)]
+    conditions = [sql.SQL("{} < {}").format(column, sql.Literal(unique[0]))]
+    for lower, upper in zip(unique, unique[1:]):
+        conditions.append(
+            sql.SQL("{} >= {} AND {} < {}").format(
+                column, sql.Literal(lower), column, sql.Literal(upper)
+            )
+        )
+    conditions.append(sql.SQL("{} >= {}").format(column, sql.Literal(unique[-1])))
+    return conditions
+
+
+def _repeatable_read(connection, cursor) -> None:
+    if connection.autocommit:
+        raise ValueError("a snapshot can't be shared by autocommit connections")
+    # psycopg2 has begun the transaction this is the first statement of
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+
+def export_snapshot(connection) -> str:
+    """
+    Begin a REPEATABLE READ transaction on `connection`, and export its
+    snapshot, which other connections can import until it ends
+    """
+    with connection.cursor() as cursor:
+        _repeatable_read(connection, cursor)
+        cursor.execute("SELECT pg_export_snapshot()")
+        (snapshot,) = cursor.fetchone()
+    return snapshot
+
+
+def import_snapshot(connection, snapshot: str) -> None:
+    """
+    Begin a REPEATABLE READ transaction on `connection` which sees what
+    the one which exported `snapshot` does
+    """
+    with connection.cursor() as cursor:
+        _repeatable_read(connection, cursor)
+        cursor.execute(
+            sql.SQL("SET TRANSACTION SNAPSHOT {}").format(sql.Literal(snapshot))
+        )
+
+
+class ParallelExecutor:
+    """
+    Runs the partitions of a query on connections from `pool`, at most
+    `max_workers` (and no more than the pool holds) at a time. Each
+    partition buffers up to `buffer` batches of `itersize` rows which
+    have not been consumed yet. If `consistent`, they all read one
+    snapshot, held by a connection of the pool the whole time.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_workers: int | None = None,
+        itersize: int = 2000,
+        buffer: int = 4,
+        consistent: bool = True,
+    ):
+        if consistent and pool.maxconn < 2:
+            raise ValueError(
+                "a consistent snapshot needs a pool of at least two connections"
+            )
+        self.pool = pool
+        self.consistent = consistent
+        # One connection is left to hold the snapshot
+        workers = pool.maxconn - consistent
+        self.max_workers = min(max_workers or workers, workers)
+        self.itersize = itersize
+        self.buffer = buffer
+
+    @contextmanager
+    def snapshot(self) -> Generator[tuple[Any, str | None], None, None]:
+        """
+        A connection of the pool, and the snapshot it exports if
+        `consistent`, which it holds until the block ends. Queries read on
+        it see what the queries `batches` is given the snapshot for do.
+        """
+        with self.pool.connection() as connection:
+            yield connection, export_snapshot(connection) if self.consistent else None
+
+    def partition(
+        self, query: JsonQuery | Frozen, partitions: int, key: str | None = None
+    ) -> list[sql.Composed]:
+        """
+        Conditions splitting the table of `query`, by ranges of `key` or,
+        without one, of `ctid` blocks
+        """
+        table_name = _thaw(query).table_name
+        if not table_name:
+            raise ValueError("only a query of a table can be partitioned")
+        with self.pool.connection() as connection:
+            if key is None:
+                return ctid_ranges(connection, table_name, partitions)
+            return key_ranges(connection, table_name, key, partitions)
+
+    def stream(
+        self,
+        query: JsonQuery | Frozen,
+        conditions: list[sql.Composed],
+        ordered: bool = False,
+    ) -> Generator[Any, None, None]:
+        """
+        Yield the rows of `query` over each partition `conditions` gives:
+        as they arrive or, if `ordered`, those of the first partition,
+        then of the second and so on. An error in any partition is raised
+        here, and stops the others.
+        """
+        base = _thaw(query)
+        queries = [
+            replace(base, where=[*(base.where or []), condition])
+            for condition in conditions
+        ]
+        for _, batch in self.batches(queries, ordered):
+            yield from batch
+
+    def batches(
+        self,
+        queries: list[JsonQuery],
+        ordered: bool = False,
+        snapshot: str | None = None,
+    ) -> Generator[tuple[int, list[Any]], None, None]:
+        """
+        Run each of `queries` on its own connection, and yield the index of
+        the query and a batch of its rows, in the order `stream` would.
+        If `consistent`, they read `snapshot`, from `snapshot()`, or else
+        one exported for them.
+        """
+        if snapshot is None and self.consistent:
+            with self.snapshot() as (_, exported):
+                yield from self._batches(queries, ordered, exported)
+        else:
+            yield from self._batches(queries, ordered, snapshot)
+
+    def _batches(
+        self, queries: list[JsonQuery], ordered: bool, snapshot: str | None
+    ) -> Generator[tuple[int, list[Any]], None, None]:
+        # Ordered, each partition has its own queue, read in turn;
+        # otherwise they share one
+        shared: queue.Queue = queue.Queue(self.buffer * self.max_workers)
+        queues = [queue.Queue(self.buffer) if ordered else shared for _ in queries]
+        stop = threading.Event()
+
+        def put(target: queue.Queue, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def work(n: int, partition: JsonQuery):
+            if stop.is_set():
+                return
+            try:
+                with self.pool.connection() as connection:
+                    if snapshot is not None:
+                        import_snapshot(connection, snapshot)
+                    batches = partition.stream(connection, self.itersize, batches=True)
+                    try:
+                        for batch in batches:
+                            if not put(queues[n], (n, batch)):
+                                return
+                    finally:
+                        batches.close()
+                put(queues[n], (n, _DONE))
+            except BaseException as e:
+                put(queues[n], (n, e))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as threads:
+            try:
+                for n, partition in enumerate(queries):
+                    threads.submit(work, n, partition)
+                pending = len(queries)
+                reading = 0
+                while pending:
+                    n, item = queues[reading].get()
+                    if item is _DONE:
+                        pending -= 1
+                        reading += ordered
+                    elif isinstance(item, BaseException):
+                        raise item
+                    else:
+                        yield n, item
+            finally:
+                stop.set()
+                # Partitions which haven't started never will
+                threads.shutdown(cancel_futures=True)
+
+    def fetch_all(
+        self,
+        query: JsonQuery | Frozen,
+        conditions: list[sql.Composed],
+        ordered: bool = False,
+    ) -> list[Any]:
+        return list(self.stream(query, conditions, ordered))
+
+
+def _thaw(query: JsonQuery | Frozen) -> JsonQuery:
+    if isinstance(query, Frozen):
+        query = query.thaw()  # type: ignore
+    assert isinstance(query, JsonQuery)
+    return query
@@ -0,0 +1,1649 @@
+"""
+A parser and evaluator for SQL/JSON path expressions, following the
+behaviour of PostgreSQL's `jsonpath`.
+
+`parse_path` turns an expression into a `JsonPath`, whose `expression` is
+a tree of the node classes below. Parsed paths are kept in `path_cache`,
+so each distinct expression is parsed once; a `JsonPath` can then be
+evaluated against any number of (already parsed) JSON documents, or
+turned back into text with `str()`.
+"""
+
+import copy
+import datetime
+import functools
+import json
+import math
+import re
+from dataclasses import dataclass, fields, replace
+from decimal import ROUND_HALF_UP, Context, Decimal, InvalidOperation
+from typing import Any, Callable, Iterable, Iterator, Literal, Mapping, Union
+
+from .cache import RenderCache
+
+Mode = Literal["lax", "strict"]
+
+
+class JsonPathSyntaxError(ValueError):
+    """
+    A malformed path expression. `position` is the offset in `text` at
+    which parsing failed.
+    """
+
+    def __init__(self, message: str, text: str, position: int):
+        super().__init__(message)
+        self.text = text
+        self.position = position
+
+
+class PathError(Exception):
+    """
+    An error evaluating a path, such as an accessor applied to the wrong
+    kind of item in strict mode or arithmetic on a string
+    """
+
+
+# Nodes of the syntax tree
+
+
+@dataclass(frozen=True)
+class Root:
+    """`$`"""
+
+
+@dataclass(frozen=True)
+class Current:
+    """`@`"""
+
+
+@dataclass(frozen=True)
+class Variable:
+    """`$name`"""
+
+    name: str
+
+
+@dataclass(frozen=True)
+class Last:
+    """`last`, inside an array subscript"""
+
+
+@dataclass(frozen=True)
+class Value:
+    """A string, number, boolean or null literal. Numbers are ints, or
+    Decimals as written."""
+
+    value: str | int | float | Decimal | bool | None
+
+
+@dataclass(frozen=True)
+class Member:
+    """`.key` or `."key"`"""
+
+    key: str
+
+
+@dataclass(frozen=True)
+class AnyMember:
+    """`.*`"""
+
+
+@dataclass(frozen=True)
+class AnyItem:
+    """`[*]`"""
+
+
+@dataclass(frozen=True)
+class Index:
+    """A single subscript, or a range `start to end`"""
+
+    start: "Node"
+    end: "Node | None" = None
+
+
+@dataclass(frozen=True)
+class Subscript:
+    """`[0]`, `[1, 3 to last]`"""
+
+    indexes: tuple[Index, ...]
+
+
+@dataclass(frozen=True)
+class Descendants:
+    """`.**`, `.**{2}`, `.**{1 to last}`. `None` stands for `last`."""
+
+    start: int | None = 0
+    end: int | None = None
+
+
+@dataclass(frozen=True)
+class Filter:
+    """`? (predicate)`"""
+
+    predicate: "Node"
+
+
+@dataclass(frozen=True)
+class Method:
+    """`.type()`, `.decimal(10, 2)`, `.datetime("HH24:MI")`..."""
+
+    name: str
+    arguments: tuple[str | int, ...] = ()
+
+
+@dataclass(frozen=True)
+class Path:
+    """A primary followed by accessors: `$.a[*] ? (@ > 1)`"""
+
+    start: "Node"
+    accessors: tuple["Accessor", ...] = ()
+
+
+@dataclass(frozen=True)
+class Unary:
+    """`-x`, `+x`"""
+
+    op: str
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class Binary:
+    """`x + y`, `x * y`..."""
+
+    op: str
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """`x == y`, `x < y`..."""
+
+    op: str
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class Or:
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class Exists:
+    """`exists (path)`"""
+
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class IsUnknown:
+    """`(predicate) is unknown`"""
+
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class LikeRegex:
+    """`x like_regex "pattern" flag "i"`"""
+
+    operand: "Node"
+    pattern: str
+    flags: str = ""
+
+
+@dataclass(frozen=True)
+class StartsWith:
+    """`x starts with "prefix"` or `x starts with $var`"""
+
+    operand: "Node"
+    prefix: "Node"
+
+
+Accessor = Union[Member, AnyMember, AnyItem, Subscript, Descendants, Filter, Method]
+Node = Union[
+    Root,
+    Current,
+    Variable,
+    Last,
+    Value,
+    Path,
+    Unary,
+    Binary,
+    Comparison,
+    And,
+    Or,
+    Not,
+    Exists,
+    IsUnknown,
+    LikeRegex,
+    StartsWith,
+]
+PREDICATES = (Comparison, And, Or, Not, Exists, IsUnknown, LikeRegex, StartsWith)
+
+# Each method, and the optional arguments it takes: a string template, a
+# precision, or an integer which may be negative, as a scale may
+METHODS: dict[str, tuple[Literal["string", "unsigned", "signed"], ...]] = {
+    "type": (),
+    "size": (),
+    "double": (),
+    "ceiling": (),
+    "floor": (),
+    "abs": (),
+    "keyvalue": (),
+    "bigint": (),
+    "boolean": (),
+    "integer": (),
+    "number": (),
+    "string": (),
+    "decimal": ("signed", "signed"),
+    "datetime": ("string",),
+    "date": (),
+    "time": ("unsigned",),
+    "time_tz": ("unsigned",),
+    "timestamp": ("unsigned",),
+    "timestamp_tz": ("unsigned",),
+}
+
+
+# Parsing
+
+_TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+  | (?P<number>
+        (?:0[xX](?:_?[0-9A-Fa-f])+|0[oO](?:_?[0-7])+|0[bB](?:_?[01])+
+          |(?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)
+           (?:[eE][+-]?\d(?:_?\d)*)?)
+        # `1abc` is trailing junk, not a number and a name
+        (?![A-Za-z0-9_]))
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<variable>\$(?:[A-Za-z_][A-Za-z0-9_]*|"(?:[^"\\]|\\.)*"))
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>\*\*|==|!=|<>|<=|>=|&&|\|\||[$@.\[\](),*?<>!+\-/%{}])
+    """,
+    re.VERBOSE,
+)
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+}
+
+
+def _unescape(quoted: str) -> str:
+    def replace(match: re.Match) -> str:
+        escape = match.group(1)
+        if escape[0] in "ux":
+            return chr(int(escape[1:].strip("{}"), 16))
+        return _ESCAPES.get(escape, escape)
+
+    return re.sub(
+        r"\\(u\{[0-9A-Fa-f]+\}|u[0-9A-Fa-f]{4}|x[0-9A-Fa-f]{2}|.)",
+        replace,
+        quoted[1:-1],
+    )
+
+
+def _number(text: str) -> int | Decimal:
+    """
+    The value of a numeric literal: an int, or a Decimal keeping the
+    digits written
+    """
+    if text[:2].lower() in ("0x", "0o", "0b"):
+        return int(text, 0)
+    if re.fullmatch(r"[\d_]+", text):
+        return int(text)
+    return Decimal(text.replace("_", ""))
+
+
+@dataclass
+class _Token:
+    kind: str
+    text: str
+    position: int
+
+
+def _tokenize(text: str) -> list[_Token]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match:
+            raise JsonPathSyntaxError(
+                f"syntax error in JSON path {text!r} at position {position}",
+                text,
+                position,
+            )
+        kind = match.lastgroup
+        assert kind is not None
+        if kind != "space":
+            tokens.append(_Token(kind, match.group(), position))
+        position = match.end()
+    tokens.append(_Token("end", "", len(text)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+        # How many array subscripts enclose the token, where `last` may be
+        self.subscripts = 0
+
+    @property
+    def token(self) -> _Token:
+        return self.tokens[self.position]
+
+    def error(self, message: str = "unexpected token") -> JsonPathSyntaxError:
+        token = self.token
+        found = repr(token.text) if token.kind != "end" else "end of input"
+        return JsonPathSyntaxError(
+            f"{message} in JSON path {self.text!r} at position "
+            f"{token.position}: {found}",
+            self.text,
+            token.position,
+        )
+
+    def peek(self, *texts: str, kind: str | None = None) -> bool:
+        token = self.token
+        if kind is not None and token.kind != kind:
+            return False
+        return not texts or token.text in texts
+
+    def next(self) -> _Token:
+        token = self.token
+        self.position += 1
+        return token
+
+    def accept(self, *texts: str, kind: str | None = None) -> _Token | None:
+        if self.peek(*texts, kind=kind):
+            return self.next()
+        return None
+
+    def expect(self, *texts: str, kind: str | None = None) -> _Token:
+        token = self.accept(*texts, kind=kind)
+        if token is None:
+            raise self.error(f"expected {' or '.join(texts or (kind or '',))}")
+        return token
+
+    def parse(self) -> tuple[Mode, Node]:
+        mode: Mode = "lax"
+        if self.peek("lax", "strict", kind="name"):
+            mode = "strict" if self.next().text == "strict" else "lax"
+        node = self.or_()
+        if not self.peek(kind="end"):
+            raise self.error()
+        return mode, node
+
+    def or_(self) -> Node:
+        node = self.and_()
+        while self.accept("||"):
+            node = Or(node, self.and_())
+        return node
+
+    def and_(self) -> Node:
+        node = self.not_()
+        while self.accept("&&"):
+            node = And(node, self.not_())
+        return node
+
+    def not_(self) -> Node:
+        if not self.accept("!"):
+            return self.predicate()
+        # Only a predicate in parentheses, or exists, may be negated
+        if self.peek("exists", kind="name"):
+            node = self.predicate()
+            if not isinstance(node, Exists):
+                raise self.error("expected a predicate")
+            return Not(node)
+        self.expect("(")
+        node = self.or_()
+        if not _is_predicate(node):
+            raise self.error("expected a predicate")
+        self.expect(")")
+        return Not(node)
+
+    def predicate(self) -> Node:
+        if (
+            self.peek("exists", kind="name")
+            and self.tokens[self.position + 1].text == "("
+        ):
+            self.next()
+            self.expect("(")
+            node: Node = Exists(self.or_())
+            self.expect(")")
+            return node
+        node = self.additive()
+        if self.peek("==", "!=", "<>", "<", "<=", ">", ">="):
+            op = self.next().text
+            return Comparison("!=" if op == "<>" else op, node, self.additive())
+        if self.accept("like_regex", kind="name"):
+            pattern = _unescape(self.expect(kind="string").text)
+            flags = ""
+            if self.accept("flag", kind="name"):
+                flags = _unescape(self.expect(kind="string").text)
+                if set(flags) - set("isxmq"):
+                    raise self.error(f"invalid like_regex flags {flags!r}")
+            return LikeRegex(node, pattern, flags)
+        if self.accept("starts", kind="name"):
+            self.expect("with")
+            if self.peek(kind="variable"):
+                return StartsWith(node, self.primary())
+            return StartsWith(node, Value(_unescape(self.expect(kind="string").text)))
+        if self.peek("is", kind="name"):
+            if not _is_predicate(node):
+                raise self.error("IS UNKNOWN requires a predicate")
+            self.next()
+            self.expect("unknown")
+            return IsUnknown(node)
+        return node
+
+    def additive(self) -> Node:
+        node = self.multiplicative()
+        while self.peek("+", "-"):
+            node = Binary(self.next().text, node, self.multiplicative())
+        return node
+
+    def multiplicative(self) -> Node:
+        node = self.unary()
+        while self.peek("*", "/", "%"):
+            node = Binary(self.next().text, node, self.unary())
+        return node
+
+    def unary(self) -> Node:
+        if self.peek("+", "-"):
+            op = self.next().text
+            return Unary(op, self.unary())
+        return self.accessors(self.primary())
+
+    def primary(self) -> Node:
+        token = self.token
+        if token.kind == "op" and token.text == "$":
+            self.next()
+            return Root()
+        if token.kind == "op" and token.text == "@":
+            self.next()
+            return Current()
+        if token.kind == "variable":
+            self.next()
+            name = token.text[1:]
+            return Variable(_unescape(name) if name.startswith('"') else name)
+        if token.kind == "number":
+            self.next()
+            return Value(_number(token.text))
+        if token.kind == "string":
+            self.next()
+            return Value(_unescape(token.text))
+        if token.kind == "name" and token.text in ("true", "false", "null", "last"):
+            if token.text == "last":
+                if not self.subscripts:
+                    raise self.error("LAST is allowed only in array subscripts")
+                self.next()
+                return Last()
+            self.next()
+            return Value({"true": True, "false": False, "null": None}[token.text])
+        if self.accept("("):
+            node = self.or_()
+            self.expect(")")
+            return node
+        raise self.error()
+
+    def accessors(self, node: Node) -> Node:
+        accessors: list[Accessor] = []
+        while True:
+            if self.accept("."):
+                accessors.append(self.dot())
+            elif self.accept("["):
+                if self.accept("*"):
+                    self.expect("]")
+                    accessors.append(AnyItem())
+                else:
+                    accessors.append(self.subscript())
+            elif self.accept("?"):
+                self.expect("(")
+                predicate = self.or_()
+                self.expect(")")
+                accessors.append(Filter(predicate))
+            else:
+                break
+        if not accessors:
+            return node
+        if isinstance(node, Path):
+            return Path(node.start, node.accessors + tuple(accessors))
+        return Path(node, tuple(accessors))
+
+    def dot(self) -> Accessor:
+        if self.accept("*"):
+            return AnyMember()
+        if self.accept("**"):
+            if not self.accept("{"):
+                return Descendants()
+            start = self.level()
+            end = self.level() if self.accept("to", kind="name") else start
+            self.expect("}")
+            return Descendants(start, end)
+        token = self.token
+        if token.kind == "string":
+            self.next()
+            return Member(_unescape(token.text))
+        if token.kind == "name":
+            self.next()
+            if self.accept("("):
+                if token.text not in METHODS:
+                    raise self.error(f"unknown method {token.text}()")
+                return Method(token.text, self.arguments(METHODS[token.text]))
+            return Member(token.text)
+        raise self.error("expected a key")
+
+    def arguments(self, kinds: tuple[str, ...]) -> tuple[str | int, ...]:
+        arguments: list[str | int] = []
+        while not self.accept(")"):
+            if len(arguments) == len(kinds):
+                raise self.error("too many arguments")
+            if arguments:
+                self.expect(",")
+            kind = kinds[len(arguments)]
+            if kind == "string":
+                arguments.append(_unescape(self.expect(kind="string").text))
+                continue
+            sign = self.accept("+", "-") if kind == "signed" else None
+            value = self.integer()
+            arguments.append(-value if sign and sign.text == "-" else value)
+        return tuple(arguments)
+
+    def integer(self) -> int:
+        value = _number(self.token.text) if self.peek(kind="number") else None
+        if not isinstance(value, int):
+            raise self.error("expected an integer")
+        self.next()
+        return value
+
+    def level(self) -> int | None:
+        if self.accept("last", kind="name"):
+            return None
+        return self.integer()
+
+    def subscript(self) -> Subscript:
+        indexes = []
+        while True:
+            self.subscripts += 1
+            start = self.additive()
+            end = self.additive() if self.accept("to", kind="name") else None
+            self.subscripts -= 1
+            indexes.append(Index(start, end))
+            if self.accept("]"):
+                return Subscript(tuple(indexes))
+            self.expect(",")
+
+
+def _is_predicate(node: Node) -> bool:
+    return isinstance(node, PREDICATES)
+
+
+def _variables(node: Any) -> Iterator[str]:
+    if isinstance(node, Variable):
+        yield node.name
+    elif isinstance(node, tuple):
+        for item in node:
+            yield from _variables(item)
+    elif hasattr(node, "__dataclass_fields__"):
+        for f in fields(node):
+            yield from _variables(getattr(node, f.name))
+
+
+def _bind(node: Any, variables: Mapping[str, Any]) -> Any:
+    if isinstance(node, Variable) and node.name in variables:
+        value = variables[node.name]
+        if isinstance(value, (list, dict)):
+            raise TypeError(f"${node.name} is not a scalar")
+        return Value(value)
+    if isinstance(node, tuple):
+        return tuple(_bind(item, variables) for item in node)
+    if hasattr(node, "__dataclass_fields__"):
+        changes = {
+            f.name: _bind(getattr(node, f.name), variables) for f in fields(node)
+        }
+        return replace(node, **changes)
+    return node
+
+
+# Serialization
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Binding strength of each operator, loosest first; operands which bind
+# more loosely than their position allows are parenthesized
+_PRECEDENCE = {"||": 1, "&&": 2, "!": 3, "==": 4, "+": 5, "*": 6, "-x": 7}
+_PRIMARY = 8
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (float, Decimal)) and not math.isfinite(value):
+        raise ValueError(f"{value} can't be written in a JSON path")
+    if isinstance(value, Decimal):
+        # As Postgres writes numbers, without an exponent
+        return format(value, "f")
+    if isinstance(value, (int, float)):
+        return str(value) if not isinstance(value, float) else repr(value)
+    raise TypeError(f"{type(value).__name__} can't be written in a JSON path")
+
+
+def _format_accessor(accessor: Accessor) -> str:
+    if isinstance(accessor, Member):
+        if _IDENTIFIER.fullmatch(accessor.key):
+            return "." + accessor.key
+        return "." + json.dumps(accessor.key, ensure_ascii=False)
+    if isinstance(accessor, AnyMember):
+        return ".*"
+    if isinstance(accessor, AnyItem):
+        return "[*]"
+    if isinstance(accessor, Subscript):
+        return (
+            "["
+            + ", ".join(
+                format_node(index.start)
+                + ("" if index.end is None else " to " + format_node(index.end))
+                for index in accessor.indexes
+            )
+            + "]"
+        )
+    if isinstance(accessor, Descendants):
+        if accessor.start == 0 and accessor.end is None:
+            return ".**"
+        start, end = (
+            "last" if level is None else str(level)
+            for level in (accessor.start, accessor.end)
+        )
+        return f".**{{{start}}}" if start == end else f".**{{{start} to {end}}}"
+    if isinstance(accessor, Filter):
+        return f" ? ({format_node(accessor.predicate)})"
+    arguments = ", ".join(_format_value(argument) for argument in accessor.arguments)
+    return f".{accessor.name}({arguments})"
+
+
+def _precedence(node: Node) -> int:
+    if isinstance(node, Or):
+        return _PRECEDENCE["||"]
+    if isinstance(node, And):
+        return _PRECEDENCE["&&"]
+    if isinstance(node, Not):
+        return _PRECEDENCE["!"]
+    if isinstance(node, (Comparison, LikeRegex, StartsWith, IsUnknown)):
+        return _PRECEDENCE["=="]
+    if isinstance(node, Binary):
+        return _PRECEDENCE["+" if node.op in "+-" else "*"]
+    if isinstance(node, Unary):
+        return _PRECEDENCE["-x"]
+    return _PRIMARY
+
+
+def format_node(node: Node, precedence: int = 0) -> str:
+    """
+    Write a node back out as path text, parenthesized if it binds more
+    loosely than `precedence`
+    """
+    text = _format_node(node)
+    if _precedence(node) < precedence:
+        return f"({text})"
+    return text
+
+
+def _format_node(node: Node) -> str:
+    if isinstance(node, Root):
+        return "$"
+    if isinstance(node, Current):
+        return "@"
+    if isinstance(node, Last):
+        return "last"
+    if isinstance(node, Variable):
+        if _IDENTIFIER.fullmatch(node.name):
+            return "$" + node.name
+        return "$" + json.dumps(node.name, ensure_ascii=False)
+    if isinstance(node, Value):
+        return _format_value(node.value)
+    if isinstance(node, Path):
+        start = format_node(node.start, _PRIMARY)
+        if isinstance(node.start, Value) and not isinstance(node.start.value, str):
+            # `1.type()` would read as the number `1.`
+            start = f"({start})"
+        return start + "".join(_format_accessor(a) for a in node.accessors)
+    if isinstance(node, Or):
+        return f"{format_node(node.left, 1)} || {format_node(node.right, 2)}"
+    if isinstance(node, And):
+        return f"{format_node(node.left, 2)} && {format_node(node.right, 3)}"
+    if isinstance(node, Not):
+        return f"!({format_node(node.operand)})"
+    if isinstance(node, IsUnknown):
+        return f"({format_node(node.operand)}) is unknown"
+    if isinstance(node, Exists):
+        return f"exists ({format_node(node.operand)})"
+    if isinstance(node, Comparison):
+        return f"{format_node(node.left, 5)} {node.op} {format_node(node.right, 5)}"
+    if isinstance(node, LikeRegex):
+        text = (
+            f"{format_node(node.operand, 5)} like_regex {_format_value(node.pattern)}"
+        )
+        return text + (f" flag {_format_value(node.flags)}" if node.flags else "")
+    if isinstance(node, StartsWith):
+        return f"{format_node(node.operand, 5)} starts with {format_node(node.prefix)}"
+    if isinstance(node, Binary):
+        precedence = _precedence(node)
+        return (
+            f"{format_node(node.left, precedence)} {node.op} "
+            f"{format_node(node.right, precedence + 1)}"
+        )
+    if isinstance(node, Unary):
+        return node.op + format_node(node.operand, _PRIMARY)
+    raise TypeError(f"{type(node).__name__} is not a JSON path node")
+
+
+# Evaluation
+
+
+def _kind(item: Any) -> str:
+    if item is None:
+        return "null"
+    if isinstance(item, datetime.datetime):
+        zone = "with" if item.tzinfo else "without"
+        return f"timestamp {zone} time zone"
+    if isinstance(item, datetime.date):
+        return "date"
+    if isinstance(item, datetime.time):
+        return f"time {'with' if item.tzinfo else 'without'} time zone"
+    if isinstance(item, bool):
+        return "boolean"
+    if isinstance(item, (int, float, Decimal)):
+        return "number"
+    if isinstance(item, str):
+        return "string"
+    if isinstance(item, list):
+        return "array"
+    if isinstance(item, dict):
+        return "object"
+    raise PathError(f"{type(item).__name__} is not a JSON value")
+
+
+_COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+_ARITHMETIC: dict[str, Callable[[Any, Any], Any]] = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "%": lambda a, b: (
+        a - b * int(a / b)
+        if isinstance(a, int) and isinstance(b, int)
+        else math.fmod(a, b)
+        if isinstance(a, float) or isinstance(b, float)
+        else a % b
+    ),
+}
+
+
+def _coerce(a: Any, b: Any) -> tuple[Any, Any]:
+    """
+    Literals are Decimals and parsed documents may hold floats, which
+    Python won't mix in arithmetic
+    """
+    if isinstance(a, float) and isinstance(b, Decimal):
+        return a, float(b)
+    if isinstance(a, Decimal) and isinstance(b, float):
+        return float(a), b
+    return a, b
+
+
+def _compare(op: str, left: Any, right: Any) -> bool | None:
+    left_kind, right_kind = _kind(left), _kind(right)
+    if left_kind in ("array", "object") or right_kind in ("array", "object"):
+        return None
+    if left_kind != right_kind:
+        if "null" in (left_kind, right_kind):
+            return op == "!="
+        return None
+    if left_kind == "null":
+        return op in ("==", "<=", ">=")
+    return _COMPARISONS[op](left, right)
+
+
+def _regex_flags(flags: str) -> int:
+    value = 0
+    for flag, re_flag in (("i", re.I), ("s", re.S), ("m", re.M), ("x", re.X)):
+        if flag in flags:
+            value |= re_flag
+    return value
+
+
+# Item methods converting an item to another type, as Postgres 17 does
+
+
+def _numeric_text(number: float | Decimal) -> str:
+    if isinstance(number, int):
+        return str(number)
+    if isinstance(number, float):
+        number = Decimal(repr(number))
+    return format(number, "f")
+
+
+def _invalid(item: Any, method: str, type_: str) -> PathError:
+    text = _numeric_text(item) if _kind(item) == "number" else item
+    return PathError(
+        f'argument "{text}" of jsonpath item method .{method}() is invalid '
+        f"for type {type_}"
+    )
+
+
+def _not_applicable(method: str, kinds: str) -> PathError:
+    return PathError(f"jsonpath item method .{method}() can only be applied to {kinds}")
+
+
+def _double(item: Any) -> float:
+    kind = _kind(item)
+    if kind == "string":
+        try:
+            value = float(item)
+        except ValueError:
+            raise _invalid(item, "double", "double precision")
+    elif kind == "number":
+        value = float(item)
+    else:
+        raise _not_applicable("double", "a string or numeric value")
+    if math.isinf(value) or math.isnan(value):
+        raise PathError(
+            "NaN or Infinity is not allowed for jsonpath item method .double()"
+        )
+    return value
+
+
+def _integer(method: str, bits: int) -> Callable[[Any], int]:
+    limit = 2 ** (bits - 1)
+
+    def convert(item: Any) -> int:
+        kind = _kind(item)
+        if kind == "number":
+            value = int(_decimal(item, method).to_integral_value(ROUND_HALF_UP))
+        elif kind == "string" and re.fullmatch(r"\s*[+-]?\d+\s*", item):
+            value = int(item)
+        elif kind == "string":
+            raise _invalid(item, method, method)
+        else:
+            raise _not_applicable(method, "a string or numeric value")
+        if not -limit <= value < limit:
+            raise _invalid(item, method, method)
+        return value
+
+    return convert
+
+
+def _decimal(item: Any, method: str) -> Decimal:
+    kind = _kind(item)
+    if kind == "number":
+        value = Decimal(repr(item)) if isinstance(item, float) else Decimal(item)
+    elif kind == "string":
+        try:
+            value = Decimal(item.strip())
+        except InvalidOperation:
+            raise _invalid(item, method, "numeric")
+    else:
+        raise _not_applicable(method, "a string or numeric value")
+    if not value.is_finite():
+        raise PathError(
+            f"NaN or Infinity is not allowed for jsonpath item method .{method}()"
+        )
+    return value
+
+
+def _to_number(item: Any) -> Any:
+    return item if _kind(item) == "number" else _decimal(item, "number")
+
+
+def _numeric(item: Any, precision: int | None = None, scale: int = 0) -> Decimal:
+    """
+    `.decimal(precision, scale)`, rounding as `numeric(precision, scale)`
+    """
+    value = _decimal(item, "decimal")
+    if precision is None:
+        return value
+    if not 1 <= precision <= 1000:
+        raise PathError(f"NUMERIC precision {precision} must be between 1 and 1000")
+    if not -1000 <= scale <= 1000:
+        raise PathError(f"NUMERIC scale {scale} must be between -1000 and 1000")
+    value = value.quantize(Decimal(1).scaleb(-scale), ROUND_HALF_UP, Context(prec=2100))
+    if value and value.adjusted() >= precision - scale:
+        raise PathError("numeric field overflow")
+    return value
+
+
+# The words `boolin` reads, which may be abbreviated
+_BOOLEANS = {"true": True, "yes": True, "on": True, "1": True}
+_BOOLEANS.update({"false": False, "no": False, "off": False, "0": False})
+
+
+def _boolean(item: Any) -> bool:
+    kind = _kind(item)
+    if kind == "boolean":
+        return item
+    if kind == "number":
+        if item != int(item):
+            raise _invalid(item, "boolean", "boolean")
+        return item != 0
+    if kind != "string":
+        raise _not_applicable("boolean", "a boolean, string, or numeric value")
+    word = item.strip().lower()
+    for full, value in _BOOLEANS.items():
+        # `o` alone could be either on or off
+        if word and full.startswith(word) and (len(word) > 1 or word != "o"):
+            return value
+    raise _invalid(item, "boolean", "boolean")
+
+
+def _string(item: Any) -> str:
+    kind = _kind(item)
+    if kind == "string":
+        return item
+    if kind == "number":
+        return _numeric_text(item)
+    if kind == "boolean":
+        return "true" if item else "false"
+    if isinstance(item, (datetime.date, datetime.time)):
+        return datetime_text(item)
+    raise _not_applicable("string", "a boolean, string, numeric, or datetime value")
+
+
+def datetime_text(value: datetime.date | datetime.time) -> str:
+    """
+    A datetime item as Postgres writes it into JSON: ISO 8601, with no
+    more fractional digits than it needs
+    """
+    return re.sub(
+        r"\.(\d*?)0*(?=[+-]|$)",
+        lambda match: "." + match[1] if match[1] else "",
+        value.isoformat(),
+    )
+
+
+# What `.datetime()` recognizes without a template: a date, a time, or
+# both, either with a time zone offset
+_ISO_DATETIME = re.compile(
+    r"(?:(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2}))?"
+    r"(?:(?(year)[ T])(?P<hour>\d{1,2}):(?P<minute>\d{1,2}):(?P<second>\d{1,2})"
+    r"(?:\.(?P<us>\d{1,6}))?(?:(?P<tzh>[+-]\d{1,2})(?::(?P<tzm>\d{2}))?)?)?"
+)
+
+# Template patterns of `.datetime(template)`, longest first, and what
+# they read
+_TEMPLATE_FIELDS = [
+    ("HH24", "hour", r"\d{1,2}"),
+    ("HH12", "hour12", r"\d{1,2}"),
+    ("HH", "hour12", r"\d{1,2}"),
+    ("MI", "minute", r"\d{1,2}"),
+    ("SS", "second", r"\d{1,2}"),
+    ("MS", "ms", r"\d{1,3}"),
+    ("US", "us", r"\d{1,6}"),
+    *((f"FF{n}", "us", rf"\d{{1,{n}}}") for n in range(6, 0, -1)),
+    ("A.M.", "meridiem", r"[AaPp]\.[Mm]\."),
+    ("P.M.", "meridiem", r"[AaPp]\.[Mm]\."),
+    ("AM", "meridiem", r"[AaPp][Mm]"),
+    ("PM", "meridiem", r"[AaPp][Mm]"),
+    ("YYYY", "year", r"\d{4}"),
+    ("YY", "year2", r"\d{2}"),
+    ("MONTH", "month_name", r"[A-Za-z]+"),
+    ("MON", "month_name", r"[A-Za-z]{3}"),
+    ("MM", "month", r"\d{1,2}"),
+    ("DD", "day", r"\d{1,2}"),
+    ("TZH", "tzh", r"[+-]\d{1,2}"),
+    ("TZM", "tzm", r"\d{2}"),
+]
+_DATE_FIELDS = {"year", "year2", "month", "month_name", "day"}
+_MONTHS = [
+    "jan", "feb", "mar", "apr", "may", "jun",
+    "jul", "aug", "sep", "oct", "nov", "dec",
+]  # fmt: skip
+
+
+@functools.lru_cache(maxsize=256)
+def _template(template: str) -> re.Pattern:
+    """
+    A regular expression of what `template` reads, with a group for each
+    field. Separators match any separator, as to_timestamp's do.
+    """
+    pattern = []
+    seen = set()
+    position = 0
+    while position < len(template):
+        if template[position] == '"':
+            end = template.find('"', position + 1)
+            end = len(template) if end < 0 else end
+            pattern.append(re.escape(template[position + 1 : end]))
+            position = end + 1
+            continue
+        for token, name, field in _TEMPLATE_FIELDS:
+            if template[position:].upper().startswith(token):
+                # A field read twice must be read the same both times
+                pattern.append(
+                    f"(?P={name})" if name in seen else f"(?P<{name}>{field})"
+                )
+                seen.add(name)
+                position += len(token)
+                break
+        else:
+            char = template[position]
+            if char.isspace():
+                pattern.append(r"\s*")
+            elif char.isalnum():
+                pattern.append(re.escape(char))
+            else:
+                pattern.append(r"[^A-Za-z0-9\s]")
+            position += 1
+    return re.compile(r"\s*" + "".join(pattern) + r"\s*")
+
+
+def _fraction(digits: str | None, places: int) -> int:
+    return int(digits.ljust(places, "0")) if digits else 0
+
+
+def _build(fields: dict[str, str | None], date: bool, time: bool) -> Any:
+    year = int(fields.get("year") or 1)
+    if fields.get("year2"):
+        year = int(fields["year2"] or 0)
+        year += 2000 if year < 70 else 1900
+    month = int(fields.get("month") or 1)
+    if fields.get("month_name"):
+        month = _MONTHS.index((fields["month_name"] or "")[:3].lower()) + 1
+    hour = int(fields.get("hour") or 0)
+    if fields.get("hour12"):
+        hour = int(fields["hour12"] or 0)
+        if not 1 <= hour <= 12:
+            raise ValueError("hour is out of range for a 12-hour clock")
+        hour %= 12
+        if (fields.get("meridiem") or "a")[0] in "Pp":
+            hour += 12
+    tzinfo = None
+    if fields.get("tzh"):
+        hours = int(fields["tzh"] or 0)
+        minutes = int(fields.get("tzm") or 0)
+        sign = -1 if (fields["tzh"] or "").startswith("-") else 1
+        tzinfo = datetime.timezone(
+            datetime.timedelta(hours=hours, minutes=sign * minutes)
+        )
+    time_fields = (
+        hour,
+        int(fields.get("minute") or 0),
+        int(fields.get("second") or 0),
+        _fraction(fields.get("us"), 6) + 1000 * _fraction(fields.get("ms"), 3),
+    )
+    day = int(fields.get("day") or 1)
+    if date and time:
+        return datetime.datetime(year, month, day, *time_fields, tzinfo=tzinfo)
+    if date:
+        return datetime.date(year, month, day)
+    return datetime.time(*time_fields, tzinfo=tzinfo)
+
+
+def _datetime(item: Any, template: str | None = None) -> Any:
+    if not isinstance(item, str):
+        raise _not_applicable("datetime", "a string")
+    if template is None:
+        match = _ISO_DATETIME.fullmatch(item)
+        date = bool(match and match["year"])
+        time = bool(match and match["hour"])
+    else:
+        pattern = _template(template)
+        match = pattern.fullmatch(item)
+        date = bool(_DATE_FIELDS & set(pattern.groupindex))
+        time = bool(set(pattern.groupindex) - _DATE_FIELDS)
+    if not match or not (date or time):
+        raise PathError(f'datetime format is not recognized: "{item}"')
+    try:
+        return _build(match.groupdict(), date, time)
+    except ValueError as e:
+        raise PathError(f'invalid datetime "{item}": {e}')
+
+
+# The methods which convert to a datetime type, and its kind
+_DATETIME_KINDS = {
+    "date": "date",
+    "time": "time without time zone",
+    "time_tz": "time with time zone",
+    "timestamp": "timestamp without time zone",
+    "timestamp_tz": "timestamp with time zone",
+}
+_DATETIME_NAMES = {
+    kind: method.replace("_", "") for method, kind in _DATETIME_KINDS.items()
+}
+
+# Conversions between datetime kinds which don't need the session's time
+# zone, and so are allowed
+_DATETIME_CASTS: dict[tuple[str, str], Callable[[Any], Any]] = {
+    ("timestamp without time zone", "date"): lambda value: value.date(),
+    ("timestamp without time zone", "time without time zone"): lambda value: (
+        value.time()
+    ),
+    ("timestamp with time zone", "time with time zone"): lambda value: value.timetz(),
+    ("time with time zone", "time without time zone"): lambda value: value.replace(
+        tzinfo=None
+    ),
+    ("date", "timestamp without time zone"): lambda value: datetime.datetime.combine(
+        value, datetime.time()
+    ),
+}
+
+
+def _round(value: Any, precision: int) -> Any:
+    step = 10 ** (6 - min(precision, 6))
+    change = datetime.timedelta(
+        microseconds=(value.microsecond + step // 2) // step * step - value.microsecond
+    )
+    if isinstance(value, datetime.datetime):
+        return value + change
+    moment = datetime.datetime.combine(datetime.date(2000, 1, 1), value) + change
+    return moment.timetz()
+
+
+def _datetime_method(method: str) -> Callable[..., Any]:
+    target = _DATETIME_KINDS[method]
+
+    def convert(item: Any, precision: int | None = None) -> Any:
+        value = _datetime(item) if isinstance(item, str) else item
+        kind = _kind(value)
+        if kind not in _DATETIME_NAMES:
+            raise _not_applicable(method, "a string or datetime value")
+        if kind != target:
+            if (kind, target) not in _DATETIME_CASTS:
+                source, name = _DATETIME_NAMES[kind], _DATETIME_NAMES[target]
+                if ("with time zone" in kind) != ("with time zone" in target):
+                    raise PathError(
+                        f"cannot convert value from {source} to {name} without "
+                        "time zone usage"
+                    )
+                raise PathError(
+                    f'{name} format is not recognized: "{datetime_text(value)}"'
+                )
+            value = _DATETIME_CASTS[kind, target](value)
+        if precision is not None and target != "date":
+            value = _round(value, precision)
+        return value
+
+    return convert
+
+
+_CONVERSIONS: dict[str, Callable[..., Any]] = {
+    "double": _double,
+    "bigint": _integer("bigint", 64),
+    "integer": _integer("integer", 32),
+    "number": _to_number,
+    "decimal": _numeric,
+    "boolean": _boolean,
+    "string": _string,
+    "datetime": _datetime,
+    **{method: _datetime_method(method) for method in _DATETIME_KINDS},
+}
+
+
+# `.keyvalue()` numbers each object by the byte offset of its container in
+# the `jsonb` holding it, so the layout of `jsonb` is followed here
+
+
+def _key_order(key: str) -> tuple[int, bytes]:
+    encoded = key.encode()
+    return len(encoded), encoded
+
+
+def _numeric_size(number: int | float | Decimal) -> int:
+    """
+    The size of the `numeric` varlena of a number, which stores it in
+    base 10000 digits
+    """
+    value = Decimal(repr(number)) if isinstance(number, float) else Decimal(number)
+    sign, digits, exponent = value.as_tuple()
+    assert isinstance(exponent, int)
+    places = [exponent + n for n, d in enumerate(reversed(digits)) if d]
+    ndigits = weight = 0
+    if places:
+        weight = max(places) // 4
+        ndigits = weight - min(places) // 4 + 1
+    short = max(0, -exponent) <= 63 and -64 <= weight <= 63
+    return 4 + (2 if short else 4) + 2 * ndigits
+
+
+def _layout(value: Any, position: int, offsets: dict[int, int]) -> int:
+    """
+    Lay out the container `value` from `position`, recording the offset of
+    it and each container inside it by `id()`. Returns where it ends.
+    """
+    offsets[id(value)] = position
+    if isinstance(value, dict):
+        keys = sorted(value, key=_key_order)
+        children = [value[key] for key in keys]
+    else:
+        keys, children = [], value
+    # A header, and a JEntry for each key and value
+    position += 4 + 4 * (len(keys) + len(children))
+    position += sum(len(key.encode()) for key in keys)
+    for child in children:
+        if isinstance(child, str):
+            position += len(child.encode())
+        elif isinstance(child, (dict, list)):
+            position = _layout(child, -(-position // 4) * 4, offsets)
+        elif _kind(child) == "number":
+            position = -(-position // 4) * 4 + _numeric_size(child)
+    return position
+
+
+@dataclass(frozen=True)
+class JsonPath:
+    """
+    A parsed path expression
+    """
+
+    text: str
+    mode: Mode
+    expression: Node
+
+    def __str__(self) -> str:
+        text = format_node(self.expression)
+        return f"strict {text}" if self.mode == "strict" else text
+
+    @property
+    def variables(self) -> set[str]:
+        """
+        The names of the variables the path uses
+        """
+        return set(_variables(self.expression))
+
+    def bind(self, variables: Mapping[str, Any]) -> "JsonPath":
+        """
+        Return a copy with the variables named in `variables` replaced by
+        their values as literals. Values must be JSON scalars.
+        """
+        expression = _bind(self.expression, variables)
+        if expression == self.expression:
+            return self
+        path = JsonPath("", self.mode, expression)
+        return replace(path, text=str(path))
+
+    @property
+    def is_predicate(self) -> bool:
+        return _is_predicate(self.expression)
+
+    def evaluate(
+        self, document: Any, variables: Mapping[str, Any] | None = None
+    ) -> list[Any]:
+        """
+        Return the sequence of items the path selects from `document`. A
+        predicate check expression gives a single boolean, or None when
+        the predicate is unknown.
+        """
+        evaluation = _Evaluation(self.mode, document, variables or {})
+        if self.is_predicate:
+            return [evaluation.predicate(self.expression, document)]
+        return list(evaluation.items(self.expression, document))
+
+    def exists(self, document: Any, variables: Mapping[str, Any] | None = None) -> bool:
+        return bool(self.evaluate(document, variables))
+
+
+class _Evaluation:
+    def __init__(self, mode: Mode, root: Any, variables: Mapping[str, Any]):
+        self.lax = mode == "lax"
+        self.root = root
+        self.variables = variables
+        # The id of each object's base, the root or an object made by
+        # .keyvalue(), with its offset in the base. Objects made by
+        # .keyvalue() are numbered after the variables.
+        self.bases: dict[int, tuple[int, int]] = {}
+        self.generated: list[dict] = []
+
+    def items(self, node: Node, current: Any, last: int | None = None) -> Iterator[Any]:
+        if isinstance(node, Path):
+            items: Iterator[Any] = self.items(node.start, current, last)
+            for accessor in node.accessors:
+                items = self.access(accessor, items, current, last)
+            yield from items
+        elif isinstance(node, Root):
+            yield self.root
+        elif isinstance(node, Current):
+            yield current
+        elif isinstance(node, Variable):
+            try:
+                yield self.variables[node.name]
+            except KeyError:
+                raise PathError(f"could not find jsonpath variable {node.name!r}")
+        elif isinstance(node, Value):
+            yield node.value
+        elif isinstance(node, Last):
+            if last is None:
+                raise PathError("LAST is allowed only in array subscripts")
+            yield last
+        elif isinstance(node, Unary):
+            for item in self.unwrapped(self.items(node.operand, current, last)):
+                if _kind(item) != "number":
+                    raise PathError(f"operand of unary {node.op} is not a number")
+                yield -item if node.op == "-" else item
+        elif isinstance(node, Binary):
+            left = self.number(node.left, current, last)
+            right = self.number(node.right, current, last)
+            try:
+                yield _ARITHMETIC[node.op](*_coerce(left, right))
+            except ZeroDivisionError:
+                raise PathError("division by zero")
+        else:
+            yield self.predicate(node, current)
+
+    def unwrapped(self, items: Iterator[Any]) -> Iterator[Any]:
+        for item in items:
+            if self.lax and isinstance(item, list):
+                yield from item
+            else:
+                yield item
+
+    def number(self, node: Node, current: Any, last: int | None) -> Any:
+        items = list(self.unwrapped(self.items(node, current, last)))
+        if len(items) != 1 or _kind(items[0]) != "number":
+            raise PathError("operand of arithmetic is not a single number")
+        return items[0]
+
+    def access(
+        self, accessor: Accessor, items: Iterator[Any], current: Any, last: int | None
+    ) -> Iterator[Any]:
+        if isinstance(accessor, Member):
+            for item in self.unwrapped(items):
+                if isinstance(item, dict) and accessor.key in item:
+                    yield item[accessor.key]
+                elif not self.lax:
+                    raise PathError(
+                        f"JSON object does not contain key {accessor.key!r}"
+                    )
+        elif isinstance(accessor, AnyMember):
+            for item in self.unwrapped(items):
+                if isinstance(item, dict):
+                    yield from item.values()
+                elif not self.lax:
+                    raise PathError("wildcard member accessor applied to a non-object")
+        elif isinstance(accessor, AnyItem):
+            for item in items:
+                if isinstance(item, list):
+                    yield from item
+                elif self.lax:
+                    yield item
+                else:
+                    raise PathError("wildcard array accessor applied to a non-array")
+        elif isinstance(accessor, Subscript):
+            for item in items:
+                if not isinstance(item, list):
+                    if not self.lax:
+                        raise PathError("array accessor applied to a non-array")
+                    item = [item]
+                yield from self.subscript(accessor, item, current)
+        elif isinstance(accessor, Filter):
+            for item in self.unwrapped(items):
+                if self.predicate(accessor.predicate, item) is True:
+                    yield item
+        elif isinstance(accessor, Method):
+            for item in (
+                items if accessor.name in ("size", "type") else self.unwrapped(items)
+            ):
+                if accessor.name == "keyvalue":
+                    yield from self.keyvalue(item)
+                else:
+                    yield self.method(accessor, item)
+        elif isinstance(accessor, Descendants):
+            for item in items:
+                yield from self.descendants(item, accessor, 0)
+
+    def subscript(
+        self, accessor: Subscript, array: list, current: Any
+    ) -> Iterator[Any]:
+        last = len(array) - 1
+        for index in accessor.indexes:
+            start = self.index(index.start, current, last)
+            end = start if index.end is None else self.index(index.end, current, last)
+            if self.lax:
+                start, end = max(start, 0), min(end, last)
+            elif start < 0 or end > last or start > end:
+                raise PathError("JSON array subscript is out of bounds")
+            for n in range(start, end + 1):
+                yield array[n]
+
+    def index(self, node: Node, current: Any, last: int) -> int:
+        items = list(self.items(node, current, last))
+        if len(items) != 1 or _kind(items[0]) != "number":
+            raise PathError("JSON array subscript is not a single numeric value")
+        return int(items[0])
+
+    def descendants(
+        self, item: Any, accessor: Descendants, level: int
+    ) -> Iterator[Any]:
+        if accessor.end is not None and level > accessor.end:
+            return
+        if level >= (accessor.start or 0) or accessor.start is None:
+            yield item
+        children = item.values() if isinstance(item, dict) else item
+        if isinstance(item, (dict, list)):
+            for child in children:
+                yield from self.descendants(child, accessor, level + 1)
+
+    def method(self, accessor: Method, item: Any) -> Any:
+        name, kind = accessor.name, _kind(item)
+        if name == "type":
+            return kind
+        if name == "size":
+            if kind == "array":
+                return len(item)
+            if self.lax:
+                return 1
+            raise PathError(
+                "jsonpath item method .size() can only be applied to an array"
+            )
+        if name in _CONVERSIONS:
+            return _CONVERSIONS[name](item, *accessor.arguments)
+        if kind != "number":
+            raise PathError(f".{name}() can only be applied to a number")
+        if name == "abs":
+            return abs(item)
+        if name == "floor":
+            return math.floor(item)
+        return math.ceil(item)
+
+    def base(self, value: Any, number: int) -> None:
+        offsets: dict[int, int] = {}
+        if isinstance(value, (dict, list)):
+            _layout(value, 0, offsets)
+        self.bases.update((key, (number, offset)) for key, offset in offsets.items())
+
+    def keyvalue(self, item: Any) -> Iterator[dict]:
+        if not isinstance(item, dict):
+            raise PathError(
+                "jsonpath item method .keyvalue() can only be applied to an object"
+            )
+        if not self.bases:
+            self.base(self.root, 0)
+        number, offset = self.bases.get(id(item), (0, 0))
+        for key in sorted(item, key=_key_order):
+            # Each object is a new base, holding its own copy of the value.
+            # They are numbered as they are made, before the items that
+            # follow from them.
+            value = copy.deepcopy(item[key])
+            generated = {"id": number * 10**10 + offset, "key": key, "value": value}
+            self.generated.append(generated)
+            self.base(generated, len(self.variables) + len(self.generated))
+            yield generated
+
+    def predicate(self, node: Node, current: Any) -> bool | None:
+        if isinstance(node, And):
+            left = self.predicate(node.left, current)
+            if left is False:
+                return False
+            right = self.predicate(node.right, current)
+            if right is False:
+                return False
+            return True if left and right else None
+        if isinstance(node, Or):
+            left = self.predicate(node.left, current)
+            if left is True:
+                return True
+            right = self.predicate(node.right, current)
+            if right is True:
+                return True
+            return False if left is False and right is False else None
+        if isinstance(node, Not):
+            result = self.predicate(node.operand, current)
+            return None if result is None else not result
+        if isinstance(node, IsUnknown):
+            return self.predicate(node.operand, current) is None
+        if isinstance(node, Exists):
+            try:
+                return any(True for _ in self.items(node.operand, current))
+            except PathError:
+                return None
+        if isinstance(node, Comparison):
+            try:
+                lefts = list(self.unwrapped(self.items(node.left, current)))
+                rights = list(self.unwrapped(self.items(node.right, current)))
+            except PathError:
+                return None
+            return self.existential(
+                (left, right) for left in lefts for right in rights
+            )(lambda pair: _compare(node.op, *pair))
+        if isinstance(node, LikeRegex):
+            pattern = node.pattern
+            if "q" in node.flags:
+                pattern = re.escape(pattern)
+            regex = re.compile(pattern, _regex_flags(node.flags))
+            try:
+                items = list(self.unwrapped(self.items(node.operand, current)))
+            except PathError:
+                return None
+            return self.existential(items)(
+                lambda item: bool(regex.search(item)) if isinstance(item, str) else None
+            )
+        if isinstance(node, StartsWith):
+            try:
+                items = list(self.unwrapped(self.items(node.operand, current)))
+                prefixes = list(self.items(node.prefix, current))
+            except PathError:
+                return None
+            if len(prefixes) != 1 or not isinstance(prefixes[0], str):
+                return None
+            return self.existential(items)(
+                lambda item: (
+                    item.startswith(prefixes[0]) if isinstance(item, str) else None
+                )
+            )
+        raise PathError(f"{type(node).__name__} is not a predicate")
+
+    def existential(
+        self, candidates
+    ) -> Callable[[Callable[[Any], bool | None]], bool | None]:
+        """
+        True if the test is true for any candidate. In lax mode the first
+        match wins; in strict mode an error for any candidate makes the
+        result unknown.
+        """
+
+        def run(test: Callable[[Any], bool | None]) -> bool | None:
+            found = error = False
+            for candidate in candidates:
+                result = test(candidate)
+                if result is None:
+                    error = True
+                    if self.lax:
+                        continue
+                elif result:
+                    found = True
+                    if self.lax:
+                        return True
+            if error:
+                return None
+            return found
+
+        return run
+
+
+def _parse(text: str) -> JsonPath:
+    mode, expression = _Parser(text).parse()
+    return JsonPath(text, mode, expression)
+
+
+# Paths parsed by `parse_path`, keyed by their text
+path_cache = RenderCache(maxsize=1024)
+
+
+def parse_path(text: str) -> JsonPath:
+    """
+    Parse a path expression, raising JsonPathSyntaxError if it is
+    malformed. Parsed paths are cached.
+    """
+    return path_cache.get(text, lambda: _parse(text))
+
+
+def column_path(name: str) -> str:
+    """
+    The path of a column declared without one: its name as a key, folded
+    to lower case unless it was quoted, as Postgres does
+    """
+    if name.startswith('"') and name.endswith('"'):
+        key = name[1:-1].replace('""', '"')
+    else:
+        key = name.lower()
+    return "$." + json.dumps(key)
+
+
+def common_prefix(paths: Iterable[JsonPath]) -> tuple[Accessor, ...]:
+    """
+    The accessors which every one of `paths` starts with. Only paths of
+    the form `$.a.b...` in the same mode share a prefix.
+    """
+    prefix: tuple[Accessor, ...] | None = None
+    modes = set()
+    for path in paths:
+        modes.add(path.mode)
+        expression = path.expression
+        if not isinstance(expression, Path) or not isinstance(expression.start, Root):
+            return ()
+        if prefix is None:
+            prefix = expression.accessors
+            continue
+        n = 0
+        for a, b in zip(prefix, expression.accessors):
+            if a != b:
+                break
+            n += 1
+        prefix = prefix[:n]
+    if prefix is None or len(modes) > 1:
+        return ()
+    return prefix
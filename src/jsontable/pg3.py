@@ -0,0 +1,79 @@
+"""
+Compile queries to psycopg 3 `sql` objects and execute them with binary
+results and pipeline mode.
+
+Nodes render to psycopg2 `sql` objects; `as_psycopg` translates the flat
+`Composed` they produce part by part, so the same tree can be executed by
+either driver. psycopg2 is needed to build the tree whichever driver runs it.
+"""
+
+from typing import Any, Iterable
+
+from psycopg2 import sql
+
+from .cache import render_cache
+from .table import Frozen, Rendered
+
+try:
+    from psycopg import sql as sql3
+except ImportError:  # pragma: no cover
+    sql3 = None  # type: ignore
+
+
+def translate(composable: sql.Composable) -> Any:
+    """
+    Translate a psycopg2 `sql` object into the psycopg 3 equivalent
+    """
+    if sql3 is None:  # pragma: no cover
+        raise ImportError("psycopg (version 3) is required")
+    if isinstance(composable, sql.Composed):
+        return sql3.Composed([translate(part) for part in composable.seq])
+    if isinstance(composable, sql.SQL):
+        return sql3.SQL(composable.string)
+    if isinstance(composable, sql.Identifier):
+        return sql3.Identifier(*composable.strings)
+    if isinstance(composable, sql.Literal):
+        return sql3.Literal(composable.wrapped)
+    if isinstance(composable, sql.Placeholder):
+        return sql3.Placeholder(composable.name or "")
+    raise TypeError(f"can't translate {type(composable).__name__}")
+
+
+def as_psycopg(query: Rendered) -> Any:
+    """
+    Compile `query` to a psycopg 3 `sql.Composed`. The result is cached for
+    `Frozen` queries.
+    """
+    if isinstance(query, Frozen):
+        return render_cache.get(("psycopg", query), lambda: translate(query.as_sql()))
+    return translate(query.as_sql())
+
+
+def fetch_all(query: Rendered, connection, binary: bool = True) -> list[Any]:
+    """
+    Execute `query` on a psycopg 3 connection and return all of its rows,
+    transferred in binary format if `binary` is set
+    """
+    with connection.cursor(binary=binary) as cursor:
+        cursor.execute(as_psycopg(query))
+        return cursor.fetchall()
+
+
+def execute_pipeline(
+    queries: Iterable[Rendered], connection, binary: bool = True
+) -> list[list[Any]]:
+    """
+    Send all of `queries` to the server in pipeline mode, so they share
+    a network round trip, and return the rows of each
+    """
+    cursors = []
+    with connection.pipeline():
+        for query in queries:
+            cursor = connection.cursor(binary=binary)
+            cursor.execute(as_psycopg(query))
+            cursors.append(cursor)
+    results = []
+    for cursor in cursors:
+        results.append(cursor.fetchall())
+        cursor.close()
+    return results
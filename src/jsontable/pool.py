@@ -0,0 +1,191 @@
+"""
+A bounded, thread safe connection pool and an executor for `JsonQuery`
+objects which runs them as prepared statements on pooled connections.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Generator
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from .table import JsonQuery
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+@dataclass
+class PoolStats:
+    size: int = 0
+    idle: int = 0
+    checkouts: int = 0
+    timeouts: int = 0
+    health_checks: int = 0
+    replaced: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def in_use(self) -> int:
+        return self.size - self.idle
+
+    @property
+    def wait_mean(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+
+class ConnectionPool:
+    """
+    Hands out at most `maxconn` connections, opened as they are needed.
+    Callers wait up to `timeout` seconds for a connection to be returned
+    once they are all in use. A connection idle for longer than
+    `check_after` seconds is checked with `SELECT 1` before it is handed
+    out, and replaced if that fails.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        maxconn: int = 10,
+        timeout: float = 30.0,
+        check_after: float = 30.0,
+        connect: Callable[[str], Any] = psycopg2.connect,
+    ):
+        if maxconn < 1:
+            raise ValueError("maxconn must be at least 1")
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self._connect = connect
+        self._idle: list[tuple[Any, float]] = []
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats()
+        self._condition = threading.Condition()
+
+    def stats(self) -> PoolStats:
+        with self._condition:
+            return replace(self._stats, size=self._size, idle=len(self._idle))
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        connection = None
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats.timeouts += 1
+                    raise PoolTimeout(
+                        f"no connection available after {self.timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+            wait = time.monotonic() - start
+            self._stats.checkouts += 1
+            self._stats.wait_total += wait
+            self._stats.wait_max = max(self._stats.wait_max, wait)
+
+        if connection is None:
+            return self._open()
+        if connection.closed or time.monotonic() - last_used > self.check_after:
+            if not self._healthy(connection):
+                with self._condition:
+                    self._stats.replaced += 1
+                return self._open()
+        return connection
+
+    def putconn(self, connection):
+        if not connection.closed:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    # A broken connection is dropped, and its place freed
+                    connection.close()
+        with self._condition:
+            if connection.closed or self._closed:
+                self._size -= 1
+                if not connection.closed:
+                    connection.close()
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self) -> Generator[Any, None, None]:
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            for connection, _ in self._idle:
+                connection.close()
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+
+    def _open(self):
+        try:
+            return self._connect(self.dsn)
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _healthy(self, connection) -> bool:
+        with self._condition:
+            self._stats.health_checks += 1
+        if not connection.closed:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+                return True
+            except psycopg2.Error:
+                pass
+        try:
+            connection.close()
+        except psycopg2.Error:  # pragma: no cover
+            pass
+        return False
+
+
+class Executor:
+    """
+    Runs queries on connections from a `ConnectionPool`. Each query is
+    prepared once on each connection it runs on, with its PASSING values
+    bound as parameters.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def fetch_all(self, query: JsonQuery) -> list[Any]:
+        # The pool rolls back the transaction when the connection is returned
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                query.execute_prepared(cursor)
+                return cursor.fetchall()
@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Sequence
+
+from psycopg2 import sql
+
+
+class PreparedStatements:
+    """
+    The statements prepared on one connection, keyed by their SQL text.
+    Each statement is sent with PREPARE the first time it is executed and
+    with EXECUTE afterwards. The least recently used statement is
+    deallocated once there are more than `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._names: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, statement: str) -> bool:
+        return statement in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def name_for(statement: str) -> str:
+        return "jsontable_" + hashlib.sha1(statement.encode()).hexdigest()[:16]
+
+    def prepare(self, cursor, statement: str, types: Sequence[str] = ()) -> str:
+        """
+        Prepare `statement` on the cursor's connection unless that was done
+        already, returning the name of the prepared statement
+        """
+        with self._lock:
+            name = self._names.get(statement)
+            if name is not None:
+                self._names.move_to_end(statement)
+                return name
+            name = self.name_for(statement)
+            # No parameters are passed, so psycopg2 leaves any "%" alone
+            cursor.execute(
+                sql.SQL("PREPARE {}{} AS {}").format(
+                    sql.Identifier(name),
+                    sql.SQL(" ({})").format(
+                        sql.SQL(", ").join(sql.SQL(t) for t in types)
+                    )
+                    if types
+                    else sql.SQL(""),
+                    sql.SQL(statement),
+                )
+            )
+            self._names[statement] = name
+            while len(self._names) > self.maxsize:
+                _, oldest = self._names.popitem(last=False)
+                cursor.execute(sql.SQL("DEALLOCATE {}").format(sql.Identifier(oldest)))
+            return name
+
+    def execute(
+        self,
+        cursor,
+        statement: str,
+        params: Sequence = (),
+        types: Sequence[str] = (),
+    ):
+        """
+        Execute `statement` with `params` bound to its $1, $2... parameters
+        """
+        name = self.prepare(cursor, statement, types)
+        if params:
+            cursor.execute(
+                sql.SQL("EXECUTE {} ({})").format(
+                    sql.Identifier(name),
+                    sql.SQL(", ").join([sql.Placeholder()] * len(params)),
+                ),
+                params,
+            )
+        else:
+            cursor.execute(sql.SQL("EXECUTE {}").format(sql.Identifier(name)))
+
+
+_registry: "weakref.WeakKeyDictionary[object, PreparedStatements]" = (
+    weakref.WeakKeyDictionary()
+)
+_registry_lock = threading.Lock()
+
+
+def prepared_statements(connection) -> PreparedStatements:
+    """
+    Return the prepared statements of a connection, which are kept for as
+    long as the connection object is alive
+    """
+    with _registry_lock:
+        statements = _registry.get(connection)
+        if statements is None:
+            statements = _registry[connection] = PreparedStatements()
+        return statements
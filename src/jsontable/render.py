@@ -0,0 +1,72 @@
+"""
+Render `psycopg2.sql` objects to strings without a connection.
+
+Quoting follows what libpq does with `standard_conforming_strings` on (the
+default since Postgres 9.1): quotes in literals and identifiers are doubled
+and backslashes are left alone.
+"""
+
+import datetime
+import math
+from decimal import Decimal
+from typing import Any
+
+from psycopg2 import sql
+
+
+def quote_identifier(name: str) -> str:
+    if "\x00" in name:
+        raise ValueError("identifiers cannot contain NUL characters")
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        # Negative numbers get a leading space, as psycopg2 does, so that
+        # "x -1" can never be read as the start of a "--" comment
+        return f" {value}" if value < 0 else str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "'NaN'::float"
+        if math.isinf(value):
+            return "'Infinity'::float" if value > 0 else "'-Infinity'::float"
+        text = repr(value)
+        return f" {text}" if text.startswith("-") else text
+    if isinstance(value, Decimal):
+        # psycopg2 renders every value which isn't finite as NaN, from
+        # before numeric had infinities
+        if not value.is_finite():
+            return "'NaN'::numeric"
+        text = str(value)
+        return f" {text}" if text.startswith("-") else text
+    if isinstance(value, datetime.datetime):
+        return f"'{value.isoformat()}'::timestamp" + ("tz" if value.tzinfo else "")
+    if isinstance(value, datetime.date):
+        return f"'{value.isoformat()}'::date"
+    if isinstance(value, str):
+        if "\x00" in value:
+            raise ValueError("string literals cannot contain NUL characters")
+        return "'" + value.replace("'", "''") + "'"
+    raise TypeError(f"can't render {type(value).__name__} as a literal")
+
+
+def as_string(composable: sql.Composable) -> str:
+    """
+    Render a `psycopg2.sql` object to the string `cursor.mogrify` would
+    produce for it
+    """
+    if isinstance(composable, sql.Composed):
+        return "".join(as_string(part) for part in composable.seq)
+    if isinstance(composable, sql.SQL):
+        return composable.string
+    if isinstance(composable, sql.Identifier):
+        return ".".join(quote_identifier(name) for name in composable.strings)
+    if isinstance(composable, sql.Literal):
+        return quote_literal(composable.wrapped)
+    if isinstance(composable, sql.Placeholder):
+        return f"%({composable.name})s" if composable.name else "%s"
+    raise TypeError(f"can't render {type(composable).__name__}")
@@ -0,0 +1,191 @@
+"""
+Run several `JsonQuery` objects over the same table as one query, so the
+table is scanned, and each document detoasted, once rather than once per
+query.
+
+The `JsonTable` of each query becomes a sibling `NESTED PATH` under a
+root path of `$`. Sibling nested paths are unioned, so each row of the
+combined query comes from one of them, and the others' columns are NULL.
+Each branch has a hidden ordinality column, which is set only on its own
+rows, and `SharedScan.split` uses it to sort the rows back into one result
+set per query:
+
+    scan = SharedScan([people, addresses, orders])
+    people_rows, address_rows, order_rows = scan.fetch_all(cursor)
+
+Columns are renamed so their names are unique across the branches, and
+given explicit paths, so the rows are the same as each query's own. The
+queries must read the same context item of the same table, with the same
+WHERE conditions, and share PASSING variables only if they have the same
+value.
+"""
+
+import itertools
+from dataclasses import dataclass, replace
+from typing import Any, Generator, Iterable, Iterator, Sequence
+
+from psycopg2 import sql
+
+from .path import column_path
+from .table import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    Frozen,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    Rendered,
+)
+
+
+def _rename(columns: ColumnList, prefix: str, numbers: Iterator[int]) -> ColumnList:
+    """
+    A copy of `columns` with output columns named `<prefix>_0`,
+    `<prefix>_1`... in the order JSON_TABLE returns them
+    """
+    renamed: list[Column | ColumnExists | OrdinalityColumn | NestedPath] = []
+    for column in columns.columns:
+        if isinstance(column, NestedPath):
+            renamed.append(
+                replace(column, columns=_rename(column.columns, prefix, numbers))
+            )
+        elif isinstance(column, Column):
+            renamed.append(
+                replace(
+                    column,
+                    name=f"{prefix}_{next(numbers)}",
+                    path_expression=column.path_expression or column_path(column.name),
+                )
+            )
+        else:
+            renamed.append(replace(column, name=f"{prefix}_{next(numbers)}"))
+    return ColumnList(renamed)
+
+
+def _thaw(query: JsonQuery | Frozen) -> JsonQuery:
+    if isinstance(query, Frozen):
+        query = query.thaw()  # type: ignore
+    assert isinstance(query, JsonQuery)
+    if isinstance(query.json_table, Frozen):
+        query = replace(query, json_table=query.json_table.thaw())  # type: ignore
+    return query
+
+
+@dataclass
+class SharedScan(Rendered):
+    """
+    Several queries over the same table, run as one
+    """
+
+    queries: Sequence[JsonQuery | Frozen]
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        yield from self.combined().as_sql_parts()
+
+    def widths(self) -> list[int]:
+        """
+        The number of columns of each query
+        """
+        widths = []
+        for query in map(_thaw, self.queries):
+            if not query.json_table.columns:
+                raise ValueError("JSON_TABLE has no columns")
+            widths.append(len(list(query.json_table.columns.output_columns())))
+        return widths
+
+    def combined(self) -> JsonQuery:
+        """
+        The query returning the rows of all the queries. The columns of
+        each come in turn, after a column which is not NULL on its rows.
+        """
+        queries = [_thaw(query) for query in self.queries]
+        if not queries:
+            raise ValueError("SharedScan needs at least one query")
+        first = queries[0]
+        context = first.json_table.context_item
+        for query in queries[1:]:
+            if (query.table_name, query.alias) != (first.table_name, first.alias):
+                raise ValueError("the queries must read the same table")
+            if query.json_table.context_item != context:
+                raise ValueError("the queries must have the same context item")
+            if (query.where or []) != (first.where or []):
+                raise ValueError("the queries must have the same WHERE conditions")
+            if query.table_columns != first.table_columns:
+                raise ValueError("the queries must have the same table_columns")
+
+        variables: dict[str, Passing] = {}
+        branches: list[Column | ColumnExists | OrdinalityColumn | NestedPath] = []
+        for n, query in enumerate(queries):
+            json_table = query.json_table
+            for passing in json_table.passing.passings if json_table.passing else []:
+                if variables.setdefault(passing.as_, passing) != passing:
+                    raise ValueError(
+                        f"PASSING {passing.as_} has different values in the queries"
+                    )
+            if not json_table.columns:
+                raise ValueError("JSON_TABLE has no columns")
+            columns = _rename(json_table.columns, f"s{n}", itertools.count())
+            branches.append(
+                NestedPath(
+                    json_table.path_expression,
+                    ColumnList([OrdinalityColumn(f"s{n}_row"), *columns.columns]),
+                )
+            )
+
+        where = list(first.where or [])
+        # A document the root path of a query selects nothing from gives
+        # none of its rows, so dropping the documents none of the root
+        # paths select anything from changes nothing
+        if all(query.prefilter for query in queries):
+            where.append(
+                sql.SQL(" OR ").join(
+                    sql.SQL("({})").format(query.json_table.prefilter())
+                    for query in queries
+                )
+            )
+        return JsonQuery(
+            JsonTable(
+                context,
+                "$",
+                PassingList(list(variables.values())) if variables else None,
+                ColumnList(branches),
+            ),
+            table_name=first.table_name,
+            alias=first.alias,
+            where=where or None,
+            table_columns=first.table_columns,
+        )
+
+    def split(self, rows: Iterable[tuple]) -> list[list[tuple]]:
+        """
+        Sort rows of the combined query into the rows of each query, in
+        the order they came
+        """
+        widths = self.widths()
+        # The table_columns of the queries come first, and are kept
+        first = _thaw(self.queries[0]) if self.queries else None
+        shared = len(first.table_columns or []) if first else 0
+        starts = list(
+            itertools.accumulate((width + 1 for width in widths), initial=shared)
+        )
+        results: list[list[tuple]] = [[] for _ in widths]
+        for row in rows:
+            for n, width in enumerate(widths):
+                start = starts[n]
+                if row[start] is not None:
+                    results[n].append(
+                        tuple(row[:shared]) + tuple(row[start + 1 : start + 1 + width])
+                    )
+                    break
+        return results
+
+    def fetch_all(self, cursor) -> list[list[Any]]:
+        """
+        Run the combined query on `cursor`, returning the rows of each query
+        """
+        cursor.execute(self.as_sql())
+        return self.split(cursor.fetchall())
@@ -1,11 +1,30 @@
-import operator
+import re
+import uuid
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from functools import reduce
-from typing import Annotated, Generator, Literal, Union
+from dataclasses import dataclass, fields, replace
+from typing import Annotated, Any, Generator, Hashable, Iterable, Literal, Union
 
 from psycopg2 import sql
 
+from .cache import render_cache
+from .path import JsonPathSyntaxError, parse_path
+from .prepared import prepared_statements
+from .render import as_string
+
+
+def flatten(
+    parts: Iterable[sql.Composable],
+) -> Generator[sql.Composable, None, None]:
+    """
+    Splice the contents of any `Composed` parts into a single flat stream
+    of `SQL`, `Literal` and `Identifier` parts
+    """
+    for part in parts:
+        if isinstance(part, sql.Composed):
+            yield from part.seq
+        else:
+            yield part
+
 
 @dataclass
 class Rendered(ABC):
@@ -14,8 +33,30 @@ class Rendered(ABC):
         self,
     ) -> Generator[sql.SQL | sql.Composed, None, None]: ...  # pragma: no cover
 
-    def as_sql(self) -> sql.SQL | sql.Composed:
-        return reduce(operator.add, self.as_sql_parts())
+    def as_sql(self) -> sql.Composed:
+        # Collect every part in one pass: adding `Composed` objects together
+        # copies the accumulated list each time, which is quadratic in the
+        # number of columns
+        return sql.Composed(list(flatten(self.as_sql_parts())))
+
+    def as_string(self, context=None) -> str:
+        """
+        Render to a SQL string. Without a connection or cursor as `context`
+        quoting is done in Python, assuming `standard_conforming_strings`.
+        """
+        if context is None:
+            return as_string(self.as_sql())
+        return self.as_sql().as_string(context)
+
+    def freeze(self) -> "Frozen":
+        """
+        Return an immutable, hashable copy of this node whose rendered
+        output is cached
+        """
+        return Frozen(
+            type(self),
+            tuple((f.name, _freeze(getattr(self, f.name))) for f in fields(self)),
+        )
 
 
 @dataclass
@@ -95,11 +136,22 @@ class ColumnExists(BaseColumn):
 
 @dataclass
 class Passing(Rendered):
-    value: str
+    """
+    A value made available to path expressions as `$<as_>`. Values which
+    are `sql.Composable` (a bind parameter or a column reference, say) are
+    rendered as they are rather than as a literal.
+    """
+
+    value: str | sql.Composable
     as_: str
 
     def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
-        yield sql.SQL("{} AS {}").format(sql.Literal(self.value), sql.SQL(self.as_))
+        value = (
+            self.value
+            if isinstance(self.value, sql.Composable)
+            else sql.Literal(self.value)
+        )
+        yield sql.SQL("{} AS {}").format(value, sql.SQL(self.as_))
 
 
 @dataclass
@@ -136,6 +188,34 @@ class ColumnList(Rendered):
             yield from column.as_sql_parts()
         yield sql.SQL(")")
 
+    def output_columns(
+        self,
+    ) -> Generator[Column | ColumnExists | OrdinalityColumn, None, None]:
+        """
+        The columns JSON_TABLE returns, in order, including those of
+        nested paths
+        """
+        for column in self.columns:
+            if isinstance(column, NestedPath):
+                yield from column.columns.output_columns()
+            else:
+                yield column
+
+    def prune(self, names: set[str]) -> "ColumnList | None":
+        """
+        A copy holding only the columns named in `names`, and the nested
+        paths which supply any of them, or None if no column is wanted
+        """
+        columns: list[Column | ColumnExists | OrdinalityColumn | NestedPath] = []
+        for column in self.columns:
+            if isinstance(column, NestedPath):
+                nested = column.columns.prune(names)
+                if nested is not None:
+                    columns.append(replace(column, columns=nested))
+            elif column.name in names:
+                columns.append(column)
+        return ColumnList(columns) if columns else None
+
 
 @dataclass
 class JsonTable(Rendered):
@@ -157,6 +237,89 @@ class JsonTable(Rendered):
             yield from self.columns.as_sql_parts()
         yield sql.SQL(")")
 
+    def prefilter(self) -> sql.Composed:
+        """
+        A condition on the context item which is true for the documents the
+        root path selects anything from, so the others can be dropped (with
+        the help of a GIN index) before JSON_TABLE runs.
+
+        `jsonb @? jsonpath` can use an index, but takes no variables, so
+        PASSING values are written into the path as literals. When that
+        can't be done, as for bind parameters, the condition is
+        `jsonb_path_exists` with the values as its `vars`, which is
+        equivalent but can't use an index.
+        """
+        context: sql.Composable = sql.SQL(self.context_item.expression)
+        if not re.fullmatch(r'[\w."]+', self.context_item.expression):
+            context = sql.SQL("({})").format(context)
+        passings = self.passing.passings if self.passing else []
+        if not any(isinstance(p.value, sql.Composable) for p in passings):
+            try:
+                path = parse_path(self.path_expression)
+                bound = path.bind({p.as_: p.value for p in passings})
+            except (JsonPathSyntaxError, TypeError):
+                pass
+            else:
+                if not bound.variables:
+                    text = self.path_expression if bound is path else str(bound)
+                    return sql.SQL("{} @? {}").format(context, sql.Literal(text))
+        variables = sql.SQL(", ").join(
+            sql.SQL("{}, {}").format(
+                sql.Literal(p.as_),
+                p.value
+                if isinstance(p.value, sql.Composable)
+                else sql.Literal(p.value),
+            )
+            for p in passings
+        )
+        return sql.SQL(
+            "jsonb_path_exists({}, {}, jsonb_build_object({}), silent => true)"
+        ).format(context, sql.Literal(self.path_expression), variables)
+
+    def prune(self, names: Iterable[str]) -> "JsonTable":
+        """
+        A copy returning only the columns named in `names`. Nested paths
+        which supply none of them are dropped, and so are the rows they
+        would have added, so the result may have fewer rows than the
+        whole table projected onto the same columns.
+        """
+        wanted = set(names)
+        if not self.columns:
+            raise ValueError("JSON_TABLE has no columns")
+        unknown = wanted - {c.name for c in self.columns.output_columns()}
+        if unknown:
+            raise ValueError(f"no such columns: {', '.join(sorted(unknown))}")
+        columns = self.columns.prune(wanted)
+        if columns is None:
+            raise ValueError("at least one column must be kept")
+        return replace(self, columns=columns)
+
+    def validate(self):
+        """
+        Parse every path expression of the table, raising
+        JsonPathSyntaxError for the first which is malformed, rather than
+        finding out from the server
+        """
+        _validate("JSON_TABLE", self.path_expression)
+        for column in self.columns.columns if self.columns else []:
+            _validate_column(column)
+
+
+def _validate(where: str, path_expression: str):
+    try:
+        parse_path(path_expression)
+    except JsonPathSyntaxError as e:
+        raise JsonPathSyntaxError(f"{where}: {e}", e.text, e.position) from e
+
+
+def _validate_column(column: Union[Column, ColumnExists, OrdinalityColumn, NestedPath]):
+    if isinstance(column, NestedPath):
+        _validate("NESTED PATH", column.path_expression)
+        for child in column.columns.columns:
+            _validate_column(child)
+    elif isinstance(column, (Column, ColumnExists)) and column.path_expression:
+        _validate(column.name, column.path_expression)
+
 
 @dataclass
 class JsonQuery(Rendered):
@@ -170,13 +333,227 @@ class JsonQuery(Rendered):
     table_name: str | None = None
     alias: str = "jt"
 
+    # Drop rows of the table the root path selects nothing from before
+    # JSON_TABLE sees them, see `JsonTable.prefilter`
+    prefilter: bool = False
+
+    # Further conditions for the WHERE clause, ANDed together
+    where: list[sql.Composable] | None = None
+
+    # Columns of the table to return before those of JSON_TABLE, such as
+    # its key
+    table_columns: list[str] | None = None
+
     def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
         if not self.table_name:
+            if self.table_columns:
+                raise ValueError("table_columns needs a table_name")
             yield sql.SQL("SELECT * FROM ")
             yield from self.json_table.as_sql_parts()
         else:
-            yield sql.SQL("SELECT {}.* FROM {}, ").format(
+            yield sql.SQL("SELECT ")
+            for column in self.table_columns or []:
+                yield sql.SQL("{}, ").format(sql.Identifier(self.table_name, column))
+            yield sql.SQL("{}.* FROM {}, ").format(
                 sql.Identifier(self.alias), sql.Identifier(self.table_name)
             )
             yield from self.json_table.as_sql_parts()
             yield sql.SQL(" AS {}").format(sql.Identifier(self.alias))
+        conditions = self.conditions()
+        if conditions:
+            yield sql.SQL(" WHERE ")
+            if len(conditions) > 1:
+                conditions = [sql.SQL("({})").format(c) for c in conditions]
+            yield sql.SQL(" AND ").join(conditions)
+
+    def prune(self, names: Iterable[str]) -> "JsonQuery":
+        """
+        A copy returning only the columns named in `names`, see
+        `JsonTable.prune`
+        """
+        return replace(self, json_table=self.json_table.prune(names))
+
+    def conditions(self) -> list[sql.Composable]:
+        """
+        The conditions of the WHERE clause
+        """
+        conditions: list[sql.Composable] = []
+        if self.prefilter:
+            json_table = self.json_table
+            if isinstance(json_table, Frozen):
+                json_table = json_table.thaw()  # type: ignore
+            conditions.append(json_table.prefilter())
+        conditions.extend(self.where or [])
+        return conditions
+
+    def parameterized(self) -> tuple["JsonQuery", list[str]]:
+        """
+        Return a copy of this query with its PASSING values replaced by the
+        bind parameters $1, $2... along with the values. The SQL text of
+        the copy is the same whatever the values are, so it can be prepared
+        once and executed many times.
+        """
+        passing = self.json_table.passing
+        if not passing:
+            return self, []
+        values = []
+        passings = []
+        for n, item in enumerate(passing.passings, 1):
+            if isinstance(item.value, sql.Composable):
+                raise ValueError(f"PASSING {item.as_} is not a literal value")
+            values.append(item.value)
+            passings.append(Passing(sql.SQL(f"${n}"), item.as_))
+        json_table = replace(self.json_table, passing=PassingList(passings))
+        return replace(self, json_table=json_table), values
+
+    def prepare(self, cursor) -> str:
+        """
+        Prepare the parameterized form of this query on the cursor's
+        connection, once per connection, returning the statement name
+        """
+        query, values = self.parameterized()
+        return prepared_statements(cursor.connection).prepare(
+            cursor, query.as_string(cursor), ["text"] * len(values)
+        )
+
+    def execute_prepared(self, cursor):
+        """
+        Execute this query as a prepared statement with its PASSING values
+        bound as parameters. Rows are fetched from `cursor` as usual.
+        """
+        query, values = self.parameterized()
+        prepared_statements(cursor.connection).execute(
+            cursor, query.as_string(cursor), values, ["text"] * len(values)
+        )
+
+    def stream(
+        self, connection, itersize: int = 2000, batches: bool = False
+    ) -> Generator[Any, None, None]:
+        """
+        Run this query through a named (server side) cursor and yield rows,
+        or lists of up to `itersize` rows if `batches` is set. Only
+        `itersize` rows are held by the client at a time.
+        """
+        # Outside a transaction the cursor has to be WITH HOLD to exist at all
+        with connection.cursor(
+            name=f"jsontable_{uuid.uuid4().hex}", withhold=connection.autocommit
+        ) as cursor:
+            cursor.itersize = itersize
+            cursor.execute(self.as_sql())
+            if batches:
+                while rows := cursor.fetchmany(itersize):
+                    yield rows
+            else:
+                yield from cursor
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, Frozen):
+        return value
+    if isinstance(value, Rendered):
+        return value.freeze()
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _hash_key(value: Any) -> Hashable:
+    # `sql.Composable`s compare by value but aren't hashable; their repr
+    # stands in for them
+    if isinstance(value, sql.Composable):
+        return (type(value).__name__, repr(value))
+    if isinstance(value, tuple):
+        return tuple(_hash_key(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Frozen):
+        return value.thaw()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class Frozen(Rendered):
+    """
+    An immutable, hashable snapshot of a `Rendered` node. Child nodes are
+    frozen too, so the compiled `sql.Composed` and rendered string of each
+    node are cached in `render_cache` and shared by every parent containing
+    an equal subtree.
+    """
+
+    __slots__ = ("node_type", "values", "_hash")
+
+    def __init__(
+        self, node_type: type[Rendered], values: tuple[tuple[str, Hashable], ...]
+    ):
+        object.__setattr__(self, "node_type", node_type)
+        object.__setattr__(self, "values", values)
+        object.__setattr__(self, "_hash", hash((node_type, _hash_key(values))))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getattr__(self, name: str) -> Any:
+        for key, value in self.values:
+            if key == name:
+                return value
+        raise AttributeError(name)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Frozen) or self._hash != other._hash:
+            return False
+        return self.node_type == other.node_type and self.values == other.values
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.thaw()!r})"
+
+    def freeze(self) -> "Frozen":
+        return self
+
+    def thaw(self) -> Rendered:
+        """
+        Return a mutable copy of the original node
+        """
+        return self.node_type(**{key: _thaw(value) for key, value in self.values})
+
+    def replace(self, **changes: Any) -> "Frozen":
+        """
+        Return a copy with some fields changed. Fields which are not changed
+        keep their frozen (and already rendered) children.
+        """
+        values = dict(self.values)
+        for key, value in changes.items():
+            if key not in values:
+                raise TypeError(f"{self.node_type.__name__} has no field {key!r}")
+            values[key] = _freeze(value)
+        return Frozen(self.node_type, tuple(values.items()))
+
+    def as_sql_parts(self) -> Generator[sql.SQL | sql.Composed, None, None]:
+        yield self.as_sql()
+
+    def as_sql(self) -> sql.Composed:
+        return render_cache.get(("sql", self), self._compile)
+
+    def as_string(self, context=None) -> str:
+        return render_cache.get(
+            ("str", self, _encoding(context)),
+            lambda: super(Frozen, self).as_string(context),
+        )
+
+    def _compile(self) -> sql.Composed:
+        # The frozen children are left in place, so rendering the node
+        # fetches their parts from the cache rather than walking them again
+        node = self.node_type(**dict(self.values))
+        return sql.Composed(list(flatten(node.as_sql_parts())))
+
+
+def _encoding(context) -> str | None:
+    connection = getattr(context, "connection", context)
+    return getattr(connection, "encoding", None)
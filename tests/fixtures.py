@@ -7,6 +7,8 @@ from psycopg2._psycopg import cursor
 
 psycopg2.connect
 
+DSN = "dbname='postgres' user='postgres' host='db' password='postgres'"
+
 
 @pytest.fixture
 def connection():
@@ -14,9 +16,7 @@ def connection():
     Creates a connection to the default postgres database.
     On teardown, the connection is closed.
     """
-    conn = psycopg2.connect(
-        "dbname='postgres' user='postgres' host='db' password='postgres'"
-    )
+    conn = psycopg2.connect(DSN)
     yield conn
     conn.close()
 
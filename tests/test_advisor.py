@@ -0,0 +1,132 @@
+from dataclasses import replace
+
+import pytest
+from psycopg2._psycopg import cursor
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.advisor import advise, verify
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+
+from .test_film_examples import TABLE_NAME, my_films  # noqa: F401
+
+FILMS = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression(
+            "$.favorites[*] ? (@.films[*].director == $filter)"
+        ),
+        passing=PassingList([Passing("Alfred Hitchcock", "filter")]),
+        columns=ColumnList([Column("kind", "text", PathExpression("$.kind"))]),
+    ),
+    table_name=TABLE_NAME,
+)
+
+DOCS = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("docs.doc"),
+        path_expression=PathExpression("$.meta"),
+        columns=ColumnList(
+            [
+                Column("title", "text", PathExpression("$.title")),
+                Column("year", "INTEGER", PathExpression("$.year")),
+                Column("Kind", "text"),
+                Column("tags", "text", PathExpression("$.tags[*]")),
+            ]
+        ),
+    ),
+    table_name="docs",
+)
+
+
+def test_gin_for_root_filter():
+    (proposal,) = advise(FILMS)
+    assert proposal.method == "gin"
+    assert as_string(proposal.as_sql()) == (
+        f'CREATE INDEX IF NOT EXISTS "{proposal.name}" ON "my_films" '
+        'USING gin ("js" jsonb_path_ops)'
+    )
+    assert not proposal.outer
+    # The query itself, which filters with the index
+    assert proposal.probe is not None
+    assert as_string(proposal.probe) == as_string(
+        replace(FILMS, prefilter=True).as_sql()
+    )
+    assert as_string(proposal.probe).endswith(
+        """ AS "jt" WHERE js @? """
+        """'$.favorites[*] ? (@.films[*].director == "Alfred Hitchcock")'"""
+    )
+
+
+def test_btree_for_scalar_filter():
+    query = JsonQuery(
+        JsonTable(
+            ContextItem("doc"),
+            "$ ? (@.kind == $kind && 10 < @.size.n)",
+            columns=ColumnList([Column("a", "text")]),
+        ),
+        table_name="docs",
+    )
+    gin, kind = advise(query)
+    # $kind isn't passed, so there is nothing to probe with
+    assert gin.probe is None and kind.probe is None
+    assert as_string(kind.expression) == """("doc" #>> '{"kind"}')"""
+    # The query can't use it itself, only a condition added to it
+    assert kind.outer
+
+
+def test_btree_casts():
+    query = JsonQuery(
+        JsonTable(
+            ContextItem("doc"),
+            "$ ? (10 < @.size.n)",
+            columns=ColumnList([Column("a", "text")]),
+        ),
+        table_name="docs",
+    )
+    # Casting the value fails for documents which hold something else there
+    assert advise(query) == []
+    (size,) = advise(query, casts=True)
+    assert size.outer
+    assert "not a numeric" in size.reason
+    assert as_string(size.probe).endswith(
+        """ AS "jt" WHERE (("doc" #>> '{"size","n"}')::numeric) > '10'"""
+    )
+
+
+def test_no_btree_for_columns():
+    # Nothing filters on the columns, so no index could be used
+    assert advise(DOCS) == []
+
+
+def test_needs_a_column():
+    with pytest.raises(ValueError):
+        advise(JsonQuery(FILMS.json_table))
+    with pytest.raises(ValueError):
+        advise(
+            JsonQuery(JsonTable(ContextItem("other.js"), "$"), table_name=TABLE_NAME)
+        )
+
+
+def test_verify(my_films: cursor):  # noqa: F811
+    my_films.execute(
+        f"INSERT INTO {TABLE_NAME} SELECT '{{}}' FROM generate_series(1, 1000)"
+    )
+    my_films.execute(f"ANALYZE {TABLE_NAME}")
+    [(proposal, used)] = verify(advise(FILMS), my_films.connection)
+    assert used is True
+    # The transaction the table was made in carries on, without the index
+    my_films.execute(
+        "SELECT count(*) FROM pg_indexes WHERE tablename = %s", (TABLE_NAME,)
+    )
+    assert my_films.fetchone() == (0,)
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    PathExpression,
+)
+from src.jsontable.aio import fetch_all, stream
+from tests.fixtures import DSN
+
+psycopg = pytest.importorskip("psycopg")
+
+QUERY = JsonQuery(
+    JsonTable(
+        context_item=ContextItem(
+            """'{"children": [{"name": "Eric"}, {"name": "Beth"}, {"name": "Noah"}]}'::jsonb"""
+        ),
+        path_expression=PathExpression("$"),
+        columns=ColumnList(
+            [
+                NestedPath(
+                    PathExpression("$.children[*]"),
+                    ColumnList(
+                        [
+                            OrdinalityColumn("id"),
+                            Column("child", "text", PathExpression("$.name")),
+                        ]
+                    ),
+                )
+            ]
+        ),
+    )
+)
+
+
+def test_fetch_all_concurrently():
+    async def run():
+        connections = [await psycopg.AsyncConnection.connect(DSN) for _ in range(3)]
+        try:
+            return await asyncio.gather(
+                *(fetch_all(QUERY, connection) for connection in connections)
+            )
+        finally:
+            for connection in connections:
+                await connection.close()
+
+    expected = [(1, "Eric"), (2, "Beth"), (3, "Noah")]
+    assert asyncio.run(run()) == [expected] * 3
+
+
+def test_stream():
+    async def run():
+        async with await psycopg.AsyncConnection.connect(DSN) as connection:
+            rows = [row async for row in stream(QUERY, connection, itersize=2)]
+            batches = [
+                batch
+                async for batch in stream(QUERY, connection, itersize=2, batches=True)
+            ]
+            return rows, batches
+
+    rows, batches = asyncio.run(run())
+    assert rows == [(1, "Eric"), (2, "Beth"), (3, "Noah")]
+    assert batches == [[(1, "Eric"), (2, "Beth")], [(3, "Noah")]]
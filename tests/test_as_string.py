@@ -0,0 +1,231 @@
+from dataclasses import fields, is_dataclass
+from decimal import Decimal
+
+import pytest
+from psycopg2 import sql
+from psycopg2.extensions import adapt
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    FormatJson,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    PathExpression,
+    Rendered,
+)
+from src.jsontable.render import as_string, quote_identifier, quote_literal
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+QUERY = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression(
+            "$.favorites[*] ? (@.films[*].director == $filter)"
+        ),
+        passing=PassingList(
+            [Passing("Alfred Hitchcock", "filter"), Passing("O'Brien \\ 🎬", "other")]
+        ),
+        columns=ColumnList(
+            [
+                OrdinalityColumn("id"),
+                Column("kind", "text", PathExpression("$.kind")),
+                ColumnExists("has_title", PathExpression("$.title"), "INTEGER"),
+                NestedPath(
+                    PathExpression("$.films[*]"),
+                    ColumnList(
+                        [
+                            Column(
+                                "title",
+                                "text",
+                                PathExpression("$.title"),
+                                format_json=FormatJson(True),
+                                quotes="OMIT",
+                            ),
+                        ]
+                    ),
+                ),
+            ]
+        ),
+    ),
+    table_name='my "films"',
+)
+
+# The examples of JSON_TABLE in the Postgres documentation, as in
+# test_film_examples
+FILMS = [
+    JsonQuery(
+        JsonTable(
+            context_item=ContextItem("js"),
+            path_expression=PathExpression("$.favorites[*]"),
+            columns=ColumnList(
+                [
+                    OrdinalityColumn("id"),
+                    Column("kind", "text", PathExpression("$.kind")),
+                    Column(
+                        "title",
+                        "text",
+                        PathExpression("$.films[*].title"),
+                        with_wrapper=True,
+                    ),
+                    ColumnExists("director", PathExpression("$.films[*].director")),
+                ]
+            ),
+        ),
+        table_name="my_films",
+    ),
+    JsonQuery(
+        JsonTable(
+            context_item=ContextItem("js"),
+            path_expression=PathExpression(
+                "$.favorites[*] ? (@.films[*].director == $filter)"
+            ),
+            passing=PassingList(
+                [Passing("Alfred Hitchcock", "filter"), Passing("Vertigo", "filter2")]
+            ),
+            columns=ColumnList(
+                [
+                    OrdinalityColumn("id"),
+                    Column("kind", "text", PathExpression("$.kind")),
+                    NestedPath(
+                        PathExpression("$.films[*]"),
+                        ColumnList(
+                            [
+                                Column(
+                                    "title",
+                                    "text",
+                                    PathExpression("$.title"),
+                                    format_json=FormatJson(True),
+                                    quotes="OMIT",
+                                ),
+                                Column(
+                                    "director",
+                                    "text",
+                                    PathExpression("$.director"),
+                                    quotes="KEEP",
+                                ),
+                            ]
+                        ),
+                    ),
+                ]
+            ),
+        ),
+        table_name="my_films",
+    ),
+    JsonQuery(
+        JsonTable(
+            context_item=ContextItem(
+                """'{"favorites": {"movies": [{"name": "One"}], """
+                """"books": [{"name": "Mystery", "authors": [{"name": "Dan"}]}]}}'"""
+                "::json"
+            ),
+            path_expression=PathExpression("$.favorites[*]"),
+            columns=ColumnList(
+                [
+                    OrdinalityColumn("user_id"),
+                    NestedPath(
+                        PathExpression("$.movies[*]"),
+                        ColumnList(
+                            [
+                                OrdinalityColumn("movie_id"),
+                                Column("mname", "text", PathExpression("$.name")),
+                                Column("director", "text"),
+                            ]
+                        ),
+                    ),
+                    NestedPath(
+                        PathExpression("$.books[*]"),
+                        ColumnList(
+                            [
+                                OrdinalityColumn("book_id"),
+                                Column("bname", "text", PathExpression("$.name")),
+                                NestedPath(
+                                    PathExpression("$.authors[*]"),
+                                    ColumnList(
+                                        [
+                                            OrdinalityColumn("author_id"),
+                                            Column(
+                                                "author_name",
+                                                "text",
+                                                PathExpression("$.name"),
+                                            ),
+                                        ]
+                                    ),
+                                ),
+                            ]
+                        ),
+                    ),
+                ]
+            ),
+        )
+    ),
+]
+
+
+def nodes(rendered: Rendered):
+    """
+    `rendered` and every node it is made of
+    """
+    yield rendered
+    for field in fields(rendered):
+        values = getattr(rendered, field.name)
+        for value in values if isinstance(values, list) else [values]:
+            if is_dataclass(value) and isinstance(value, Rendered):
+                yield from nodes(value)
+
+
+def test_quote_literal():
+    assert quote_literal("Alfred Hitchcock") == "'Alfred Hitchcock'"
+    assert quote_literal("it's") == "'it''s'"
+    assert quote_literal("back\\slash") == "'back\\slash'"
+    assert quote_literal(None) == "NULL"
+    assert quote_literal(True) == "true"
+    assert quote_literal(-1) == " -1"
+    assert quote_literal(-0.0) == " -0.0"
+    assert quote_literal(Decimal("-0")) == " -0"
+    for value in ("Infinity", "-Infinity", "NaN"):
+        assert quote_literal(Decimal(value)) == "'NaN'::numeric"
+    with pytest.raises(ValueError):
+        quote_literal("\x00")
+
+
+def test_quote_identifier():
+    assert quote_identifier("jt") == '"jt"'
+    assert quote_identifier('my "films"') == '"my ""films"""'
+    assert as_string(sql.Identifier("public", "films")) == '"public"."films"'
+
+
+def test_as_string():
+    assert QUERY.as_string() == (
+        'SELECT "jt".* FROM "my ""films""", '
+        "JSON_TABLE (js, '$.favorites[*] ? (@.films[*].director == $filter)' "
+        "PASSING 'Alfred Hitchcock' AS filter, 'O''Brien \\ 🎬' AS other "
+        "COLUMNS (id FOR ORDINALITY, kind text PATH '$.kind', "
+        "has_title INTEGER EXISTS PATH '$.title', "
+        "NESTED PATH '$.films[*]' COLUMNS "
+        "(title text FORMAT JSON PATH '$.title' OMIT QUOTES))) AS \"jt\""
+    )
+    assert QUERY.freeze().as_string() == QUERY.as_string()
+
+
+@pytest.mark.parametrize(
+    "rendered", [node for query in [QUERY, *FILMS] for node in nodes(query)]
+)
+def test_as_string_matches_mogrify(transaction: cursor, rendered):  # noqa: F811
+    assert transaction.mogrify(rendered.as_sql()).decode() == rendered.as_string()
+    assert rendered.as_string(transaction) == rendered.as_string()
+
+
+@pytest.mark.parametrize(
+    "value", [-1, -0.0, 1e100, Decimal("-0"), Decimal("1E+3"), Decimal("Infinity")]
+)
+def test_literals_match_psycopg2(value):
+    assert quote_literal(value) == adapt(value).getquoted().decode()
@@ -0,0 +1,148 @@
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    PathExpression,
+    prepared_statements,
+)
+from src.jsontable.batch import BatchQuery, DocumentsQuery
+from src.jsontable.evaluate import Evaluator
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+from .test_evaluate import FAMILIES, FAMILIES_TABLE
+
+QUERY = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("families.data"),
+        path_expression=PathExpression("$[*] ? (@.father == $father)"),
+        passing=PassingList([Passing("John", "father"), Passing("2", "min_age")]),
+        columns=ColumnList(
+            [
+                Column("mother", "text", PathExpression("$.mother")),
+                Column(
+                    "children",
+                    "text",
+                    PathExpression("$.children[*] ? (@.age > $min_age).name"),
+                    with_wrapper=True,
+                ),
+            ]
+        ),
+    ),
+    table_name="families",
+)
+
+SETS = [{"father": "Paul"}, {"father": "Nobody"}, {"father": "John"}]
+
+
+def test_values():
+    assert BatchQuery(QUERY, SETS).as_string() == (
+        'SELECT "params"."param_set" AS "param_set", "jt".* FROM '
+        "(VALUES (0, 'Paul'), (1, 'Nobody'), (2, 'John')) "
+        'AS "params" ("param_set", "father"), "families", '
+        "JSON_TABLE (families.data, '$[*] ? (@.father == $father)' "
+        'PASSING \'2\' AS min_age, "params"."father" AS father COLUMNS ('
+        "mother text PATH '$.mother', "
+        "children text PATH '$.children[*] ? (@.age > $min_age).name' WITH WRAPPER"
+        ')) AS "jt"'
+    )
+
+
+def test_parameterized():
+    statement, values = BatchQuery(QUERY, SETS).parameterized()
+    assert values == [["Paul", "Nobody", "John"]]
+    assert as_string(statement).startswith(
+        'SELECT "params"."param_set" - 1 AS "param_set", "jt".* FROM '
+        'unnest($1) WITH ORDINALITY AS "params" ("father", "param_set"), "families", '
+    )
+    other, _ = BatchQuery(QUERY, SETS[:1]).parameterized()
+    assert as_string(other) == as_string(statement)
+
+
+def test_frozen_query():
+    assert (
+        BatchQuery(QUERY.freeze(), SETS).as_string()
+        == BatchQuery(QUERY, SETS).as_string()
+    )
+
+
+@pytest.mark.parametrize(
+    "parameter_sets",
+    [[], [{}], [{"father": "John"}, {"mother": "Mary"}], [{"param_set": "1"}]],
+)
+def test_bad_parameter_sets(parameter_sets):
+    with pytest.raises(ValueError):
+        BatchQuery(QUERY, parameter_sets).as_sql()
+
+
+def test_split():
+    batch = BatchQuery(QUERY, SETS)
+    assert batch.split([(2, "Mary", None), (0, "Laura", "x")]) == [
+        [("Laura", "x")],
+        [],
+        [("Mary", None)],
+    ]
+
+
+@pytest.mark.parametrize("prepared", [False, True])
+def test_fetch_all(families_table_cursor: cursor, prepared):  # noqa: F811
+    results = BatchQuery(QUERY, SETS).fetch_all(families_table_cursor, prepared)
+    for parameters, rows in zip(SETS, results):
+        query = JsonQuery(
+            JsonTable(
+                QUERY.json_table.context_item,
+                QUERY.json_table.path_expression,
+                PassingList(
+                    [Passing(parameters["father"], "father"), Passing("2", "min_age")]
+                ),
+                QUERY.json_table.columns,
+            ),
+            table_name="families",
+        )
+        families_table_cursor.execute(query.as_sql())
+        assert rows == families_table_cursor.fetchall()
+    assert results[0] == [("Laura", '["Sarah", "Noah"]')]
+    assert len(prepared_statements(families_table_cursor.connection)) == prepared
+
+
+DOCUMENTS = [FAMILIES, [{"father": 'Tab\there, "quoted" \\ backslash'}], [], {}]
+
+
+def test_documents_sql():
+    assert (
+        DocumentsQuery(FAMILIES_TABLE)
+        .as_string()
+        .startswith(
+            'SELECT "docs"."document" - 1 AS "document", "jt".* FROM '
+            'unnest(%s::jsonb[]) WITH ORDINALITY AS "docs" (doc, document), '
+            """JSON_TABLE ("docs"."doc", '$[*]' COLUMNS ("""
+        )
+    )
+    assert (
+        DocumentsQuery(FAMILIES_TABLE.freeze(), "loaded")
+        .as_string()
+        .startswith(
+            'SELECT "docs"."document" AS "document", "jt".* FROM "loaded" AS "docs", '
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "table_name, prepared", [(None, False), (None, True), ("loaded", False)]
+)
+def test_documents(transaction: cursor, table_name, prepared):  # noqa: F811
+    results = DocumentsQuery(FAMILIES_TABLE, table_name).fetch_all(
+        transaction, DOCUMENTS, prepared
+    )
+    evaluator = Evaluator(FAMILIES_TABLE)
+    assert results == [evaluator.rows(document) for document in DOCUMENTS]
+    assert results[1] == [(1, 'Tab\there, "quoted" \\ backslash', 0, None, None, None)]
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    Frozen,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    PathExpression,
+    RenderCache,
+    render_cache,
+)
+
+
+def make_query() -> JsonQuery:
+    return JsonQuery(
+        JsonTable(
+            context_item=ContextItem("js"),
+            path_expression=PathExpression("$.favorites[*]"),
+            passing=PassingList([Passing("Alfred Hitchcock", "filter")]),
+            columns=ColumnList(
+                [
+                    OrdinalityColumn("id"),
+                    Column("kind", "text", PathExpression("$.kind")),
+                    NestedPath(
+                        PathExpression("$.films[*]"),
+                        ColumnList(
+                            [Column("title", "text", PathExpression("$.title"))]
+                        ),
+                    ),
+                ]
+            ),
+        ),
+        table_name="my_films",
+    )
+
+
+@pytest.fixture
+def cache():
+    render_cache.clear()
+    yield render_cache
+    render_cache.clear()
+
+
+def test_freeze_is_hashable():
+    frozen = make_query().freeze()
+    assert isinstance(frozen, Frozen)
+    assert hash(frozen) == hash(make_query().freeze())
+    assert frozen == make_query().freeze()
+    assert frozen.thaw() == make_query()
+    assert frozen.table_name == "my_films"
+    with pytest.raises(AttributeError):
+        frozen.table_name = "other"  # type: ignore[misc]
+
+
+def test_frozen_renders_the_same(cache: RenderCache):
+    query = make_query()
+    assert query.freeze().as_sql() == query.as_sql()
+
+
+def test_frozen_cache_hits(cache: RenderCache):
+    frozen = make_query().freeze()
+    frozen.as_sql()
+    misses = cache.misses
+    assert frozen.as_sql() == make_query().freeze().as_sql()
+    assert cache.misses == misses
+    assert cache.hits == 2
+
+
+def test_replace_reuses_subtrees(cache: RenderCache):
+    frozen = make_query().freeze()
+    frozen.as_sql()
+    misses = cache.misses
+
+    renamed = frozen.replace(table_name="your_films")
+    assert renamed.json_table is frozen.json_table
+    assert renamed.as_sql() == JsonQuery(make_query().json_table, "your_films").as_sql()
+    # Only the query node itself is rendered again
+    assert cache.misses == misses + 1
+
+
+def test_render_cache_is_bounded():
+    cache = RenderCache(maxsize=2)
+    for n in range(5):
+        cache.get(n, lambda: "rendered")
+    assert cache.info() == (0, 5, 2, 2)
+    assert cache.get(4, lambda: "again") == "rendered"
+    # The oldest entries were evicted
+    assert cache.get(0, lambda: "again") == "again"
+
+
+def test_render_cache_threads():
+    cache = RenderCache(maxsize=8)
+
+    def work():
+        for n in range(1000):
+            cache.get(n % 16, object)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    info = cache.info()
+    assert info.hits + info.misses == 8000
+    assert info.currsize == 8
@@ -0,0 +1,131 @@
+import json
+import re
+from dataclasses import replace
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+)
+from src.jsontable.chunked import ChunkedQuery
+from src.jsontable.evaluate import evaluate
+from src.jsontable.parallel import ParallelExecutor
+from src.jsontable.pool import ConnectionPool
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+
+from .test_parallel import FakeConnection
+
+from .test_evaluate import FAMILIES, FAMILIES_TABLE
+
+ITEMS_TABLE = JsonTable(
+    ContextItem("doc"),
+    "$.items[*]",
+    columns=ColumnList(
+        [
+            OrdinalityColumn("n"),
+            Column("a", "integer"),
+            NestedPath(
+                "$.b[*]", ColumnList([OrdinalityColumn("m"), Column("b", "int", "$")])
+            ),
+        ]
+    ),
+)
+
+DOCUMENT = {"items": [{"a": n, "b": list(range(n % 3))} for n in range(23)]}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 10, 23, 100])
+def test_chunks_give_the_same_rows(chunk_size):
+    chunked = ChunkedQuery(JsonQuery(ITEMS_TABLE), chunk_size)
+    rows = []
+    for start, chunk in chunked.chunks(len(DOCUMENT["items"])):
+        rows.extend(chunked.correct(evaluate(chunk.json_table, DOCUMENT), start))
+    assert rows == evaluate(ITEMS_TABLE, DOCUMENT)
+
+
+def test_chunk_paths():
+    chunked = ChunkedQuery(JsonQuery(ITEMS_TABLE, "docs"), 10)
+    assert [
+        (start, chunk.json_table.path_expression) for start, chunk in chunked.chunks(25)
+    ] == [(0, "$.items[0 to 9]"), (10, "$.items[10 to 19]"), (20, "$.items[20 to 29]")]
+    assert as_string(chunked.length()) == (
+        "SELECT max(jsonb_path_query_first((doc)::jsonb, '$.items.size()')::int), "
+        "max(jsonb_array_length(jsonb_path_query_array((doc)::jsonb, "
+        "'$.items.size()'))) FROM \"docs\""
+    )
+
+
+def test_table_columns_are_skipped():
+    chunked = ChunkedQuery(JsonQuery(FAMILIES_TABLE, "families", table_columns=["id"]))
+    assert chunked.correct([(7, 1, "John"), (7, 2, "Paul")], 10) == [
+        (7, 11, "John"),
+        (7, 12, "Paul"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "path_expression", ["$.items", "$.items[*].a", "strict $.items[*]", "$.*[*]"]
+)
+def test_root_path_must_be_an_array(path_expression):
+    query = JsonQuery(JsonTable(ContextItem("doc"), path_expression))
+    with pytest.raises(ValueError, match="can't be chunked"):
+        ChunkedQuery(query).chunks(10)
+
+
+def test_arrays_before_the_last_key(connection):  # noqa: F811
+    # Lax mode unwraps $.a, so $.a.items[*] reaches two arrays
+    document = {"a": [{"items": [1, 2]}, {"items": [3]}]}
+    context = ContextItem(f"'{json.dumps(document)}'::jsonb")
+    query = JsonQuery(
+        JsonTable(context, "$.a.items[*]", columns=ColumnList([OrdinalityColumn("n")]))
+    )
+    with pytest.raises(ValueError, match="reaches 2 arrays"):
+        ChunkedQuery(query, chunk_size=1).fetch_all(connection)
+
+
+def test_stream(connection):  # noqa: F811
+    context = ContextItem(f"'{json.dumps(FAMILIES)}'::jsonb")
+    query = JsonQuery(JsonTable(context, "$[*]", columns=FAMILIES_TABLE.columns))
+    with connection.cursor() as cursor:
+        cursor.execute(query.as_sql())
+        expected = cursor.fetchall()
+    chunked = ChunkedQuery(query, chunk_size=1)
+    assert list(chunked.stream(connection)) == expected
+    assert chunked.fetch_all(connection) == expected
+
+
+class ChunkConnection(FakeConnection):
+    """
+    Answers the length query, and gives each chunk the rows of its
+    evaluation against DOCUMENT
+    """
+
+    def rows(self, statement: str) -> list[tuple]:
+        if statement.startswith("SELECT max("):
+            return [(len(DOCUMENT["items"]), 1)]
+        match = re.search(r"'(\$\.items\[[^']*)'", statement)
+        assert match
+        return evaluate(replace(ITEMS_TABLE, path_expression=match[1]), DOCUMENT)
+
+
+def test_chunks_share_a_snapshot():
+    ChunkConnection.connections.clear()
+    pool = ConnectionPool("", maxconn=3, connect=ChunkConnection)
+    chunked = ChunkedQuery(JsonQuery(ITEMS_TABLE, "docs"), chunk_size=10)
+    rows = chunked.fetch_all(None, ParallelExecutor(pool, itersize=5))
+    assert rows == evaluate(ITEMS_TABLE, DOCUMENT)
+    exporting, *importing = ChunkConnection.connections
+    # The length is read in the snapshot exported for the chunks
+    assert exporting.log[1:] == [
+        "SELECT pg_export_snapshot()",
+        as_string(chunked.length()),
+    ]
+    snapshot = "SET TRANSACTION SNAPSHOT '00000003-00000002-1'"
+    assert sum(c.log.count(snapshot) for c in importing) == 3
@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    PathExpression,
+)
+from src.jsontable.columnar import (
+    arrow_type,
+    column_types,
+    fetch_arrow,
+    fetch_numpy,
+    record_batches,
+)
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+QUERY = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("families.data"),
+        path_expression=PathExpression("$[*]"),
+        columns=ColumnList(
+            [
+                OrdinalityColumn("id"),
+                Column("father", "VARCHAR(20)", PathExpression("$.father")),
+                ColumnExists("married", PathExpression("$.marriage_date")),
+                NestedPath(
+                    PathExpression("$.children[*]"),
+                    ColumnList([Column("age", "INTEGER", PathExpression("$.age"))]),
+                ),
+            ]
+        ),
+    ),
+    table_name="families",
+)
+
+
+def test_column_types():
+    assert column_types(QUERY) == {
+        "id": "integer",
+        "father": "varchar",
+        "married": "boolean",
+        "age": "integer",
+    }
+
+
+def test_fetch_numpy(families_table_cursor: cursor):  # noqa: F811
+    numpy = pytest.importorskip("numpy")
+    arrays = fetch_numpy(QUERY, families_table_cursor.connection, batch_size=2)
+    assert arrays["id"].dtype == numpy.int32
+    assert arrays["id"].tolist() == [1, 1, 2, 2, 2]
+    assert arrays["father"].tolist() == ["John", "John", "Paul", "Paul", "Paul"]
+    assert arrays["married"].tolist() == [True, True, False, False, False]
+    assert arrays["age"].tolist() == [12, 10, 9, 3, 1]
+
+
+def test_fetch_arrow(families_table_cursor: cursor):  # noqa: F811
+    pyarrow = pytest.importorskip("pyarrow")
+    batch = fetch_arrow(QUERY, families_table_cursor.connection, batch_size=2)
+    assert batch.schema.types == [
+        pyarrow.int32(),
+        pyarrow.string(),
+        pyarrow.bool_(),
+        pyarrow.int32(),
+    ]
+    assert batch.to_pydict()["age"] == [12, 10, 9, 3, 1]
+
+
+def test_arrow_types():
+    pyarrow = pytest.importorskip("pyarrow")
+    assert arrow_type("NUMERIC(10, 2)") == pyarrow.decimal128(10, 2)
+    assert arrow_type("numeric(60,4)") == pyarrow.decimal256(60, 4)
+    assert arrow_type("numeric") == pyarrow.large_string()
+    assert arrow_type("jsonb") == pyarrow.large_string()
+    assert arrow_type("timestamptz") == pyarrow.timestamp("us", tz="UTC")
+    assert arrow_type("int4range") == pyarrow.large_string()
+
+
+def test_batches_share_a_schema(monkeypatch):
+    pyarrow = pytest.importorskip("pyarrow")
+    query = JsonQuery(
+        JsonTable(
+            ContextItem("doc"),
+            "$[*]",
+            columns=ColumnList(
+                [
+                    Column("price", "numeric"),
+                    Column("tags", "jsonb"),
+                    Column("born", "date"),
+                ]
+            ),
+        )
+    )
+    batches = [
+        [(None, None, None)],
+        [(Decimal("12345678901234567890123456789012.5"), ["a", 1], None)],
+    ]
+    monkeypatch.setattr(JsonQuery, "stream", lambda *args, **kwargs: iter(batches))
+    first, second = record_batches(query, connection=None)
+    assert first.schema == second.schema
+    assert second.to_pydict() == {
+        "price": ["12345678901234567890123456789012.5"],
+        "tags": ['["a", 1]'],
+        "born": [None],
+    }
+    assert first.schema.types[2] == pyarrow.date32()
@@ -0,0 +1,271 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    FormatJson,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.evaluate import Evaluator, evaluate, jsonb_text
+from src.jsontable.render import quote_literal
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+from .test_film_examples import data as films
+
+FAMILIES = [
+    {
+        "father": "John",
+        "mother": "Mary",
+        "children": [{"age": 12, "name": "Eric"}, {"age": 10, "name": "Beth"}],
+        "marriage_date": "2003-12-05",
+    },
+    {
+        "father": "Paul",
+        "mother": "Laura",
+        "children": [
+            {"age": 9, "name": "Sarah"},
+            {"age": 3, "name": "Noah"},
+            {"age": 1, "name": "Peter"},
+        ],
+    },
+]
+
+FAMILIES_TABLE = JsonTable(
+    context_item=ContextItem("families.data"),
+    path_expression=PathExpression("$[*]"),
+    columns=ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("father", "TEXT", PathExpression("$.father")),
+            ColumnExists(
+                "married",
+                type="INTEGER",
+                path_expression=PathExpression("$.marriage_date"),
+            ),
+            NestedPath(
+                PathExpression("$.children[*]"),
+                ColumnList(
+                    [
+                        OrdinalityColumn("child_id"),
+                        Column("child", "TEXT", PathExpression("$.name")),
+                        Column("age", "INTEGER", PathExpression("$.age")),
+                    ]
+                ),
+            ),
+        ]
+    ),
+)
+
+FILMS_WITH_PASSING = JsonTable(
+    context_item=ContextItem("js"),
+    path_expression=PathExpression("$.favorites[*] ? (@.films[*].director == $filter)"),
+    passing=PassingList(
+        [Passing("Alfred Hitchcock", "filter"), Passing("Vertigo", "filter2")]
+    ),
+    columns=ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("kind", "text", PathExpression("$.kind")),
+            Column(
+                "title",
+                "text",
+                PathExpression("$.films[*].title"),
+                format_json=FormatJson(True),
+                quotes="OMIT",
+            ),
+            Column(
+                "director", "text", PathExpression("$.films[*].director"), quotes="KEEP"
+            ),
+        ]
+    ),
+)
+
+FILMS_WRAPPED = JsonTable(
+    context_item=ContextItem("js"),
+    path_expression=PathExpression("$.favorites[*]"),
+    columns=ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("kind", "text", PathExpression("$.kind")),
+            Column(
+                "title", "text", PathExpression("$.films[*].title"), with_wrapper=True
+            ),
+            Column("films", "jsonb", PathExpression("$.films")),
+            Column("first", "text", PathExpression("$.films[0].title")),
+            Column("many", "text", PathExpression("$.films[*].title")),
+        ]
+    ),
+)
+
+SIBLINGS = JsonTable(
+    context_item=ContextItem("js"),
+    path_expression=PathExpression("$"),
+    columns=ColumnList(
+        [
+            Column("name", "text"),
+            NestedPath(
+                PathExpression("$.tags[*]"),
+                ColumnList([OrdinalityColumn("tag_n"), Column("tag", "text", "$")]),
+            ),
+            NestedPath(
+                PathExpression("$.sizes[*] ? (@ > 1)"),
+                ColumnList(
+                    [Column("size", "numeric", "$"), Column("kind", "text", "$.type()")]
+                ),
+            ),
+        ]
+    ),
+)
+
+KEYVALUES = JsonTable(
+    context_item=ContextItem("js"),
+    path_expression=PathExpression("$[*].keyvalue()"),
+    columns=ColumnList(
+        [
+            Column("id", "bigint"),
+            Column("key", "text"),
+            Column("value", "text"),
+            NestedPath(
+                PathExpression('$.value ? (@.type() == "object").keyvalue()'),
+                ColumnList([Column("inner_id", "bigint", "$.id")]),
+            ),
+        ]
+    ),
+)
+
+
+def test_families():
+    assert Evaluator(FAMILIES_TABLE).rows(FAMILIES) == [
+        (1, "John", 1, 1, "Eric", 12),
+        (1, "John", 1, 2, "Beth", 10),
+        (2, "Paul", 0, 1, "Sarah", 9),
+        (2, "Paul", 0, 2, "Noah", 3),
+        (2, "Paul", 0, 3, "Peter", 1),
+    ]
+
+
+def test_passing_and_quotes():
+    assert evaluate(FILMS_WITH_PASSING, films) == [
+        (1, "horror", "Psycho", '"Alfred Hitchcock"'),
+        (2, "thriller", "Vertigo", '"Alfred Hitchcock"'),
+    ]
+
+
+def test_frozen_table():
+    assert evaluate(FILMS_WITH_PASSING.freeze(), films) == evaluate(
+        FILMS_WITH_PASSING, films
+    )
+
+
+def test_wrapper_and_errors():
+    rows = evaluate(FILMS_WRAPPED, films)
+    assert rows[0] == (
+        1,
+        "comedy",
+        '["Bananas", "The Dinner Game"]',
+        films["favorites"][0]["films"],
+        "Bananas",
+        # Two items without a wrapper is an error, which is NULL
+        None,
+    )
+    assert rows[3] == (
+        4,
+        "drama",
+        '["Yojimbo"]',
+        [{"title": "Yojimbo", "director": "Akira Kurosawa"}],
+        "Yojimbo",
+        "Yojimbo",
+    )
+
+
+def test_sibling_nested_paths():
+    rows = evaluate(
+        SIBLINGS, {"name": "shirt", "tags": ["a", "b"], "sizes": [1, 2.5, 12]}
+    )
+    assert rows == [
+        ("shirt", 1, "a", None, None),
+        ("shirt", 2, "b", None, None),
+        ("shirt", None, None, Decimal("2.5"), "number"),
+        ("shirt", None, None, Decimal("12"), "number"),
+    ]
+    # With no nested rows at all, the parent row is kept
+    assert evaluate(SIBLINGS, {"name": "hat"}) == [("hat", None, None, None, None)]
+
+
+def test_rows_many():
+    evaluator = Evaluator(FAMILIES_TABLE)
+    rows = list(evaluator.rows_many([FAMILIES, FAMILIES[:1], []]))
+    assert len(rows) == 7
+    assert rows[5][:2] == (1, "John")
+
+
+def test_keyvalue():
+    document = json.loads(
+        '[{"a": 1, "b": [1, 2]}, {"c": {"a": "bbb"}, "d": 1e2}]', parse_float=Decimal
+    )
+    # Objects are numbered by their offset in the jsonb of the document
+    assert evaluate(KEYVALUES, document) == [
+        (12, "a", "1", None),
+        (12, "b", None, None),
+        (72, "c", None, 52),
+        (72, "d", "100", None),
+    ]
+
+
+def test_jsonb_text():
+    assert jsonb_text({"bb": 1, "a": [True, None, 1.5], "c": "é"}) == (
+        '{"a": [true, null, 1.5], "c": "é", "bb": 1}'
+    )
+
+
+def test_composable_passing():
+    from psycopg2 import sql
+
+    table = JsonTable(
+        ContextItem("js"),
+        "$",
+        PassingList([Passing(sql.Placeholder(), "x")]),
+        ColumnList([Column("a", "text")]),
+    )
+    with pytest.raises(ValueError):
+        Evaluator(table)
+
+
+@pytest.mark.parametrize(
+    "json_table, document",
+    [
+        (FAMILIES_TABLE, FAMILIES),
+        (FILMS_WITH_PASSING, films),
+        (FILMS_WRAPPED, films),
+        (SIBLINGS, {"name": "shirt", "tags": ["a", "b"], "sizes": [1, 2.5, 12]}),
+        (SIBLINGS, {"name": "hat", "sizes": "L"}),
+        (KEYVALUES, '[{"a": 1, "b": [1, 2]}, {"c": {"a": "bbb"}, "d": 1e2}]'),
+        (SIBLINGS, '{"name": "cap", "sizes": [1e2, 2.50]}'),
+    ],
+)
+def test_matches_postgres(transaction: cursor, json_table, document):  # noqa: F811
+    """
+    The evaluator returns the same rows as the database
+    """
+    text = document if isinstance(document, str) else json.dumps(document)
+    if isinstance(document, str):
+        # Numbers as they were written, which jsonb keeps
+        document = json.loads(document, parse_float=Decimal)
+    context = ContextItem(f"{quote_literal(text)}::jsonb")
+    query = JsonTable(
+        context, json_table.path_expression, json_table.passing, json_table.columns
+    )
+    transaction.execute(f"SELECT * FROM {query.as_string()}")
+    assert evaluate(json_table, document) == transaction.fetchall()
@@ -0,0 +1,164 @@
+import io
+import struct
+import threading
+from decimal import Decimal
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    PathExpression,
+)
+from src.jsontable.export import (
+    SIGNATURE,
+    copy_chunks,
+    copy_rows,
+    copy_sql,
+    copy_to,
+    decode_binary,
+)
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+QUERY = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("families.data"),
+        path_expression=PathExpression("$[*]"),
+        columns=ColumnList(
+            [
+                OrdinalityColumn("id"),
+                Column("father", "text", PathExpression("$.father")),
+                ColumnExists("married", PathExpression("$.marriage_date")),
+                NestedPath(
+                    PathExpression("$.children[*]"),
+                    ColumnList([Column("age", "integer", PathExpression("$.age"))]),
+                ),
+            ]
+        ),
+    ),
+    table_name="families",
+)
+
+
+def field(data: bytes | None) -> bytes:
+    if data is None:
+        return struct.pack(">i", -1)
+    return struct.pack(">i", len(data)) + data
+
+
+def test_copy_sql():
+    rendered = as_string(copy_sql(QUERY, header=True))
+    assert rendered.startswith('COPY (SELECT "jt".* FROM "families", JSON_TABLE (')
+    assert rendered.endswith(') AS "jt") TO STDOUT WITH (FORMAT csv, HEADER true)')
+
+
+def test_decode_binary():
+    data = (
+        SIGNATURE
+        + struct.pack(">ii", 0, 0)
+        + struct.pack(">h", 4)
+        + field(struct.pack(">i", 1))
+        + field("Jöhn".encode())
+        + field(b"\x01")
+        # 12.50 as numeric: 2 digits, weight 0, positive, scale 2
+        + field(struct.pack(">hhHhhh", 2, 0, 0, 2, 12, 5000))
+        + struct.pack(">h", 4)
+        + field(struct.pack(">i", -2))
+        + field(None)
+        + field(b"\x00")
+        + field(None)
+        + struct.pack(">h", -1)
+    )
+    # Split the data at awkward places
+    chunks = [data[n : n + 5] for n in range(0, len(data), 5)]
+    types = ["integer", "text", "boolean", "numeric"]
+    assert list(decode_binary(chunks, types)) == [
+        (1, "Jöhn", True, Decimal("12.50")),
+        (-2, None, False, None),
+    ]
+
+
+def test_decode_long_numerics():
+    digits = [123, 4567, 8901, 2345, 6789, 123, 4567, 8901, 2300]
+    data = (
+        SIGNATURE
+        + struct.pack(">ii", 0, 0)
+        + struct.pack(">h", 2)
+        # 33 significant digits, more than the default decimal context holds
+        + field(struct.pack(">hhHh9h", 9, 7, 0, 2, *digits))
+        # -0.000012, whose only digit is past the first group of zeros
+        + field(struct.pack(">hhHhh", 1, -2, 0x4000, 6, 1200))
+        + struct.pack(">h", -1)
+    )
+    assert list(decode_binary([data], ["numeric", "numeric"])) == [
+        (Decimal("1234567890123456789012345678901.23"), Decimal("-0.000012"))
+    ]
+    (row,) = decode_binary([data], ["numeric", "numeric"])
+    assert str(row[0]) == "1234567890123456789012345678901.23"
+
+
+class CopyConnection:
+    """
+    Sends chunks until cancelled, then fails as a cancelled COPY does
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.ended = False
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def copy_expert(self, statement, file):
+                while not connection.cancelled.is_set():
+                    file.write(b"row\n")
+                connection.ended = True
+                raise RuntimeError("canceling statement due to user request")
+
+        return Cursor()
+
+
+def test_copy_chunks_cancel():
+    connection = CopyConnection()
+    chunks = copy_chunks(QUERY, connection, max_chunks=2)
+    assert next(chunks) == b"row\n"
+    chunks.close()
+    # The COPY was read to its end rather than left on the connection
+    assert connection.cancelled.is_set() and connection.ended
+
+
+def test_copy_csv(families_table_cursor: cursor):  # noqa: F811
+    file = io.BytesIO()
+    copy_to(QUERY, families_table_cursor, file, header=True)
+    assert file.getvalue().decode().splitlines() == [
+        "id,father,married,age",
+        "1,John,t,12",
+        "1,John,t,10",
+        "2,Paul,f,9",
+        "2,Paul,f,3",
+        "2,Paul,f,1",
+    ]
+
+
+def test_copy_rows(families_table_cursor: cursor):  # noqa: F811
+    families_table_cursor.execute(QUERY.as_sql())
+    expected = families_table_cursor.fetchall()
+    assert list(copy_rows(QUERY, families_table_cursor.connection)) == expected
@@ -90,3 +90,28 @@ def test_families(families_table_cursor: cursor):  # noqa: F811
         (2, "Paul", 0, 2, "Noah", 3),
         (2, "Paul", 0, 3, "Peter", 1),
     ]
+
+
+def test_families_stream(families_table_cursor: cursor):  # noqa: F811
+    jq = JsonQuery(
+        json_table=JsonTable(
+            context_item=ContextItem("families.data"),
+            path_expression=PathExpression("$[*].children[*]"),
+            columns=ColumnList([Column("child", "TEXT", PathExpression("$.name"))]),
+        ),
+        table_name="families",
+    )
+    connection = families_table_cursor.connection
+
+    assert list(jq.stream(connection, itersize=2)) == [
+        ("Eric",),
+        ("Beth",),
+        ("Sarah",),
+        ("Noah",),
+        ("Peter",),
+    ]
+    assert [len(batch) for batch in jq.stream(connection, 2, batches=True)] == [
+        2,
+        2,
+        1,
+    ]
@@ -0,0 +1,131 @@
+import datetime
+import json
+
+import pytest
+
+from src.jsontable import JsonQuery
+from src.jsontable.incremental import (
+    FileStore,
+    IncrementalQuery,
+    MemoryStore,
+    TableStore,
+)
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+from .test_evaluate import FAMILIES_TABLE
+
+QUERY = JsonQuery(FAMILIES_TABLE, table_name="families")
+
+
+def test_first_run_reads_everything():
+    assert as_string(IncrementalQuery(QUERY, "id").as_sql()).startswith(
+        'SELECT "families"."id", "jt".* FROM "families", JSON_TABLE ('
+    )
+    assert (
+        IncrementalQuery(QUERY, "id")
+        .as_string()
+        .endswith(' AS "jt" WHERE "families"."id" IS NOT NULL')
+    )
+    assert " WHERE " not in IncrementalQuery(QUERY, "xmin").as_string()
+
+
+def test_null_watermarks_are_skipped():
+    class Cursor:
+        def execute(self, statement):
+            pass
+
+        def fetchall(self):
+            return [(None, 1), (3, 2), (None, 3)]
+
+    rows, watermark = IncrementalQuery(QUERY, "updated_at").fetch(Cursor())
+    assert (rows, watermark) == ([(1,), (2,), (3,)], 3)
+
+
+def test_xmin_wraparound():
+    class Cursor:
+        statements: list[str] = []
+
+        def execute(self, statement):
+            if not isinstance(statement, str):
+                statement = as_string(statement)
+            self.statements.append(statement)
+
+        def fetchone(self):
+            return (120,)
+
+        def fetchall(self):
+            return [(1,)]
+
+    cursor = Cursor()
+    # Ids have wrapped around since the last run, so everything is read
+    rows, watermark = IncrementalQuery(QUERY, "xmin", "4294967000").fetch(cursor)
+    assert (rows, watermark) == ([(1,)], 120)
+    assert " WHERE " not in cursor.statements[-1]
+    IncrementalQuery(QUERY, "xmin", "100").fetch(cursor)
+    assert cursor.statements[-1].endswith(
+        """ WHERE "families"."xmin"::text::bigint >= 100"""
+    )
+
+
+def test_since():
+    since = datetime.datetime(2024, 5, 1, 12, tzinfo=datetime.timezone.utc)
+    query = IncrementalQuery(QUERY, "updated_at", since)
+    assert as_string(query.as_sql()).endswith(
+        """ AS "jt" WHERE "families"."updated_at" > '2024-05-01 12:00:00+00:00'"""
+    )
+    assert as_string(IncrementalQuery(QUERY, "xmin", "1234").as_sql()).startswith(
+        'SELECT "jt".* FROM "families", '
+    )
+    assert as_string(IncrementalQuery(QUERY, "xmin", "1234").as_sql()).endswith(
+        """ WHERE "families"."xmin"::text::bigint >= 1234"""
+    )
+
+
+def test_needs_a_table():
+    with pytest.raises(ValueError):
+        IncrementalQuery(JsonQuery(FAMILIES_TABLE), "id").as_sql()
+
+
+def test_stores(tmp_path):
+    path = str(tmp_path / "watermarks.json")
+    for store in (MemoryStore(), FileStore(path)):
+        assert store.get("families") is None
+        store.set("families", "1")
+        store.set("other", "2")
+        store.set("families", "3")
+        assert store.get("families") == "3"
+    with open(path) as file:
+        assert json.load(file) == {"families": "3", "other": "2"}
+
+
+FAMILY = json.dumps([{"father": "Ian", "children": [{"name": "Ann", "age": 4}]}])
+
+
+@pytest.mark.parametrize("column", ["id", "xmin"])
+def test_extract(families_table_cursor: cursor, column):  # noqa: F811
+    cursor = families_table_cursor
+    store = TableStore(cursor.connection)
+    incremental = IncrementalQuery(QUERY, column)
+    assert len(incremental.extract(cursor, store, "families")) == 5
+    if column == "id":
+        assert store.get("families") == "1"
+        assert incremental.extract(cursor, store, "families") == []
+
+    # Commit, so the next rows are written by a later transaction
+    cursor.execute("COMMIT")
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute("INSERT INTO families (data) VALUES (%s)", (FAMILY,))
+        rows = incremental.extract(cursor, store, "families")
+        assert (1, "Ian", 0, 1, "Ann", 4) in rows
+        if column == "id":
+            assert len(rows) == 1
+        cursor.execute("ROLLBACK")
+    finally:
+        cursor.execute("DROP TABLE families, jsontable_watermarks")
+        cursor.execute("COMMIT")
+        cursor.execute("BEGIN")
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+)
+from src.jsontable.materialize import (
+    drop_materialized_table,
+    materialized_table,
+    materialized_view,
+    refresh_view,
+)
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+from .test_evaluate import FAMILIES_TABLE
+
+QUERY = JsonQuery(FAMILIES_TABLE, table_name="families")
+
+
+def test_view():
+    view, index = materialized_view(QUERY, "families_flat", key="family_id")
+    assert as_string(view).startswith(
+        'CREATE MATERIALIZED VIEW "families_flat" AS '
+        'SELECT "families"."family_id", "jt".* FROM "families", JSON_TABLE ('
+    )
+    assert as_string(index) == (
+        'CREATE UNIQUE INDEX "families_flat_key" ON "families_flat" '
+        '("family_id", id, child_id) NULLS NOT DISTINCT'
+    )
+    assert as_string(refresh_view("families_flat")) == (
+        'REFRESH MATERIALIZED VIEW CONCURRENTLY "families_flat"'
+    )
+
+
+def test_single_root_item_needs_no_ordinality():
+    query = JsonQuery(
+        JsonTable(
+            ContextItem("doc"), "$.meta", columns=ColumnList([Column("a", "text")])
+        ),
+        table_name="docs",
+    )
+    _, index = materialized_view(query, "docs_flat")
+    assert (
+        as_string(index) == 'CREATE UNIQUE INDEX "docs_flat_key" ON "docs_flat" ("id")'
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # The key is also a column
+        JsonQuery(FAMILIES_TABLE, table_name="families"),
+        # No table
+        JsonQuery(FAMILIES_TABLE),
+        # A nested path without an ordinality column
+        JsonQuery(
+            JsonTable(
+                ContextItem("doc"),
+                "$",
+                columns=ColumnList(
+                    [NestedPath("$.a[*]", ColumnList([Column("a", "text", "$")]))]
+                ),
+            ),
+            table_name="docs",
+        ),
+        # A root path which selects many items, without an ordinality column
+        JsonQuery(
+            JsonTable(
+                ContextItem("doc"), "$[*]", columns=ColumnList([Column("a", "text")])
+            ),
+            table_name="docs",
+        ),
+    ],
+)
+def test_rows_must_be_identified(query):
+    with pytest.raises(ValueError):
+        materialized_table(query, "flat", key="id")
+
+
+def check(cursor: cursor):
+    cursor.execute("SELECT * FROM families_flat ORDER BY 1, 2, 5")
+    flat = cursor.fetchall()
+    query = JsonQuery(
+        FAMILIES_TABLE, table_name="families", table_columns=["family_id"]
+    )
+    cursor.execute(f"SELECT * FROM ({query.as_string(cursor)}) q ORDER BY 1, 2, 5")
+    assert flat == cursor.fetchall()
+    return flat
+
+
+def test_triggers(families_table_cursor: cursor):  # noqa: F811
+    cursor = families_table_cursor
+    cursor.execute("ALTER TABLE families RENAME id TO family_id")
+    for statement in materialized_table(QUERY, "families_flat", key="family_id"):
+        cursor.execute(statement)
+    assert len(check(cursor)) == 5
+
+    cursor.execute(
+        "INSERT INTO families (data) VALUES (%s)",
+        (json.dumps([{"father": "Ian", "children": [{"name": "Ann"}]}]),),
+    )
+    assert len(check(cursor)) == 6
+    cursor.execute(
+        """UPDATE families SET data = data || '[{"father": "Tom"}]' """
+        "WHERE family_id = 1"
+    )
+    assert len(check(cursor)) == 7
+    cursor.execute("DELETE FROM families WHERE family_id = 1")
+    assert check(cursor) == [(2, 1, "Ian", 0, 1, "Ann", None)]
+    cursor.execute("TRUNCATE families")
+    assert check(cursor) == []
+
+    for statement in drop_materialized_table(QUERY, "families_flat"):
+        cursor.execute(statement)
+    cursor.execute("INSERT INTO families (data) VALUES ('[]')")
+
+
+def test_refresh_view(families_table_cursor: cursor):  # noqa: F811
+    cursor = families_table_cursor
+    cursor.execute("ALTER TABLE families RENAME id TO family_id")
+    for statement in materialized_view(QUERY, "families_flat", key="family_id"):
+        cursor.execute(statement)
+    cursor.execute("DELETE FROM families")
+    # The view keeps the deleted rows until it is refreshed
+    cursor.execute("SELECT count(*) FROM families_flat")
+    assert cursor.fetchone() == (5,)
+    cursor.execute(refresh_view("families_flat"))
+    assert check(cursor) == []
@@ -0,0 +1,179 @@
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    PathExpression,
+)
+from src.jsontable.evaluate import evaluate
+from src.jsontable.optimize import factor_prefixes
+
+JSON_TABLE = JsonTable(
+    context_item=ContextItem("doc"),
+    path_expression=PathExpression("$.items[*]"),
+    columns=ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("x", "text", PathExpression("$.a.b.c.x")),
+            Column("y", "integer", PathExpression('$.a.b."c".y')),
+            Column("z", "text", PathExpression("$.a.b.c.z[*]"), with_wrapper=True),
+            Column("w", "text", PathExpression("$.a.b.w")),
+            ColumnExists("e", PathExpression("$.a.b.c.e")),
+            Column("v", "text", PathExpression("$.a.b.c.v")),
+        ]
+    ),
+)
+
+DOCUMENT = {
+    "items": [
+        {"a": {"b": {"c": {"x": "1", "y": 2, "z": [3, 4]}, "w": "w"}}},
+        {"a": {"b": {"c": "scalar", "w": "w"}}},
+        {"a": {"b": {"c": [{"x": "in an array"}]}}},
+        {"a": {"b": None}},
+        {},
+    ]
+}
+
+
+def test_factor_prefixes():
+    factored = factor_prefixes(JSON_TABLE, ["$.a.b.c"])
+    assert factored.columns == ColumnList(
+        [
+            OrdinalityColumn("id"),
+            NestedPath(
+                "$.a.b.c",
+                ColumnList(
+                    [
+                        Column("x", "text", "$.x"),
+                        Column("y", "integer", "$.y"),
+                        Column("z", "text", "$.z[*]", with_wrapper=True),
+                    ]
+                ),
+            ),
+            # Only one nested path is added to a list
+            Column("w", "text", PathExpression("$.a.b.w")),
+            ColumnExists("e", PathExpression("$.a.b.c.e")),
+            Column("v", "text", PathExpression("$.a.b.c.v")),
+        ]
+    )
+    assert evaluate(factored, DOCUMENT) == evaluate(JSON_TABLE, DOCUMENT)
+
+
+def test_not_beside_nested_paths():
+    json_table = JsonTable(
+        ContextItem("doc"),
+        "$",
+        columns=ColumnList(
+            [
+                Column("x", "text", "$.a.x"),
+                Column("y", "text", "$.a.y"),
+                Column("z", "text", "$.a.z"),
+                NestedPath(
+                    "$.list[*]",
+                    ColumnList(
+                        [
+                            Column("p", "text", "$.q.p"),
+                            Column("r", "text", "$.q.r"),
+                            Column("s", "text", "$.q.s"),
+                        ]
+                    ),
+                ),
+            ]
+        ),
+    )
+    factored = factor_prefixes(json_table, ["$.a", "$.list[*].q"])
+    assert factored.columns.columns[:3] == json_table.columns.columns[:3]
+    nested = factored.columns.columns[3]
+    assert nested.columns == ColumnList(
+        [
+            NestedPath(
+                "$.q",
+                ColumnList(
+                    [
+                        Column("p", "text", "$.p"),
+                        Column("r", "text", "$.r"),
+                        Column("s", "text", "$.s"),
+                    ]
+                ),
+            )
+        ]
+    )
+    document = {"a": {"x": 1}, "list": [{"q": {"p": 1, "s": 2}}, {"q": 3}, {}]}
+    assert evaluate(factored, document) == evaluate(json_table, document)
+
+
+def test_wildcards_end_a_prefix():
+    json_table = JsonTable(
+        ContextItem("doc"),
+        "$",
+        columns=ColumnList(
+            [Column(name, "text", f"$.a[*].b.{name}") for name in ("x", "y", "z")]
+        ),
+    )
+    factored = factor_prefixes(json_table, ["$.a.b"])
+    assert factored.columns == ColumnList(
+        [
+            NestedPath(
+                "$.a",
+                ColumnList(
+                    [Column(name, "text", f"$[*].b.{name}") for name in ("x", "y", "z")]
+                ),
+            )
+        ]
+    )
+    document = {"a": [{"b": {"x": 1}}, {"b": {"y": 2}}]}
+    assert evaluate(factored, document) == evaluate(json_table, document)
+    assert factor_prefixes(json_table, ["$.a"], min_columns=4) == json_table
+
+
+def test_only_the_prefixes_named():
+    json_table = JsonTable(
+        ContextItem("doc"),
+        "$",
+        columns=ColumnList(
+            [Column(name, "integer", f"$.a.b.{name}") for name in ("x", "y", "z")]
+        ),
+    )
+    assert factor_prefixes(json_table, []) == json_table
+    assert factor_prefixes(json_table, ["$.c"]) == json_table
+    # A longer prefix allows the part of it the columns share
+    factored = factor_prefixes(json_table, ["$.a.b.c"])
+    assert factored.columns.columns[0].path_expression == "$.a.b"
+    # A shorter one allows only itself
+    factored = factor_prefixes(json_table, ["$.a"])
+    assert factored.columns.columns[0].path_expression == "$.a"
+    with pytest.raises(ValueError):
+        factor_prefixes(json_table, ["$.a[*]"])
+
+
+def test_arrays_inside_a_prefix():
+    """
+    Factoring `$.a.b` changes the rows of documents where `a` is an array,
+    which is why it must be asked for
+    """
+    json_table = JsonTable(
+        ContextItem("doc"),
+        "$",
+        columns=ColumnList(
+            [Column(name, "integer", f"$.a.b.{name}") for name in ("x", "y", "z")]
+        ),
+    )
+    factored = factor_prefixes(json_table, ["$.a.b"])
+    # Safe: no array before the last key of the prefix
+    for document in [
+        {"a": {"b": {"x": 1, "y": 2}}},
+        {"a": {"b": [{"x": 1, "y": 2}]}},
+        {"a": {"b": [{"x": 1}, {"x": 2}]}},
+        {"a": 1},
+        {},
+    ]:
+        assert evaluate(factored, document) == evaluate(json_table, document)
+    document = {"a": [{"b": {"x": 1}}, {"b": {"x": 2}}]}
+    assert evaluate(json_table, document) == [(None, None, None)]
+    assert evaluate(factored, document) == [(1, None, None), (2, None, None)]
+    assert factor_prefixes(json_table, ["$.a"]) != factored
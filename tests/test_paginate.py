@@ -0,0 +1,50 @@
+import pytest
+
+from src.jsontable import JsonQuery
+from src.jsontable.paginate import InvalidToken, KeysetQuery
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+from .test_evaluate import FAMILIES_TABLE
+
+QUERY = JsonQuery(FAMILIES_TABLE, table_name="families")
+
+
+def test_first_page():
+    text = as_string(KeysetQuery(QUERY, page_size=2).as_sql())
+    assert text.startswith('SELECT "families"."id", "jt".* FROM "families", ')
+    assert text.endswith(
+        ' AS "jt" ORDER BY "families"."id", coalesce("jt".id, 0), '
+        'coalesce("jt".child_id, 0) LIMIT 3'
+    )
+
+
+def test_next_page():
+    first = KeysetQuery(QUERY, page_size=2)
+    token = first.token((4, 2, "Paul", 0, 3, "Noah", 3))
+    text = as_string(KeysetQuery(QUERY, page_size=2, after=token).as_sql())
+    assert (
+        ' AS "jt" WHERE ("families"."id" >= 4) AND (("families"."id", '
+        'coalesce("jt".id, 0), coalesce("jt".child_id, 0)) > (4, 2, 3)) '
+        "ORDER BY"
+    ) in text
+
+
+def test_tokens_are_checked():
+    token = KeysetQuery(QUERY, page_size=2).token((4, 2, "Paul", 0, 3, "Noah", 3))
+    with pytest.raises(InvalidToken, match="another query"):
+        KeysetQuery(QUERY, page_size=3, after=token).as_sql()
+    with pytest.raises(InvalidToken, match="malformed"):
+        KeysetQuery(QUERY, after="not a token").as_sql()
+
+
+def test_pages(families_table_cursor: cursor):  # noqa: F811
+    cursor = families_table_cursor
+    cursor.execute(KeysetQuery(QUERY, page_size=100).as_sql())
+    everything = cursor.fetchall()
+    pages = list(KeysetQuery(QUERY, page_size=2).pages(cursor))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [row for page in pages for row in page] == everything
@@ -0,0 +1,242 @@
+import re
+import threading
+
+import pytest
+from psycopg2 import extensions, sql
+
+from src.jsontable import Column, ColumnList, ContextItem, JsonQuery, JsonTable
+from src.jsontable.parallel import ParallelExecutor, ctid_ranges, key_ranges
+from src.jsontable.pool import ConnectionPool
+from src.jsontable.render import as_string
+from tests.fixtures import DSN
+from tests.fixtures import connection  # noqa: F401
+
+QUERY = JsonQuery(
+    JsonTable(ContextItem("doc"), "$", columns=ColumnList([Column("a", "integer")])),
+    table_name="docs",
+)
+
+# The rows of each partition, which are conditions "part = <n>"
+PARTS = [[(n, i) for i in range(5)] for n in range(6)]
+
+
+class FakeConnection:
+    """
+    Streams the rows of the partition its query asks for
+    """
+
+    open = 0
+    most = 0
+    statements: list[str] = []
+    connections: list["FakeConnection"] = []
+    lock = threading.Lock()
+
+    def __init__(self, dsn: str):
+        self.closed = 0
+        self.autocommit = False
+        self.log: list[str] = []
+        FakeConnection.connections.append(self)
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, name=None, withhold=False):
+        connection = self
+
+        class Cursor:
+            itersize = 1
+
+            def __enter__(self):
+                with connection.lock:
+                    FakeConnection.open += 1
+                    FakeConnection.most = max(FakeConnection.most, connection.open)
+                return self
+
+            def __exit__(self, *exc):
+                with connection.lock:
+                    FakeConnection.open -= 1
+
+            def execute(self, statement):
+                if not isinstance(statement, str):
+                    statement = as_string(statement)
+                connection.log.append(statement)
+                if statement.startswith("SET TRANSACTION"):
+                    return
+                if statement == "SELECT pg_export_snapshot()":
+                    self.rows = [("00000003-00000002-1",)]
+                    return
+                FakeConnection.statements.append(statement)
+                self.rows = connection.rows(statement)
+
+            def fetchmany(self, size):
+                rows, self.rows = self.rows[:size], self.rows[size:]
+                return rows
+
+            def fetchone(self):
+                return self.rows.pop(0)
+
+        return Cursor()
+
+    def rows(self, statement: str) -> list[tuple]:
+        match = re.search(r"part = (\d+)", statement)
+        assert match
+        part = int(match[1])
+        if part >= len(PARTS):
+            raise ValueError(f"no partition {part}")
+        return list(PARTS[part])
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def executor(max_workers: int, consistent: bool = True) -> ParallelExecutor:
+    pool = ConnectionPool("", maxconn=3, connect=FakeConnection)
+    return ParallelExecutor(
+        pool, max_workers, itersize=2, buffer=1, consistent=consistent
+    )
+
+
+def conditions(parts) -> list[sql.Composed]:
+    return [sql.SQL("part = {}").format(sql.Literal(n)) for n in parts]
+
+
+def test_ordered():
+    rows = executor(3).fetch_all(QUERY, conditions(range(6)), ordered=True)
+    assert rows == [row for part in PARTS for row in part]
+
+
+def test_unordered():
+    FakeConnection.most = 0
+    rows = executor(10).fetch_all(QUERY, conditions(range(6)))
+    assert sorted(rows) == [row for part in PARTS for row in part]
+    # No more partitions run at once than the pool has connections
+    assert FakeConnection.most <= 3
+
+
+def test_errors_are_raised():
+    with pytest.raises(ValueError, match="no partition 99"):
+        executor(2).fetch_all(QUERY, conditions([0, 99, 1]), ordered=True)
+
+
+def test_errors_stop_the_others():
+    FakeConnection.statements.clear()
+    with pytest.raises(ValueError, match="no partition 99"):
+        executor(1).fetch_all(QUERY, conditions([99, *range(6)]))
+    # The one worker may have started the next partition, but no more
+    assert len(FakeConnection.statements) <= 2
+
+
+def test_stop_early():
+    parallel = executor(2)
+    stream = parallel.stream(QUERY, conditions(range(6)), ordered=True)
+    assert next(stream) == (0, 0)
+    stream.close()
+    stats = parallel.pool.stats()
+    assert stats.in_use == 0
+
+
+def test_partitions_share_a_snapshot():
+    FakeConnection.connections.clear()
+    parallel = executor(2)
+    assert parallel.max_workers == 2
+    rows = parallel.fetch_all(QUERY, conditions(range(6)), ordered=True)
+    assert rows == [row for part in PARTS for row in part]
+    exporting, *importing = FakeConnection.connections
+    assert exporting.log == [
+        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ",
+        "SELECT pg_export_snapshot()",
+    ]
+    assert len(importing) == 2
+    for connection in importing:
+        # Each partition starts a transaction in the snapshot
+        logs = [connection.log[n : n + 3] for n in range(0, len(connection.log), 3)]
+        for log in logs:
+            assert log[:2] == [
+                "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ",
+                "SET TRANSACTION SNAPSHOT '00000003-00000002-1'",
+            ]
+            assert "part = " in log[2]
+    assert sum(len(c.log) for c in importing) == 6 * 3
+
+
+def test_inconsistent():
+    FakeConnection.connections.clear()
+    parallel = executor(10, consistent=False)
+    assert parallel.max_workers == 3
+    assert sorted(parallel.fetch_all(QUERY, conditions(range(6)))) == sorted(
+        row for part in PARTS for row in part
+    )
+    assert not any(
+        statement.startswith("SET") or "snapshot" in statement
+        for connection in FakeConnection.connections
+        for statement in connection.log
+    )
+
+
+def test_snapshot_needs_two_connections():
+    pool = ConnectionPool("", maxconn=1, connect=FakeConnection)
+    with pytest.raises(ValueError, match="at least two connections"):
+        ParallelExecutor(pool)
+    assert ParallelExecutor(pool, consistent=False).max_workers == 1
+
+
+def test_conditions_are_added():
+    FakeConnection.statements.clear()
+    query = JsonQuery(QUERY.json_table, "docs", where=[sql.SQL("true")])
+    assert executor(1).fetch_all(query, conditions([1])) == PARTS[1]
+    (statement,) = FakeConnection.statements
+    assert statement.endswith(' AS "jt" WHERE (true) AND (part = 1)')
+
+
+def test_ranges(connection):  # noqa: F811
+    with connection.cursor() as c:
+        c.execute("CREATE TEMPORARY TABLE docs (id serial, doc jsonb)")
+        c.execute(
+            """INSERT INTO docs (doc) SELECT jsonb_build_object('a', n) """
+            "FROM generate_series(1, 5000) n"
+        )
+    everything = _rows(connection, [sql.SQL("true")])
+    assert len(everything) == 5000
+    for ranges in (
+        ctid_ranges(connection, "docs", 4),
+        key_ranges(connection, "docs", "id", 4),
+    ):
+        assert len(ranges) == 4
+        assert sorted(_rows(connection, ranges)) == sorted(everything)
+
+
+def _rows(connection, ranges) -> list[tuple]:
+    rows = []
+    with connection.cursor() as c:
+        for condition in ranges:
+            c.execute(JsonQuery(QUERY.json_table, "docs", where=[condition]).as_sql())
+            rows.extend(c.fetchall())
+    return rows
+
+
+def test_executor_on_postgres():
+    pool = ConnectionPool(DSN, maxconn=2)
+    parallel = ParallelExecutor(pool)
+    try:
+        with pool.connection() as c, c.cursor() as setup:
+            setup.execute("CREATE TABLE parallel_docs (id serial, doc jsonb)")
+            setup.execute(
+                """INSERT INTO parallel_docs (doc) """
+                """SELECT jsonb_build_object('a', n) FROM generate_series(1, 1000) n"""
+            )
+            c.commit()
+        query = JsonQuery(QUERY.json_table, "parallel_docs")
+        rows = parallel.fetch_all(
+            query, parallel.partition(query, 4, key="id"), ordered=True
+        )
+        assert sorted(rows) == [(n,) for n in range(1, 1001)]
+        # The first partition has the ids below the first quartile, 250
+        assert max(rows[:249]) < min(rows[249:])
+    finally:
+        with pool.connection() as c, c.cursor() as teardown:
+            teardown.execute("DROP TABLE IF EXISTS parallel_docs")
+            c.commit()
+        pool.close()
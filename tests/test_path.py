@@ -0,0 +1,245 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonPathSyntaxError,
+    JsonTable,
+    NestedPath,
+    parse_path,
+    path_cache,
+)
+from src.jsontable.path import (
+    Comparison,
+    Current,
+    Filter,
+    Index,
+    Last,
+    Member,
+    Path,
+    PathError,
+    Root,
+    Subscript,
+    Value,
+    Variable,
+    common_prefix,
+)
+
+DOCUMENT = {
+    "a": [1, 2, 3, 4],
+    "b": {"c": "text", "d": None, "e": [{"f": 1}, {"f": 2}]},
+    "g": True,
+}
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("$.a", [[1, 2, 3, 4]]),
+        ("$.a[*]", [1, 2, 3, 4]),
+        ("$.a[1 to 2]", [2, 3]),
+        ("$.a[last]", [4]),
+        ("$.a[0, last - 1]", [1, 3]),
+        ("$.a[10]", []),
+        ("$.b.e.f", [1, 2]),
+        ('$."b".c', ["text"]),
+        ("$.b.*", ["text", None, [{"f": 1}, {"f": 2}]]),
+        ("$.missing", []),
+        ("$.g[0]", [True]),
+        ("$.a[*] ? (@ > 2)", [3, 4]),
+        ("$.a ? (@ % 2 == 0)", [2, 4]),
+        ("$.b.e[*] ? (@.f == $x).f", [2]),
+        ("$.a.size()", [4]),
+        ("$.b.c.type()", ["string"]),
+        ("$.a[0] * 2 + 1", [3]),
+        ("-$.a[1]", [-2]),
+        ('$.b ? (@.c like_regex "^T" flag "i").c', ["text"]),
+        ('$.b ? (@.c starts with "te").d', [None]),
+        ("$.b ? (exists(@.e[*] ? (@.f > 1))).c", ["text"]),
+        ("$.b ? (!(@.d == 1)).c", ["text"]),
+        ("$.b ? (!exists(@.x)).c", ["text"]),
+        ("$.a[*] ? (@ > $.a[last - 2])", [3, 4]),
+        ("$.b ? ((@.c > 1) is unknown).c", ["text"]),
+        ("$.a[*] > 3", [True]),
+        ("$.b.c == 1", [None]),
+    ],
+)
+def test_evaluate(path: str, expected: list):
+    assert parse_path(path).evaluate(DOCUMENT, {"x": 2}) == expected
+
+
+def test_errors():
+    # Arithmetic needs single numeric operands
+    with pytest.raises(PathError):
+        parse_path("$.a[*] * 2").evaluate(DOCUMENT)
+    assert parse_path("lax $.missing").evaluate(DOCUMENT) == []
+    with pytest.raises(PathError):
+        parse_path("strict $.missing").evaluate(DOCUMENT)
+    with pytest.raises(PathError):
+        parse_path("strict $.a[10]").evaluate(DOCUMENT)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "$.",
+        "$[",
+        "$.a ?",
+        "$.a.nope()",
+        "$ $",
+        "$.a.size(1)",
+        "$.a.decimal(1, 2, 3)",
+        "$.a.time(-1)",
+        "$.a.datetime(1)",
+        "$.a[1abc]",
+        "$.a[0x]",
+        "! $.a",
+        "$ ? (! @.a)",
+        "$ ? (!(@.a))",
+        "last",
+        "$.a ? (@ == last)",
+    ],
+)
+def test_syntax_errors(path: str):
+    with pytest.raises(ValueError):
+        parse_path(path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "$.favorites[*] ? (@.films[*].director == $filter)",
+        'strict $."key with spaces"[0 to last - 1, 3]',
+        "$.a[*] ? (@ > 1 && (@ < 10 || !(@ == 5))).type()",
+        "(1 + 2) * -$.a[0]",
+        "$.**{1 to last}.x",
+        '$ ? (@.name like_regex "^a.*" flag "i" && @.name starts with $"the prefix")',
+        "$ ? ((@.a == 1) is unknown) ? (exists (@.b))",
+        "$.a - (1 - 2)",
+        '$.a.decimal(10, -2).datetime("HH24:MI").time_tz(3).string()',
+    ],
+)
+def test_round_trip(path: str):
+    parsed = parse_path(path)
+    assert parse_path(str(parsed)).expression == parsed.expression
+    assert str(parse_path(str(parsed))) == str(parsed)
+
+
+def test_typed_ast():
+    path = parse_path("$.films[1 to last] ? (@.director == $filter).title")
+    assert path.expression == Path(
+        Root(),
+        (
+            Member("films"),
+            Subscript((Index(Value(1), Last()),)),
+            Filter(
+                Comparison(
+                    "==", Path(Current(), (Member("director"),)), Variable("filter")
+                )
+            ),
+            Member("title"),
+        ),
+    )
+
+
+def test_cache():
+    path_cache.clear()
+    assert parse_path("$.cached") is parse_path("$.cached")
+    assert path_cache.info().hits == 1
+
+
+def test_syntax_error_position():
+    with pytest.raises(JsonPathSyntaxError) as e:
+        parse_path("$.a ? (@ >)")
+    assert e.value.position == 10
+
+
+def test_common_prefix():
+    paths = [parse_path(p) for p in ("$.a.b[*].c", "$.a.b[*].d", "$.a.b.e")]
+    assert common_prefix(paths) == (Member("a"), Member("b"))
+    assert common_prefix([parse_path("$.a"), parse_path("@.a")]) == ()
+    assert common_prefix([parse_path("$.a"), parse_path("strict $.a")]) == ()
+
+
+def test_validate():
+    table = JsonTable(
+        ContextItem("js"),
+        "$.items[*]",
+        columns=ColumnList(
+            [
+                Column("a", "text", "$.a"),
+                NestedPath("$.b[*]", ColumnList([Column("c", "text", "$.c ? (@ ==)")])),
+            ]
+        ),
+    )
+    with pytest.raises(JsonPathSyntaxError, match="^c: "):
+        table.validate()
+
+
+@pytest.mark.parametrize(
+    "path, text, value",
+    [
+        ("$ ? (@ == 1.5e3)", "$ ? (@ == 1500)", Decimal("1.5e3")),
+        ("$ ? (@ == 1.50)", "$ ? (@ == 1.50)", Decimal("1.50")),
+        ("$ ? (@ == 0x1F)", "$ ? (@ == 31)", 31),
+        ("$ ? (@ == 0o17)", "$ ? (@ == 15)", 15),
+        ("$ ? (@ == 0b101)", "$ ? (@ == 5)", 5),
+        ("$ ? (@ == 1_000.000_1)", "$ ? (@ == 1000.0001)", Decimal("1000.0001")),
+    ],
+)
+def test_numeric_literals(path: str, text: str, value):
+    parsed = parse_path(path)
+    assert str(parsed) == text
+    expected = Path(Root(), (Filter(Comparison("==", Current(), Value(value))),))
+    # Compared as text, as Decimal("1.5e3") == 1500
+    assert repr(parsed.expression) == repr(expected)
+
+
+ITEMS = {
+    "when": "2023-08-15 12:34:56.5+05:30",
+    "day": "15 Aug 2023",
+    "price": "12.345",
+    "ratio": 1.5,
+    "flag": "yes",
+    "sizes": [1, 2.5],
+}
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("$.price.decimal(4, 2)", [Decimal("12.35")]),
+        ("$.price.number() + 1", [Decimal("13.345")]),
+        ("$.ratio.integer()", [2]),
+        ("$.ratio.bigint() + 0.5", [Decimal("2.5")]),
+        ("$.flag.boolean()", [True]),
+        ("$.sizes.string()", ["1", "2.5"]),
+        ("$.ratio + 1.5", [3.0]),
+        ("$.when.datetime().type()", ["timestamp with time zone"]),
+        ("$.when.timestamp_tz().string()", ["2023-08-15T12:34:56.5+05:30"]),
+        ("$.when.time_tz(0).string()", ["12:34:57+05:30"]),
+        ('$.day.datetime("DD Mon YYYY")', [datetime.date(2023, 8, 15)]),
+        ('"12:30".datetime("HH24:MI").string()', ["12:30:00"]),
+        ('"2023-08-15".timestamp()', [datetime.datetime(2023, 8, 15)]),
+    ],
+)
+def test_item_methods(path: str, expected: list):
+    assert parse_path(path).evaluate(ITEMS) == expected
+
+
+@pytest.mark.parametrize(
+    "path, message",
+    [
+        ("$.price.decimal(3, 2)", "numeric field overflow"),
+        ("$.price.bigint()", "invalid for type bigint"),
+        ("$.when.date()", "without time zone usage"),
+        ('$.day.datetime("YYYY-MM-DD")', "not recognized"),
+    ],
+)
+def test_item_method_errors(path: str, message: str):
+    with pytest.raises(PathError, match=message):
+        parse_path(path).evaluate(ITEMS)
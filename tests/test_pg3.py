@@ -0,0 +1,43 @@
+from dataclasses import replace
+
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.pg3 import as_psycopg, execute_pipeline
+from tests.fixtures import DSN
+
+psycopg = pytest.importorskip("psycopg")
+
+
+def make_query(name: str) -> JsonQuery:
+    return JsonQuery(
+        JsonTable(
+            context_item=ContextItem(
+                """'[{"name": "Eric", "age": 12}, {"name": "Beth", "age": 10}]'::jsonb"""
+            ),
+            path_expression=PathExpression("$[*] ? (@.name == $name)"),
+            passing=PassingList([Passing(name, "name")]),
+            columns=ColumnList([Column("age", "integer", PathExpression("$.age"))]),
+        )
+    )
+
+
+def test_as_psycopg():
+    query = replace(make_query("O'Brien"), table_name="my table")
+    assert as_psycopg(query).as_string(None) == query.as_string()
+    assert as_psycopg(query.freeze()) is as_psycopg(query.freeze())
+
+
+def test_execute_pipeline():
+    queries = [make_query(name) for name in ("Eric", "Beth")]
+    with psycopg.connect(DSN) as connection:
+        assert execute_pipeline(queries, connection) == [[(12,)], [(10,)]]
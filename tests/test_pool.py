@@ -0,0 +1,125 @@
+import threading
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.pool import ConnectionPool, Executor, PoolTimeout
+from tests.fixtures import DSN
+
+
+class FakeConnection:
+    """
+    Just enough of a connection for the pool to manage
+    """
+
+    def __init__(self, dsn: str):
+        self.closed = 0
+        self.healthy = True
+        self.failed = False
+
+    def get_transaction_status(self):
+        if self.failed:
+            return extensions.TRANSACTION_STATUS_INERROR
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def execute(self, statement):
+                if not connection.healthy:
+                    raise psycopg2.OperationalError("server closed the connection")
+
+        return Cursor()
+
+    def rollback(self):
+        if self.failed:
+            raise psycopg2.InterfaceError("connection already closed")
+
+    def close(self):
+        self.closed = 1
+
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool("", maxconn=2, connect=FakeConnection)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats.size, stats.idle, stats.in_use, stats.checkouts) == (1, 1, 0, 2)
+
+
+def test_pool_timeout():
+    pool = ConnectionPool("", maxconn=1, timeout=0.01, connect=FakeConnection)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+    assert pool.stats().timeouts == 1
+
+
+def test_pool_waits_for_a_connection():
+    pool = ConnectionPool("", maxconn=1, timeout=5, connect=FakeConnection)
+    connection = pool.getconn()
+    timer = threading.Timer(0.05, pool.putconn, [connection])
+    timer.start()
+    assert pool.getconn() is connection
+    assert pool.stats().wait_max >= 0.05
+
+
+def test_pool_replaces_broken_connections():
+    pool = ConnectionPool("", maxconn=1, check_after=0, connect=FakeConnection)
+    with pool.connection() as connection:
+        connection.healthy = False
+    with pool.connection() as replacement:
+        assert replacement is not connection
+    stats = pool.stats()
+    assert (stats.size, stats.health_checks, stats.replaced) == (1, 1, 1)
+
+
+def test_pool_drops_connections_which_cannot_roll_back():
+    pool = ConnectionPool("", maxconn=1, timeout=0.01, connect=FakeConnection)
+    with pytest.raises(ValueError, match="the query failed"):
+        with pool.connection() as connection:
+            connection.failed = True
+            raise ValueError("the query failed")
+    assert connection.closed
+    with pool.connection() as replacement:
+        assert replacement is not connection
+    assert pool.stats().size == 1
+
+
+def test_executor():
+    pool = ConnectionPool(DSN, maxconn=2)
+    executor = Executor(pool)
+    query = JsonQuery(
+        JsonTable(
+            context_item=ContextItem("""'[{"a": "x"}, {"a": "y"}]'::jsonb"""),
+            path_expression=PathExpression("$[*] ? (@.a == $a)"),
+            passing=PassingList([Passing("y", "a")]),
+            columns=ColumnList([Column("a", "text", PathExpression("$.a"))]),
+        )
+    )
+    try:
+        assert executor.fetch_all(query) == [("y",)]
+        assert executor.fetch_all(query) == [("y",)]
+        assert pool.stats().checkouts == 2
+    finally:
+        pool.close()
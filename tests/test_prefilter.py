@@ -0,0 +1,78 @@
+from psycopg2 import sql
+from psycopg2._psycopg import cursor
+
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.render import as_string
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+
+from .test_film_examples import TABLE_NAME, my_films  # noqa: F401
+
+JSON_TABLE = JsonTable(
+    context_item=ContextItem("js"),
+    path_expression=PathExpression("$.favorites[*] ? (@.films[*].director == $filter)"),
+    passing=PassingList([Passing("Alfred Hitchcock", "filter")]),
+    columns=ColumnList(
+        [OrdinalityColumn("id"), Column("kind", "text", PathExpression("$.kind"))]
+    ),
+)
+
+
+def test_variables_are_inlined():
+    assert as_string(JSON_TABLE.prefilter()) == (
+        """js @? '$.favorites[*] ? (@.films[*].director == "Alfred Hitchcock")'"""
+    )
+
+
+def test_path_without_variables_is_kept():
+    json_table = JsonTable(ContextItem("t.doc -> 'x'"), "$.a[*]  ? (@ > 1)")
+    assert (
+        as_string(json_table.prefilter()) == """(t.doc -> 'x') @? '$.a[*]  ? (@ > 1)'"""
+    )
+
+
+def test_bind_parameters_use_vars():
+    query, _ = JsonQuery(JSON_TABLE, TABLE_NAME, prefilter=True).parameterized()
+    assert as_string(query.as_sql()).endswith(
+        """ WHERE jsonb_path_exists(js, '$.favorites[*] ? (@.films[*].director """
+        """== $filter)', jsonb_build_object('filter', $1), silent => true)"""
+    )
+
+
+def test_where():
+    query = JsonQuery(
+        JSON_TABLE,
+        TABLE_NAME,
+        prefilter=True,
+        where=[sql.SQL("{} IS NOT NULL").format(sql.Identifier("js"))],
+    )
+    assert query.as_string().endswith(
+        """ WHERE (js @? '$.favorites[*] ? (@.films[*].director == """
+        """"Alfred Hitchcock")') AND ("js" IS NOT NULL)"""
+    )
+    assert query.freeze().as_string() == query.as_string()
+    assert "WHERE" not in JsonQuery(JSON_TABLE, TABLE_NAME).as_string()
+
+
+def test_prefilter_rows(my_films: cursor):  # noqa: F811
+    my_films.execute(
+        f"""INSERT INTO {TABLE_NAME}
+        SELECT '{{"favorites": []}}' FROM generate_series(1, 100)"""
+    )
+    my_films.execute(JsonQuery(JSON_TABLE, TABLE_NAME).as_sql())
+    expected = my_films.fetchall()
+    my_films.execute(JsonQuery(JSON_TABLE, TABLE_NAME, prefilter=True).as_sql())
+    assert my_films.fetchall() == expected == [(1, "horror"), (2, "thriller")]
+    # With bind parameters the values are passed to jsonb_path_exists
+    JsonQuery(JSON_TABLE, TABLE_NAME, prefilter=True).execute_prepared(my_films)
+    assert my_films.fetchall() == expected
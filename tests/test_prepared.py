@@ -0,0 +1,53 @@
+from src.jsontable import (
+    Column,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    Passing,
+    PassingList,
+    PathExpression,
+    prepared_statements,
+)
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import families_table_cursor  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+from tests.fixtures import cursor
+
+
+def make_query(father: str) -> JsonQuery:
+    return JsonQuery(
+        JsonTable(
+            context_item=ContextItem("families.data"),
+            path_expression=PathExpression("$[*] ? (@.father == $father)"),
+            passing=PassingList([Passing(father, "father")]),
+            columns=ColumnList([Column("mother", "text", PathExpression("$.mother"))]),
+        ),
+        table_name="families",
+    )
+
+
+def test_parameterized():
+    query, values = make_query("John").parameterized()
+    assert values == ["John"]
+    assert query.as_string() == (
+        'SELECT "jt".* FROM "families", '
+        "JSON_TABLE (families.data, '$[*] ? (@.father == $father)' "
+        "PASSING $1 AS father COLUMNS (mother text PATH '$.mother')) AS \"jt\""
+    )
+    assert query.as_string() == make_query("Paul").parameterized()[0].as_string()
+
+
+def test_execute_prepared(families_table_cursor: cursor):  # noqa: F811
+    statements = prepared_statements(families_table_cursor.connection)
+
+    make_query("John").execute_prepared(families_table_cursor)
+    assert families_table_cursor.fetchall() == [("Mary",)]
+    assert len(statements) == 1
+
+    make_query("Paul").execute_prepared(families_table_cursor)
+    assert families_table_cursor.fetchall() == [("Laura",)]
+    assert len(statements) == 1
+
+    families_table_cursor.execute("SELECT count(*) FROM pg_prepared_statements")
+    assert families_table_cursor.fetchone() == (1,)
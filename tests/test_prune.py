@@ -0,0 +1,91 @@
+import pytest
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    PathExpression,
+)
+from src.jsontable.evaluate import evaluate
+
+JSON_TABLE = JsonTable(
+    context_item=ContextItem("families.data"),
+    path_expression=PathExpression("$[*]"),
+    columns=ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("father", "text", PathExpression("$.father")),
+            ColumnExists("married", PathExpression("$.marriage_date")),
+            NestedPath(
+                PathExpression("$.children[*]"),
+                ColumnList(
+                    [
+                        OrdinalityColumn("child_id"),
+                        Column("child", "text", PathExpression("$.name")),
+                        NestedPath(
+                            PathExpression("$.toys[*]"),
+                            ColumnList([Column("toy", "text", PathExpression("$"))]),
+                        ),
+                    ]
+                ),
+            ),
+            NestedPath(
+                PathExpression("$.pets[*]"),
+                ColumnList([Column("pet", "text", PathExpression("$.name"))]),
+            ),
+        ]
+    ),
+)
+
+FAMILIES = [
+    {
+        "father": "John",
+        "children": [{"name": "Eric", "toys": ["ball", "kite"]}, {"name": "Beth"}],
+        "pets": [{"name": "Rex"}],
+    },
+    {"father": "Paul", "marriage_date": "2003-12-05"},
+]
+
+
+def test_prune_columns():
+    pruned = JSON_TABLE.prune(["father", "married"])
+    assert pruned.columns == ColumnList(JSON_TABLE.columns.columns[1:3])
+    assert evaluate(pruned, FAMILIES) == [("John", False), ("Paul", True)]
+
+
+def test_prune_nested_paths():
+    pruned = JSON_TABLE.prune(["id", "child"])
+    assert [c.name for c in pruned.columns.output_columns()] == ["id", "child"]
+    assert pruned.as_string() == (
+        "JSON_TABLE (families.data, '$[*]' COLUMNS (id FOR ORDINALITY, "
+        "NESTED PATH '$.children[*]' COLUMNS (child text PATH '$.name')))"
+    )
+    # The toys and pets no longer multiply the rows
+    assert evaluate(pruned, FAMILIES) == [(1, "Eric"), (1, "Beth"), (2, None)]
+
+
+def test_prune_keeps_the_rows_of_kept_paths():
+    assert evaluate(JSON_TABLE.prune(["father", "child", "toy"]), FAMILIES) == [
+        ("John", "Eric", "ball"),
+        ("John", "Eric", "kite"),
+        ("John", "Beth", None),
+        ("Paul", None, None),
+    ]
+
+
+def test_prune_query():
+    query = JsonQuery(JSON_TABLE, table_name="families").prune({"pet"})
+    assert query.table_name == "families"
+    assert [c.name for c in query.json_table.columns.output_columns()] == ["pet"]
+
+
+def test_prune_errors():
+    with pytest.raises(ValueError, match="no such columns: nope"):
+        JSON_TABLE.prune(["father", "nope"])
+    with pytest.raises(ValueError):
+        JSON_TABLE.prune([])
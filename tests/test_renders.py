@@ -1,3 +1,8 @@
+import operator
+from functools import reduce
+
+from psycopg2 import sql
+
 from src.jsontable import (
     Column,
     ColumnExists,
@@ -166,3 +171,29 @@ def test_jsontable(transaction: cursor):  # noqa: F811
         + "COLUMNS (id FOR ORDINALITY, kind text PATH '$.kind', "
         + "NESTED PATH '$.authors[*]' COLUMNS (author_id FOR ORDINALITY, author_name text PATH '$.name')))"
     )
+
+
+def test_as_sql_is_flat():
+    """
+    `as_sql` should produce the same parts as folding `+` over `as_sql_parts`,
+    as a single flat `Composed`
+    """
+    columns = ColumnList(
+        [
+            OrdinalityColumn("id"),
+            Column("kind", "text", PathExpression("$.kind")),
+            NestedPath(
+                PathExpression("$.authors[*]"),
+                ColumnList([Column("author_name", "text", PathExpression("$.name"))]),
+            ),
+        ]
+    )
+    json_table = JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression("$.favorites[*]"),
+        passing=PassingList([Passing("Alfred Hitchcock", "filter")]),
+        columns=columns,
+    )
+    composed = json_table.as_sql()
+    assert composed == reduce(operator.add, json_table.as_sql_parts())
+    assert not any(isinstance(part, sql.Composed) for part in composed.seq)
@@ -0,0 +1,156 @@
+import pytest
+from psycopg2 import sql
+from psycopg2._psycopg import cursor
+
+from src.jsontable import (
+    Column,
+    ColumnExists,
+    ColumnList,
+    ContextItem,
+    JsonQuery,
+    JsonTable,
+    NestedPath,
+    OrdinalityColumn,
+    Passing,
+    PassingList,
+    PathExpression,
+)
+from src.jsontable.evaluate import evaluate
+from src.jsontable.render import as_string
+from src.jsontable.shared import SharedScan
+from tests.fixtures import connection  # noqa: F401
+from tests.fixtures import transaction  # noqa: F401
+
+from .test_film_examples import TABLE_NAME, data, my_films  # noqa: F401
+
+KINDS = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression("$.favorites[*]"),
+        columns=ColumnList([OrdinalityColumn("id"), Column("Kind", "text")]),
+    ),
+    table_name=TABLE_NAME,
+)
+
+FILMS = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression("$.favorites[*]"),
+        columns=ColumnList(
+            [
+                Column("kind", "text", PathExpression("$.kind")),
+                NestedPath(
+                    PathExpression("$.films[*]"),
+                    ColumnList(
+                        [
+                            OrdinalityColumn("n"),
+                            Column("title", "text", PathExpression("$.title")),
+                        ]
+                    ),
+                ),
+            ]
+        ),
+    ),
+    table_name=TABLE_NAME,
+)
+
+HITCHCOCK = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression(
+            "$.favorites[*].films[*] ? (@.director == $filter)"
+        ),
+        passing=PassingList([Passing("Alfred Hitchcock", "filter")]),
+        columns=ColumnList(
+            [
+                Column("title", "text", PathExpression("$.title")),
+                ColumnExists("has_year", PathExpression("$.year")),
+            ]
+        ),
+    ),
+    table_name=TABLE_NAME,
+)
+
+NOTHING = JsonQuery(
+    JsonTable(
+        context_item=ContextItem("js"),
+        path_expression=PathExpression("$.missing[*]"),
+        columns=ColumnList([Column("x", "text")]),
+    ),
+    table_name=TABLE_NAME,
+)
+
+QUERIES = [KINDS, FILMS, HITCHCOCK, NOTHING]
+
+
+def test_combined_sql():
+    combined = SharedScan([KINDS, HITCHCOCK]).combined()
+    assert as_string(combined.as_sql()) == (
+        """SELECT "jt".* FROM "my_films", JSON_TABLE (js, '$' """
+        """PASSING 'Alfred Hitchcock' AS filter COLUMNS ("""
+        """NESTED PATH '$.favorites[*]' COLUMNS (s0_row FOR ORDINALITY, """
+        """s0_0 FOR ORDINALITY, s0_1 text PATH '$."kind"'), """
+        """NESTED PATH '$.favorites[*].films[*] ? (@.director == $filter)' """
+        """COLUMNS (s1_row FOR ORDINALITY, s1_0 text PATH '$.title', """
+        """s1_1 EXISTS PATH '$.year'))) AS "jt\""""
+    )
+
+
+def test_split_matches_each_query():
+    scan = SharedScan(QUERIES)
+    rows = evaluate(scan.combined().json_table, data)
+    assert scan.split(rows) == [evaluate(q.json_table, data) for q in QUERIES]
+
+
+def test_frozen_queries():
+    scan = SharedScan([KINDS.freeze(), FILMS])
+    assert scan.combined() == SharedScan([KINDS, FILMS]).combined()
+
+
+def test_prefilters_are_ored():
+    scan = SharedScan(
+        [
+            JsonQuery(KINDS.json_table, TABLE_NAME, prefilter=True),
+            JsonQuery(HITCHCOCK.json_table, TABLE_NAME, prefilter=True),
+        ]
+    )
+    assert as_string(scan.as_sql()).endswith(
+        """ WHERE (js @? '$.favorites[*]') OR """
+        """(js @? '$.favorites[*].films[*] ? (@.director == "Alfred Hitchcock")')"""
+    )
+    # Unless every query has a prefilter, none is used
+    scan = SharedScan([scan.queries[0], HITCHCOCK])
+    assert " WHERE " not in as_string(scan.as_sql())
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        JsonQuery(KINDS.json_table, table_name="other"),
+        JsonQuery(
+            JsonTable(ContextItem("js -> 'a'"), "$", columns=KINDS.json_table.columns),
+            TABLE_NAME,
+        ),
+        JsonQuery(KINDS.json_table, TABLE_NAME, where=[sql.SQL("true")]),
+        JsonQuery(
+            JsonTable(
+                ContextItem("js"),
+                "$",
+                PassingList([Passing("Akira Kurosawa", "filter")]),
+                KINDS.json_table.columns,
+            ),
+            TABLE_NAME,
+        ),
+        JsonQuery(JsonTable(ContextItem("js"), "$"), TABLE_NAME),
+    ],
+)
+def test_incompatible_queries(other):
+    with pytest.raises(ValueError):
+        SharedScan([HITCHCOCK, other]).combined()
+
+
+def test_fetch_all(my_films: cursor):  # noqa: F811
+    results = SharedScan(QUERIES).fetch_all(my_films)
+    for query, rows in zip(QUERIES, results):
+        my_films.execute(query.as_sql())
+        assert rows == my_films.fetchall()